@@ -1,12 +1,22 @@
 from __future__ import annotations
+import asyncio
 import logging
-import os
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
-from agent.router import api
+from agent.router import api, new_scraper
+from agent.middleware import DecompressRequestMiddleware
 from agent.config import settings
+from agent.tools.registry import registry
+from agent.tools.nocodb_client import AsyncNocoClient, link_strategies
+from agent.tools.meta import SchemaCache
+from agent.tools.jobs import JobQueue
+from agent.tools.preview_cache import PreviewCache
+from agent.tools import parallel as preview_parallel, signing
+from agent.tools.parallel import pools as preview_pools
+from agent.tools.smalltalk import make_smalltalk
 
 # ────────────────────────────── logging ──────────────────────────────
 logging.basicConfig(
@@ -33,6 +43,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# сжатие: ответы больше GZIP_MIN_BYTES — gzip (если клиент умеет), тела запросов — gzip/deflate
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_BYTES, compresslevel=settings.GZIP_LEVEL)
+app.add_middleware(DecompressRequestMiddleware, max_bytes=int(settings.REQUEST_MAX_INFLATED_MB * 2**20))
+
 # маршруты
 app.include_router(api)
 
@@ -46,8 +60,61 @@ async def on_startup():
         settings.WEB_SCRAPE_ENABLED,
         settings.AGENT_MAP_PATH,
     )
-    # Тут можно проинициализировать кэш справочников, если нужно
-    # (мы читаем их на лету внутри tools/preview.py)
+    # прогрев справочников: дальше перечитываются только при изменении файлов
+    snap = registry.get()
+    log.info("agent.registry version=%s aliases=%d", snap.version, len(snap.aliases))
+    # секрет токенов PreviewItem.token — до пула процессов: воркеры получают его при старте
+    signing.configure(settings.PREVIEW_TOKEN_SECRET)
+    # пул процессов для больших preview (PREVIEW_WORKERS=1 — выключен)
+    preview_parallel.configure(settings.PREVIEW_WORKERS, settings.PREVIEW_PARALLEL_MIN_ROWS, settings.PREVIEW_SHARD_ROWS)
+    # один пул соединений к NocoDB на весь процесс (keep-alive между запросами)
+    app.state.noco = AsyncNocoClient(
+        settings.NOCODB_BASE, settings.NOCODB_TOKEN_VAC,
+        timeout=settings.REQUEST_TIMEOUT_SEC,
+        max_conn=settings.HTTPX_MAX_CONN, max_keepalive=settings.HTTPX_MAX_KEEPALIVE, http2=settings.HTTPX_HTTP2,
+        retry_attempts=settings.RETRY_ATTEMPTS, retry_backoff_base=settings.RETRY_BACKOFF_BASE,
+    )
+    link_strategies.ttl = settings.LINK_STRATEGY_TTL_SEC
+    # метаданные таблиц NocoDB (живой AllowedMap при NOCODB_LIVE_MAP=1)
+    app.state.schema = SchemaCache(app.state.noco, ttl=settings.NOCODB_META_TTL_SEC)
+    # кэш ответов /preview по (sha256(csv), версия справочников)
+    app.state.preview_cache = (PreviewCache(settings.PREVIEW_CACHE_SIZE, int(settings.PREVIEW_CACHE_MAX_MB * 2**20))
+                               if settings.PREVIEW_CACHE_SIZE > 0 else None)
+    # фоновые задачи для долгих /scrape и больших /preview
+    app.state.jobs = JobQueue(workers=settings.JOB_WORKERS, ttl=settings.JOB_TTL_SEC,
+                              max_pending=settings.JOB_MAX_PENDING)
+    app.state.jobs.start()
+    # small talk в /chat: AsyncOpenAI, кэш ответов и таймаут с заготовкой
+    app.state.smalltalk = make_smalltalk(
+        settings.OPENAI_API_KEY, model=settings.AGENT_MODEL, base_url=settings.OPENAI_BASE_URL,
+        timeout=settings.CHAT_TIMEOUT_SEC, cache_size=settings.CHAT_CACHE_SIZE, ttl=settings.CHAT_CACHE_TTL_SEC,
+    )
+    # нечёткие индексы, автомат /chat, клиент OpenAI и скрейпер создаются при первом
+    # использовании; AGENT_WARMUP=1 — построить их сразу, до первого запроса
+    if settings.AGENT_WARMUP:
+        await asyncio.to_thread(snap.warm)
+        if settings.CHAT_ENABLED:
+            await asyncio.to_thread(app.state.smalltalk.warm)
+        if settings.WEB_SCRAPE_ENABLED:
+            # общий клиент скрейпера: лимит и пауза на хост действуют на все запросы /scrape
+            app.state.scraper = new_scraper()
+        log.info("agent.warmup done")
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    jobs = getattr(app.state, "jobs", None)
+    if jobs is not None:
+        await jobs.aclose()
+    noco = getattr(app.state, "noco", None)
+    if noco is not None:
+        await noco.aclose()
+    smalltalk = getattr(app.state, "smalltalk", None)
+    if smalltalk is not None:
+        await smalltalk.aclose()
+    scraper = getattr(app.state, "scraper", None)
+    if scraper is not None:
+        await scraper.aclose()
+    preview_pools.shutdown()
 
 @app.get("/healthz")
 async def healthz():
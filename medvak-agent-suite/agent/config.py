@@ -10,6 +10,11 @@ class Settings:
     # Agent / OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     AGENT_MODEL: str = os.getenv("AGENT_MODEL", "gpt-5-mini")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")
+    CHAT_ENABLED: bool = os.getenv("CHAT_ENABLED", "0") == "1"
+    CHAT_TIMEOUT_SEC: float = float(os.getenv("CHAT_TIMEOUT_SEC", "8"))
+    CHAT_CACHE_SIZE: int = int(os.getenv("CHAT_CACHE_SIZE", "512"))
+    CHAT_CACHE_TTL_SEC: float = float(os.getenv("CHAT_CACHE_TTL_SEC", "3600"))
     AGENT_HOST: str = os.getenv("AGENT_HOST", "0.0.0.0")
     AGENT_PORT: int = int(os.getenv("AGENT_PORT", "8000"))
     AGENT_LOG_LEVEL: str = os.getenv("AGENT_LOG_LEVEL", "INFO")
@@ -19,6 +24,11 @@ class Settings:
     NOCODB_BASE: str = os.getenv("NOCODB_BASE", "").rstrip("/")
     NOCODB_TOKEN_VAC: str = os.getenv("NOCODB_TOKEN_VAC", "")
     NOCODB_TOKEN_STAT: str = os.getenv("NOCODB_TOKEN_STAT", "")
+    NOCODB_BULK_CHUNK: int = int(os.getenv("NOCODB_BULK_CHUNK", "100"))
+    NOCODB_INLINE_LINKS: bool = os.getenv("NOCODB_INLINE_LINKS", "0") == "1"
+    NOCODB_LIVE_MAP: bool = os.getenv("NOCODB_LIVE_MAP", "0") == "1"
+    NOCODB_META_TTL_SEC: float = float(os.getenv("NOCODB_META_TTL_SEC", "300"))
+    LINK_STRATEGY_TTL_SEC: float = float(os.getenv("LINK_STRATEGY_TTL_SEC", "3600"))
 
     # ODKB (пример одной из больниц — не дефолт!)
     VACANCIES_TABLE_ODKB_ID: str = os.getenv("VACANCIES_TABLE_ODKB_ID", "")
@@ -28,16 +38,57 @@ class Settings:
     # Behavior flags
     WEB_SCRAPE_ENABLED: bool = os.getenv("WEB_SCRAPE_ENABLED", "0") == "1"
     AUTO_WRITE_ENABLED: bool = os.getenv("AUTO_WRITE_ENABLED", "0") == "1"
+    PREVIEW_TOKEN_SECRET: str = os.getenv("PREVIEW_TOKEN_SECRET", "")
     AUTO_WRITE_THRESHOLD: float = float(os.getenv("AUTO_WRITE_THRESHOLD", "0.90"))
     PREVIEW_PAGE_SIZE: int = int(os.getenv("PREVIEW_PAGE_SIZE", "10"))
     WEB_DEFAULT_PAGES: int = int(os.getenv("WEB_DEFAULT_PAGES", "2"))
+    SCRAPE_PER_HOST: int = int(os.getenv("SCRAPE_PER_HOST", "2"))
+    SCRAPE_DELAY_SEC: float = float(os.getenv("SCRAPE_DELAY_SEC", "0.5"))
+    SCRAPE_USER_AGENT: str = os.getenv("SCRAPE_USER_AGENT", "")   # пусто — браузерный UA по умолчанию
+    SCRAPE_HH_BASE: str = os.getenv("SCRAPE_HH_BASE", "https://hh.ru")
+    SCRAPE_ZP_BASE: str = os.getenv("SCRAPE_ZP_BASE", "https://www.zarplata.ru")
+    SCRAPE_INCREMENTAL: bool = os.getenv("SCRAPE_INCREMENTAL", "1") == "1"
+    SCRAPE_SEEN_DB_PATH: str = os.getenv("SCRAPE_SEEN_DB_PATH", "data/listings.sqlite3")
+    SCRAPE_CACHE_ENABLED: bool = os.getenv("SCRAPE_CACHE_ENABLED", "1") == "1"
+    SCRAPE_CACHE_PATH: str = os.getenv("SCRAPE_CACHE_PATH", "data/scrape_cache.sqlite3")
+    SCRAPE_CACHE_MAX_MB: float = float(os.getenv("SCRAPE_CACHE_MAX_MB", "64"))
+    SCRAPE_CACHE_TTL_SEC: float = float(os.getenv("SCRAPE_CACHE_TTL_SEC", "300"))
 
     # HTTP client limits
     HTTPX_MAX_CONN: int = int(os.getenv("HTTPX_MAX_CONN", "4"))
     HTTPX_MAX_KEEPALIVE: int = int(os.getenv("HTTPX_MAX_KEEPALIVE", "2"))
+    HTTPX_HTTP2: bool = os.getenv("HTTPX_HTTP2", "0") == "1"
     REQUEST_TIMEOUT_SEC: float = float(os.getenv("REQUEST_TIMEOUT_SEC", "20"))
     RETRY_ATTEMPTS: int = int(os.getenv("RETRY_ATTEMPTS", "3"))
     RETRY_BACKOFF_BASE: float = float(os.getenv("RETRY_BACKOFF_BASE", "0.7"))
+    DEDUP_ENABLED: bool = os.getenv("DEDUP_ENABLED", "1") == "1"
+    DEDUP_DB_PATH: str = os.getenv("DEDUP_DB_PATH", "data/dedup.sqlite3")
+    WRITE_CONCURRENCY: int = int(os.getenv("WRITE_CONCURRENCY", os.getenv("HTTPX_MAX_CONN", "4")))
+
+    # Parallel preview (пул процессов для больших CSV; PREVIEW_WORKERS=1 — выключено, 0 — по доступным ядрам, до 4)
+    PREVIEW_PARALLEL_MIN_ROWS: int = int(os.getenv("PREVIEW_PARALLEL_MIN_ROWS", "20000"))
+    PREVIEW_WORKERS: int = int(os.getenv("PREVIEW_WORKERS", "1"))
+    PREVIEW_SHARD_ROWS: int = int(os.getenv("PREVIEW_SHARD_ROWS", "5000"))
+
+    # Кэш ответов /preview по (sha256(csv), версия справочников); 0 — выключен
+    PREVIEW_CACHE_SIZE: int = int(os.getenv("PREVIEW_CACHE_SIZE", "64"))
+    PREVIEW_CACHE_MAX_MB: float = float(os.getenv("PREVIEW_CACHE_MAX_MB", "64"))
+
+    # Сжатие трафика бот↔агент
+    GZIP_MIN_BYTES: int = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "5"))
+    REQUEST_MAX_INFLATED_MB: float = float(os.getenv("REQUEST_MAX_INFLATED_MB", "200"))
+
+    # Загрузка файлов (/jobs/preview/file): предел размера тела
+    UPLOAD_MAX_MB: float = float(os.getenv("UPLOAD_MAX_MB", "50"))
+
+    # Background jobs
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_TTL_SEC: float = float(os.getenv("JOB_TTL_SEC", "3600"))
+    JOB_MAX_PENDING: int = int(os.getenv("JOB_MAX_PENDING", "100"))
+
+    # Startup: 1 — строить ленивые индексы/клиенты при старте, а не на первом запросе
+    AGENT_WARMUP: bool = os.getenv("AGENT_WARMUP", "0") == "1"
 
     # Dictionaries/aliases
     AGENT_MAP_PATH: str = os.getenv("AGENT_MAP_PATH", "agent/agent_map/agent-map.json")
@@ -0,0 +1,65 @@
+from __future__ import annotations
+import zlib
+
+from fastapi import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# wbits: gzip (16+) и zlib/«deflate» по HTTP (автоопределение 32+); raw deflate — отрицательные
+_WBITS = {b"gzip": 16 + zlib.MAX_WBITS, b"x-gzip": 16 + zlib.MAX_WBITS, b"deflate": 32 + zlib.MAX_WBITS}
+
+
+class DecompressRequestMiddleware:
+    """
+    Тела запросов с Content-Encoding: gzip/deflate распаковываются по мере чтения
+    (в т.ч. chunked-загрузки файлов) — эндпоинты видят обычные байты.
+    max_bytes ограничивает распакованный объём (защита от «zip-бомб») → 413.
+    """
+    def __init__(self, app: ASGIApp, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = next((v.strip().lower() for k, v in scope["headers"] if k == b"content-encoding"), None)
+        if encoding is None or encoding == b"identity":
+            await self.app(scope, receive, send)
+            return
+        wbits = _WBITS.get(encoding)
+        if wbits is None:
+            # неизвестную кодировку не передаём дальше как «обычные байты»
+            await _reply(send, 415, b'{"detail":"Unsupported Content-Encoding"}')
+            return
+
+        # длина тела после распаковки другая; Content-Encoding снят — тело уже «как есть»
+        scope = dict(scope, headers=[(k, v) for k, v in scope["headers"]
+                                     if k not in (b"content-encoding", b"content-length")])
+        inflater = zlib.decompressobj(wbits)
+        total = 0
+        limit = self.max_bytes
+
+        async def receive_inflated() -> Message:
+            nonlocal total
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            try:
+                # max_length ограничивает выход одного вызова: остаток не распаковывается, если превышен предел
+                body = inflater.decompress(message.get("body", b""), limit - total + 1)
+                if not message.get("more_body", False):
+                    body += inflater.flush()
+            except zlib.error:
+                raise HTTPException(400, detail=f"Malformed {encoding.decode()} request body")
+            total += len(body)
+            if total > limit or inflater.unconsumed_tail:
+                raise HTTPException(413, detail="Decompressed request body is too large")
+            return {**message, "body": body}
+
+        await self.app(scope, receive_inflated, send)
+
+
+async def _reply(send: Send, status: int, body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
@@ -1,24 +1,35 @@
 from __future__ import annotations
-import os
+import asyncio
+import itertools
+import json
 import re
-from typing import List, Optional, Literal
+import tempfile
+from typing import IO, Iterable, Iterator, List, Optional, Literal
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from agent.tools.schema import Record, PreviewItem
-from agent.tools.ingest_csv import parse_csv_text
+from agent.tools.ingest_csv import iter_csv_records, iter_csv_bytes
+from agent.tools.ingest_xlsx import iter_xlsx_records
 from agent.tools.preview import preview_records
-from agent.tools.write import write_records
-from agent.tools.scrape_zp import scrape_zarplata
-from agent.tools.scrape_hh import scrape_hh
+from agent.tools.parallel import parallel_enabled, use_parallel, preview_shards
+from agent.tools.rowstore import PreviewStore
+from agent.tools.preview_cache import PreviewCache, csv_digest, etag_matches, make_etag
+from agent.tools.write import write_records_async
+from agent.tools.nocodb_client import AsyncNocoClient
+from agent.tools.registry import Snapshot, registry
+from agent.tools.matcher import IntentHits
+from agent.tools.meta import SchemaCache
+from agent.tools.dedup import DedupIndex, open_index
+from agent.tools.scrape_engine import ScrapeEngine, make_engine
+from agent.tools.http_cache import open_cache
+from agent.tools.jobs import Job, JobQueue
+from agent.tools.smalltalk import SmallTalk
 
 from agent.config import settings
 
-# Chat LLM (для small talk; NLU ниже — правилaми, без токенов)
-from openai import OpenAI
-_oai = OpenAI(api_key=settings.OPENAI_API_KEY)
-
 api = APIRouter()
 
 # ────────────────────────────── DTO ──────────────────────────────────
@@ -27,19 +38,26 @@ class PreviewRequest(BaseModel):
     text: Optional[str] = None
 
 class PreviewResponse(BaseModel):
-    version: str = "map-local"
+    version: str                    # Snapshot.version: хэш содержимого agent-map и алиасов
     items: List[PreviewItem] = []
 
 class WriteRequest(BaseModel):
     records: List[Record]
     table_id: str
     rel_name: Optional[str] = None
+    tokens: Optional[List[Optional[str]]] = None   # PreviewItem.token по позициям records
+    listings: Optional[List[Optional[str]]] = None   # PreviewItem.listing по позициям records
+
+class DedupWarmRequest(BaseModel):
+    table_id: str
+    page_size: int = 200
 
 class ScrapeRequest(BaseModel):
     source: Literal["zp", "hh"]
     query: str
     hospital: Optional[str] = None
     pages: int = 2
+    full: bool = False          # True — игнорировать индекс виденных карточек
 
 # ─ Chat / Intent
 class Intent(BaseModel):
@@ -57,32 +75,97 @@ class ChatResponse(BaseModel):
     intent: Optional[Intent] = None
 
 # ────────────────────────────── helpers ───────────────────────────────
-_ALIASES = None
-def _load_aliases() -> dict:
-    from agent.tools.normalize import load_aliases
-    global _ALIASES
-    if _ALIASES is None:
-        _ALIASES = load_aliases(settings.ALIASES_FILE)
-    return _ALIASES
-
-def _match_hospital(text: str) -> Optional[str]:
+def get_noco(request: Request) -> AsyncNocoClient:
+    """Общий AsyncNocoClient, созданный в app startup."""
+    return request.app.state.noco
+
+def get_schema(request: Request) -> SchemaCache:
+    return request.app.state.schema
+
+def new_scraper() -> ScrapeEngine:
+    """ScrapeEngine с лимитами и кэшем страниц из settings."""
+    cache = None
+    if settings.SCRAPE_CACHE_ENABLED:
+        cache = open_cache(settings.SCRAPE_CACHE_PATH, max_bytes=int(settings.SCRAPE_CACHE_MAX_MB * 2**20),
+                           ttl=settings.SCRAPE_CACHE_TTL_SEC)
+    return make_engine(timeout=settings.REQUEST_TIMEOUT_SEC, max_conn=settings.HTTPX_MAX_CONN,
+                       max_keepalive=settings.HTTPX_MAX_KEEPALIVE, per_host=settings.SCRAPE_PER_HOST,
+                       delay=settings.SCRAPE_DELAY_SEC, user_agent=settings.SCRAPE_USER_AGENT, cache=cache)
+
+def get_scraper(request: Request) -> ScrapeEngine:
+    """Общий ScrapeEngine; создаётся при первом /scrape (или при прогреве в startup)."""
+    engine = getattr(request.app.state, "scraper", None)
+    if engine is None:
+        engine = request.app.state.scraper = new_scraper()
+    return engine
+
+def _scraper(source: str):
+    """Парсер выдачи и адрес сайта; парсеры грузятся только когда скрейп действительно нужен."""
+    if source == "zp":
+        from agent.tools.scrape_zp import scrape_zarplata_listings as scrape
+        return scrape, settings.SCRAPE_ZP_BASE
+    from agent.tools.scrape_hh import scrape_hh_listings as scrape
+    return scrape, settings.SCRAPE_HH_BASE
+
+def _listing_index():
+    """Индекс импортированных карточек по settings; None, если SCRAPE_INCREMENTAL=0."""
+    if not settings.SCRAPE_INCREMENTAL:
+        return None
+    from agent.tools.listing_index import open_listing_index
+    return open_listing_index(settings.SCRAPE_SEEN_DB_PATH)
+
+async def _scrape_records(req: ScrapeRequest, engine: ScrapeEngine):
+    """Карточки выдачи → (записи, Listing.ref по позициям записей)."""
+    from agent.tools.scrape_engine import listing_to_record
+    scrape, base = _scraper(req.source)
+    index = None if req.full else _listing_index()
+    listings = await scrape(engine, req.query, hospital=req.hospital, pages=req.pages, index=index, base=base)
+    return [listing_to_record(it) for it in listings], [it.ref for it in listings]
+
+def get_dedup() -> Optional[DedupIndex]:
+    """Локальный индекс дублей по settings; None, если DEDUP_ENABLED=0."""
+    return open_index(settings.DEDUP_DB_PATH) if settings.DEDUP_ENABLED else None
+
+def get_preview_cache(request: Request) -> Optional[PreviewCache]:
+    """Кэш ответов /preview, созданный в app startup; None — выключен (PREVIEW_CACHE_SIZE=0)."""
+    return getattr(request.app.state, "preview_cache", None)
+
+def get_jobs(request: Request) -> JobQueue:
+    return request.app.state.jobs
+
+def get_smalltalk(request: Request) -> SmallTalk:
+    """Small talk через LLM (AsyncOpenAI + кэш ответов); NLU — правилами, без токенов."""
+    return request.app.state.smalltalk
+
+async def map_snapshot(request: Request, table_id: Optional[str] = Query(None)) -> Snapshot:
+    """
+    Справочники для валидации: при NOCODB_LIVE_MAP=1 и известном table_id — собранные
+    из метаданных NocoDB (без ожидания сети), иначе — файловый agent-map.json.
+    """
+    if table_id and settings.NOCODB_LIVE_MAP:
+        snap = get_schema(request).snapshot_nowait(table_id)
+        if snap is not None:
+            return snap
+    return registry.get()
+
+_HOSPITAL_PHRASE = re.compile(r"в\s+(?:больнице|гкб|дгкб|одкб)\s*([^\n,;]+)")
+_PAGES = re.compile(r"(?:на|по)\s*(\d+)\s*(?:стр|страниц[а-я]*)")
+_VACANCY_WORD = re.compile(r"ваканси[яи]\s+([^\s,.;]+)")
+
+def _match_hospital(text: str, hits: IntentHits) -> Optional[str]:
     """
-    Простое сопоставление по алиасам: если ключ встречается в тексте,
-    возвращаем канон.
+    Канон по алиасам (автомат снимка справочников уже нашёл совпадение),
+    иначе — простая эвристика на «в больнице …».
     """
-    aliases = _load_aliases()
-    low = text.lower()
-    for k, v in aliases.items():
-        if k.lower() in low:
-            return v
-    # очень простая эвристика на «в больнице …»
-    m = re.search(r"в\s+(?:больнице|гкб|дгкб|одкб)\s*([^\n,;]+)", low)
+    if hits.hospital:
+        return hits.hospital
+    m = _HOSPITAL_PHRASE.search(text.lower())
     if m:
         return m.group(0).strip()
     return None
 
 def _parse_pages(text: str, default_pages: int) -> int:
-    m = re.search(r"(?:на|по)\s*(\d+)\s*(?:стр|страниц[а-я]*)", text)
+    m = _PAGES.search(text)
     if m:
         try:
             return max(1, min(10, int(m.group(1))))  # безопасность: 1..10
@@ -90,21 +173,12 @@ def _parse_pages(text: str, default_pages: int) -> int:
             pass
     return default_pages
 
-def _parse_source(text: str) -> Optional[str]:
-    t = text.lower()
-    if any(w in t for w in ("зарплата", "zarplata", "zp", "зарплата.ру", "зарплата ру")):
-        return "zp"
-    if any(w in t for w in ("hh", "headhunter", "хх", "хэдхантер")):
-        return "hh"
-    return None
-
-def _parse_query(text: str) -> Optional[str]:
-    t = text.lower()
+def _parse_query(text: str, hits: IntentHits) -> Optional[str]:
     # Основной кейс: медсестра/медсестёр/медицинская сестра
-    if "медсестр" in t:
-        return "медсестра"
+    if hits.role:
+        return hits.role
     # fallback: попытаться вытащить слово после "ваканси"
-    m = re.search(r"ваканси[яи]\s+([^\s,.;]+)", t)
+    m = _VACANCY_WORD.search(text.lower())
     if m:
         return m.group(1)
     return None
@@ -121,10 +195,11 @@ def parse_intent_free_text(msg: str) -> Intent:
     if "," in t and "Title" in t and "Должность" in t:
         return Intent(action="parse_csv")
 
-    # Скрейп сайтов?
-    src = _parse_source(t)
-    qry = _parse_query(t)
-    hosp = _match_hospital(t)
+    # Скрейп сайтов? Источник, должность и больница — за один проход автомата
+    hits = registry.get().matcher.scan(t)
+    src = hits.source
+    qry = _parse_query(t, hits)
+    hosp = _match_hospital(t, hits)
     pages = _parse_pages(t, settings.WEB_DEFAULT_PAGES)
 
     if src and (qry or "найти" in t or "поиск" in t):
@@ -136,36 +211,252 @@ def parse_intent_free_text(msg: str) -> Intent:
     return Intent(action="none")
 
 # ────────────────────────────── endpoints ────────────────────────────
+_STORE_CHUNK = 1000
+
+def _fill_store(store: PreviewStore, records: Iterable[Record]) -> Iterator[int]:
+    """Дописывать записи в store кусками по _STORE_CHUNK; после каждого куска — len(store)."""
+    it = iter(records)
+    while True:
+        before = len(store)
+        store.extend(itertools.islice(it, _STORE_CHUNK))
+        yield len(store)
+        if len(store) - before < _STORE_CHUNK:
+            return
+
+def _ndjson_items(csv_payload: str, snap: Snapshot) -> Iterator[bytes]:
+    # строки CSV разбираются лениво, нормализация — в колоночном хранилище (одно значение — один раз на поток)
+    store, done = PreviewStore(snap), 0
+    for n in _fill_store(store, iter_csv_records(csv_payload)):
+        for i in range(done, n):
+            yield (store.item(i).json(ensure_ascii=False) + "\n").encode("utf-8")
+        done = n
+
+def _preview_body(csv_payload: str, snap: Snapshot) -> bytes:
+    """
+    Тело PreviewResponse через PreviewStore: вместо List[Record] и List[PreviewItem]
+    на весь CSV — колонки кодов; PreviewItem собираются по одному при сериализации.
+    Байты те же, что у PreviewResponse(...).json(ensure_ascii=False).
+    """
+    store = PreviewStore(snap)
+    records: Iterator[Record] = iter_csv_records(csv_payload)
+    if parallel_enabled():
+        # порог — по первым PREVIEW_PARALLEL_MIN_ROWS строкам; дальше пул читает разбор лениво
+        head = list(itertools.islice(records, settings.PREVIEW_PARALLEL_MIN_ROWS))
+        if use_parallel(len(head)):
+            for part in preview_shards(itertools.chain(head, records), snap):
+                store.extend_items(part)
+        else:
+            records = iter(head)
+    for _ in _fill_store(store, records):
+        pass
+    items = ", ".join(store.item(i).json(ensure_ascii=False) for i in range(len(store)))
+    return f'{{"version": {json.dumps(snap.version, ensure_ascii=False)}, "items": [{items}]}}'.encode("utf-8")
+
+def _json_response(body: bytes, etag: str) -> Response:
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 @api.post("/preview", response_model=PreviewResponse)
-def post_preview(req: PreviewRequest):
+def post_preview(req: PreviewRequest, stream: bool = Query(False), snap: Snapshot = Depends(map_snapshot),
+                 if_none_match: Optional[str] = Header(None),
+                 cache: Optional[PreviewCache] = Depends(get_preview_cache)):
     csv_payload = req.csv_text or req.text
     if not csv_payload:
         raise HTTPException(400, detail="Provide 'csv_text' or 'text' with CSV content.")
-    records = parse_csv_text(csv_payload)
-    items = preview_records(records)
-    return PreviewResponse(items=items)
+    # ответ однозначно задан CSV и версией справочников — ETag известен до вычисления
+    key = (csv_digest(csv_payload), snap.version)
+    etag = make_etag("stream" if stream else "json", *key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "X-Map-Version": snap.version})
+    if stream:
+        # NDJSON: одна строка — один PreviewItem, строки идут по мере разбора CSV
+        return StreamingResponse(
+            _ndjson_items(csv_payload, snap),
+            media_type="application/x-ndjson",
+            # identity: GZipMiddleware копит сжатые строки в буфере — поток перестал бы быть построчным
+            headers={"X-Map-Version": snap.version, "ETag": etag, "Content-Encoding": "identity"},
+        )
+
+    def compute() -> bytes:
+        return _preview_body(csv_payload, snap)
+    body = cache.get_or_compute(key, compute) if cache is not None else compute()
+    return _json_response(body, etag)
 
 @api.post("/write")
-def post_write(req: WriteRequest):
+async def post_write(req: WriteRequest, noco: AsyncNocoClient = Depends(get_noco),
+                     schema: SchemaCache = Depends(get_schema), dedup: Optional[DedupIndex] = Depends(get_dedup)):
     if not req.records:
         raise HTTPException(400, detail="No records provided")
-    results = write_records(records=req.records, table_id=req.table_id, rel_name=req.rel_name)
+    if req.tokens is not None and len(req.tokens) != len(req.records):
+        raise HTTPException(400, detail="'tokens' must align with 'records'")
+    if req.listings is not None and len(req.listings) != len(req.records):
+        raise HTTPException(400, detail="'listings' must align with 'records'")
+    results = await write_records_async(records=req.records, table_id=req.table_id, rel_name=req.rel_name,
+                                        client=noco, tokens=req.tokens,
+                                        schema=schema if settings.NOCODB_LIVE_MAP else None,
+                                        bulk_chunk=settings.NOCODB_BULK_CHUNK,
+                                        inline_links=settings.NOCODB_INLINE_LINKS,
+                                        concurrency=settings.WRITE_CONCURRENCY, dedup=dedup)
+    if req.listings and settings.WEB_SCRAPE_ENABLED:
+        await asyncio.to_thread(_mark_imported, req.listings, results)
     return {"results": results}
 
+def _mark_imported(refs: List[Optional[str]], results: List[dict]) -> None:
+    """Карточки скрейпа, чьи записи дошли до NocoDB, больше не показываются инкрементальным скрейпом."""
+    index = _listing_index()
+    if index is not None:
+        index.mark_imported(ref for ref, res in zip(refs, results) if res.get("status") in ("ok", "duplicate"))
+
 @api.post("/scrape", response_model=PreviewResponse)
-def post_scrape(req: ScrapeRequest):
+async def post_scrape(req: ScrapeRequest, snap: Snapshot = Depends(map_snapshot),
+                      engine: ScrapeEngine = Depends(get_scraper)):
+    if not settings.WEB_SCRAPE_ENABLED:
+        raise HTTPException(400, detail="WEB scraping is disabled. Set WEB_SCRAPE_ENABLED=1")
+    recs, refs = await _scrape_records(req, engine)
+    items = await asyncio.to_thread(preview_records, recs, snap)
+    for item, ref in zip(items, refs):
+        item.listing = ref
+    return PreviewResponse(version=snap.version, items=items)
+
+# ─ Фоновые задачи: долгие /preview и /scrape без удержания HTTP-запроса
+async def _preview_into(job: Job, records: Iterable[Record], snap: Snapshot,
+                        listings: Optional[List[str]] = None) -> None:
+    """
+    Записи → PreviewStore кусками по _STORE_CHUNK. Итератор (разбор загруженного файла)
+    читается кусками в том же потоке, что и нормализация: List[Record] на весь файл
+    не собирается — в памяти только колонки хранилища и текущий кусок.
+    listings — Listing.ref по позициям записей (результат скрейпа).
+    """
+    job.stage = "preview"
+    if isinstance(records, list):
+        job.total = len(records)
+    # результат держим в колоночном хранилище: PreviewItem собираются только при выдаче страницы
+    store = job.items = PreviewStore(snap)
+    store.listings = listings
+    it = iter(records)
+    if parallel_enabled():
+        # порог — по первым PREVIEW_PARALLEL_MIN_ROWS записям; List[Record] на весь файл не собирается
+        head = await asyncio.to_thread(list, itertools.islice(it, settings.PREVIEW_PARALLEL_MIN_ROWS))
+        if use_parallel(len(head)):
+            # большой файл — шарды в пуле процессов (разбор идёт вровень с пулом), прогресс по шардам
+            shards = preview_shards(itertools.chain(head, it), snap)
+            while (part := await asyncio.to_thread(next, shards, None)) is not None:
+                store.extend_items(part)
+                job.done = len(store)
+            job.total = len(store)
+            return
+        it = iter(head)
+    fill = _fill_store(store, it)
+    while (n := await asyncio.to_thread(next, fill, None)) is not None:
+        job.done = n
+    job.total = len(store)
+
+def _submit(jobs: JobQueue, kind: str, fn) -> dict:
+    # только из async-эндпоинтов: asyncio.Queue не потокобезопасна
+    try:
+        job = jobs.submit(kind, fn)
+    except asyncio.QueueFull:
+        raise HTTPException(429, detail="Job queue is full, retry later")
+    return job.view()
+
+@api.post("/jobs/preview")
+async def post_job_preview(req: PreviewRequest, snap: Snapshot = Depends(map_snapshot),
+                           jobs: JobQueue = Depends(get_jobs)):
+    csv_payload = req.csv_text or req.text
+    if not csv_payload:
+        raise HTTPException(400, detail="Provide 'csv_text' or 'text' with CSV content.")
+
+    async def run(job: Job):
+        job.version = snap.version
+        await _preview_into(job, iter_csv_records(csv_payload), snap)
+    return _submit(jobs, "preview", run)
+
+_UPLOAD_SPOOL_BYTES = 1 << 20      # столько держим в памяти, дальше тело загрузки уходит во временный файл
+_XLSX_MAGIC = b"PK\x03\x04"
+
+async def _spool_body(request: Request) -> IO[bytes]:
+    """Тело запроса → SpooledTemporaryFile по мере прихода: задача стартует позже, а xlsx (zip) нужен seek."""
+    limit = settings.UPLOAD_MAX_MB * 2**20
+    f = tempfile.SpooledTemporaryFile(max_size=_UPLOAD_SPOOL_BYTES)
+    size = 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > limit:
+                raise HTTPException(413, detail=f"Upload is larger than UPLOAD_MAX_MB={settings.UPLOAD_MAX_MB:g}")
+            f.write(chunk)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+_READ_CHUNK = 64 * 1024
+
+def _file_chunks(f: IO[bytes]) -> Iterator[bytes]:
+    while chunk := f.read(_READ_CHUNK):
+        yield chunk
+
+@api.post("/jobs/preview/file")
+async def post_job_preview_file(request: Request, snap: Snapshot = Depends(map_snapshot),
+                                jobs: JobQueue = Depends(get_jobs)):
+    """
+    Файл как есть (application/octet-stream, можно chunked): книга Excel .xlsx или CSV/TXT
+    в любой из кодировок UTF-8/UTF-16 (с BOM)/CP1251. Тело не декодируется целиком:
+    xlsx читается потоково из zip, CSV — кусками с определением кодировки по ходу.
+    """
+    body = await _spool_body(request)
+    is_xlsx = body.read(4) == _XLSX_MAGIC
+    body.seek(0)
+
+    async def run(job: Job):
+        job.version = snap.version
+        # разбор идёт кусками внутри _preview_into (XlsxError — это ValueError: текст уйдёт в job.error)
+        try:
+            await _preview_into(job, iter_xlsx_records(body) if is_xlsx else iter_csv_bytes(_file_chunks(body)), snap)
+        finally:
+            body.close()
+    try:
+        return _submit(jobs, "preview", run)
+    except HTTPException:
+        body.close()
+        raise
+
+@api.post("/jobs/scrape")
+async def post_job_scrape(req: ScrapeRequest, snap: Snapshot = Depends(map_snapshot),
+                          engine: ScrapeEngine = Depends(get_scraper), jobs: JobQueue = Depends(get_jobs)):
     if not settings.WEB_SCRAPE_ENABLED:
         raise HTTPException(400, detail="WEB scraping is disabled. Set WEB_SCRAPE_ENABLED=1")
-    if req.source == "zp":
-        recs = scrape_zarplata(req.query, hospital=req.hospital, pages=req.pages)
-    else:
-        recs = scrape_hh(req.query, hospital=req.hospital, pages=req.pages)
-    items = preview_records(recs)
-    return PreviewResponse(items=items)
+    async def run(job: Job):
+        job.stage, job.version = "fetch", snap.version
+        recs, refs = await _scrape_records(req, engine)
+        await _preview_into(job, recs, snap, listings=refs)
+    return _submit(jobs, "scrape", run)
+
+def _job_or_404(jobs: JobQueue, job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, detail="Job not found or expired")
+    return job
+
+@api.get("/jobs/{job_id}")
+async def get_job(job_id: str, jobs: JobQueue = Depends(get_jobs)):
+    return _job_or_404(jobs, job_id).view()
+
+@api.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=5000),
+                          jobs: JobQueue = Depends(get_jobs)):
+    """Страница готовых PreviewItem; пока задача идёт, доступна уже обработанная часть."""
+    job = _job_or_404(jobs, job_id)
+    part = await asyncio.to_thread(job.items.__getitem__, slice(offset, offset + limit))
+    nxt = offset + len(part)
+    return {
+        "job_id": job.id, "status": job.status, "version": job.version, "items": part,
+        "offset": offset, "next_offset": nxt if nxt < len(job.items) or job.status in ("queued", "running") else None,
+    }
 
 @api.post("/chat", response_model=ChatResponse)
-def post_chat(req: ChatRequest):
-    if os.getenv("CHAT_ENABLED", "0") != "1":
+async def post_chat(req: ChatRequest, smalltalk: SmallTalk = Depends(get_smalltalk)):
+    if not settings.CHAT_ENABLED:
         raise HTTPException(400, detail="Chat is disabled. Set CHAT_ENABLED=1")
 
     intent = parse_intent_free_text(req.message)
@@ -192,27 +483,65 @@ def post_chat(req: ChatRequest):
         )
 
     # 3) Small talk
-    sys_prompt = (
-        "Ты — помощник HR-бота клиники. Отвечай кратко и дружелюбно. "
-        "Если спрашивают про вакансии/поиск — подскажи, что можно написать: "
-        "«найди на зарплата ру медсестёр в ОДКБ на 2 страницы», "
-        "и что перед записью нужна команда /use_table <TABLE_ID>."
-    )
-    resp = _oai.chat.completions.create(
-        model=settings.AGENT_MODEL,
-        messages=[
-            {"role": "system", "content": sys_prompt},
-            {"role": "user", "content": req.message.strip()},
-        ],
-        temperature=0.4,
-        max_tokens=200,
-    )
-    answer = resp.choices[0].message.content.strip()
+    answer = await smalltalk.reply(req.message)
     return ChatResponse(reply=answer, intent=intent)
 
-@api.get("/config")
-def get_config():
+@api.post("/admin/reload")
+def post_admin_reload():
+    """Перечитать agent-map.json и aliases.yml без рестарта."""
+    snap = registry.reload()
+    return {
+        "version": snap.version,
+        "selects": {k: len(v) for k, v in snap.selects.items()},
+        "multiselects": {k: len(v) for k, v in snap.multiselects.items()},
+        "aliases": len(snap.aliases),
+    }
+
+@api.post("/admin/meta/refresh")
+async def post_meta_refresh(table_id: str = Query(...), schema: SchemaCache = Depends(get_schema)):
+    """Перечитать колонки и варианты селектов таблицы из NocoDB прямо сейчас."""
+    meta = await schema.refresh(table_id)
     return {
+        "table_id": table_id,
+        "version": meta.snap.version,
+        "columns": len(meta.columns),
+        "selects": {k: len(v) for k, v in meta.allowed["selects"].items()},
+        "multiselects": {k: len(v) for k, v in meta.allowed["multiselects"].items()},
+    }
+
+@api.post("/admin/dedup/warm")
+async def post_dedup_warm(req: DedupWarmRequest, noco: AsyncNocoClient = Depends(get_noco),
+                          index: Optional[DedupIndex] = Depends(get_dedup)):
+    """Заполнить локальный индекс дублей строками, которые уже есть в таблице NocoDB."""
+    if index is None:
+        raise HTTPException(400, detail="Dedup index is disabled. Set DEDUP_ENABLED=1")
+    rows = await index.warm(noco, req.table_id, page_size=req.page_size)
+    return {"table_id": req.table_id, "rows": rows, "indexed": await asyncio.to_thread(index.count, req.table_id)}
+
+@api.delete("/admin/dedup/{table_id}")
+async def delete_dedup_table(table_id: str, index: Optional[DedupIndex] = Depends(get_dedup)):
+    """Забыть хэши таблицы: после ручной чистки в NocoDB записи снова пишутся, а не считаются дублями."""
+    if index is None:
+        raise HTTPException(400, detail="Dedup index is disabled. Set DEDUP_ENABLED=1")
+    return {"table_id": table_id, "dropped": await asyncio.to_thread(index.drop, table_id)}
+
+@api.get("/admin/scrape/cache")
+def get_scrape_cache(engine: ScrapeEngine = Depends(get_scraper)):
+    """Счётчики кэша страниц скрейпера: hit/miss/revalidated, занятый объём."""
+    if engine.cache is None:
+        raise HTTPException(400, detail="Scrape cache is disabled. Set SCRAPE_CACHE_ENABLED=1")
+    return engine.cache.report()
+
+@api.get("/admin/preview/cache")
+def get_preview_cache_report(cache: Optional[PreviewCache] = Depends(get_preview_cache)):
+    """Счётчики кэша ответов /preview."""
+    if cache is None:
+        raise HTTPException(400, detail="Preview cache is disabled. Set PREVIEW_CACHE_SIZE>0")
+    return cache.report()
+
+@api.get("/config")
+def get_config(if_none_match: Optional[str] = Header(None)):
+    body = json.dumps({
         "tz": settings.TZ,
         "model": settings.AGENT_MODEL,
         "nocodb_base": settings.NOCODB_BASE,
@@ -220,4 +549,9 @@ def get_config():
         "auto_write_enabled": settings.AUTO_WRITE_ENABLED,
         "preview_page_size": settings.PREVIEW_PAGE_SIZE,
         "agent_map_path": settings.AGENT_MAP_PATH,
-    }
+        "map_version": registry.get().version,
+    }, ensure_ascii=False).encode("utf-8")
+    etag = make_etag("config", body.decode("utf-8"))
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return _json_response(body, etag)
@@ -0,0 +1,137 @@
+from __future__ import annotations
+import asyncio, hashlib, json, logging, os, pathlib, sqlite3, threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .schema import Record, ALL_FIELDS, MULTI_FIELDS, F_REQ
+from .nocodb_client import AsyncNocoClient
+
+log = logging.getLogger("dedup")
+
+# Поля, по которым запись считается «той же вакансией». Требования — связь,
+# в листинге NocoDB её значения нет, поэтому в хэш не входят.
+_DIGEST_FIELDS = [f for f in ALL_FIELDS if f != F_REQ]
+_IN_CHUNK = 500   # лимит переменных в одном SQL IN (...)
+
+def dedup_digest(rec: Record) -> str:
+    """Канонический sha256 нормализованной записи; порядок значений в мультиселектах не важен."""
+    vals: List[Any] = []
+    for f in _DIGEST_FIELDS:
+        v = getattr(rec, f)
+        if f in MULTI_FIELDS and v:
+            v = sorted(v)
+        vals.append(v or None)
+    raw = json.dumps(vals, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DedupIndex:
+    """
+    Локальный индекс уже записанных вакансий: (table_id, digest) → Id строки в NocoDB.
+    SQLite-файл внутри контейнера, поэтому индекс переживает рестарт.
+    Поиск — по первичному ключу, O(1) на запись.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " table_id TEXT NOT NULL, digest TEXT NOT NULL, row_id TEXT,"
+            " PRIMARY KEY (table_id, digest)) WITHOUT ROWID"
+        )
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def lookup(self, table_id: str, digests: Iterable[str]) -> Dict[str, Optional[str]]:
+        """{digest: row_id} для уже известных хэшей."""
+        keys = list(dict.fromkeys(digests))
+        out: Dict[str, Optional[str]] = {}
+        with self._lock:
+            for k in range(0, len(keys), _IN_CHUNK):
+                part = keys[k:k + _IN_CHUNK]
+                q = f"SELECT digest, row_id FROM seen WHERE table_id = ? AND digest IN ({','.join('?' * len(part))})"
+                out.update(self._db.execute(q, [table_id, *part]).fetchall())
+        return out
+
+    def add(self, table_id: str, items: Iterable[Tuple[str, Any]]) -> None:
+        rows = [(table_id, d, None if rid is None else str(rid)) for d, rid in items]
+        if not rows:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO seen (table_id, digest, row_id) VALUES (?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+
+    def drop(self, table_id: str) -> int:
+        """Забыть все хэши таблицы (строки удалили/правили в NocoDB руками); вернуть, сколько было."""
+        with self._lock:
+            return self._db.execute("DELETE FROM seen WHERE table_id = ?", (table_id,)).rowcount
+
+    def replace(self, table_id: str, items: Iterable[Tuple[str, Any]]) -> None:
+        """Содержимое индекса таблицы целиком — одной транзакцией: читатели не видят его пустым."""
+        rows = [(table_id, d, None if rid is None else str(rid)) for d, rid in items]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DELETE FROM seen WHERE table_id = ?", (table_id,))
+                self._db.executemany("INSERT OR REPLACE INTO seen (table_id, digest, row_id) VALUES (?, ?, ?)", rows)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def count(self, table_id: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM seen WHERE table_id = ?", (table_id,)).fetchone()[0]
+
+    async def warm(self, client: AsyncNocoClient, table_id: str, page_size: int = 200) -> int:
+        """
+        Перестроить индекс таблицы по её текущим строкам (постранично через list_records).
+        Хэши строк, которых в NocoDB больше нет, из индекса уходят; до конца обхода
+        индекс отвечает по-старому, замена — одной транзакцией.
+        """
+        known = set(ALL_FIELDS)
+        offset = total = 0
+        items: List[Tuple[str, Any]] = []
+        while True:
+            page = await client.list_records(table_id, limit=page_size, offset=offset)
+            rows = page.get("list", []) if isinstance(page, dict) else (page or [])
+            for row in rows:
+                try:
+                    rec = Record(**{k: v for k, v in row.items() if k in known and k != F_REQ})
+                except ValidationError as e:
+                    log.warning("dedup.warm: skip row %s: %s", row.get("Id"), e)
+                    continue
+                items.append((dedup_digest(rec), row.get("Id") or row.get("id")))
+            total += len(rows)
+            last = page.get("pageInfo", {}).get("isLastPage") if isinstance(page, dict) else None
+            if not rows or last or (last is None and len(rows) < page_size):
+                break
+            offset += page_size
+        await asyncio.to_thread(self.replace, table_id, items)
+        log.info("dedup.warm table=%s rows=%d", table_id, total)
+        return total
+
+
+_indexes: Dict[str, DedupIndex] = {}
+_indexes_lock = threading.Lock()
+
+def open_index(path: str) -> DedupIndex:
+    """Индекс по пути (по одному соединению на путь)."""
+    with _indexes_lock:
+        idx = _indexes.get(path)
+        if idx is None:
+            idx = _indexes[path] = DedupIndex(path)
+        return idx
+
+def get_index() -> Optional[DedupIndex]:
+    """Индекс по DEDUP_DB_PATH для скриптов вне агента; None, если DEDUP_ENABLED=0."""
+    if os.getenv("DEDUP_ENABLED", "1") != "1":
+        return None
+    return open_index(os.getenv("DEDUP_DB_PATH", "data/dedup.sqlite3"))
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import logging, os, pathlib, sqlite3, threading, time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+log = logging.getLogger("http_cache")
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float          # time.time() последней загрузки/ревалидации
+
+    def validators(self) -> Dict[str, str]:
+        """Заголовки условного запроса."""
+        h: Dict[str, str] = {}
+        if self.etag:
+            h["If-None-Match"] = self.etag
+        if self.last_modified:
+            h["If-Modified-Since"] = self.last_modified
+        return h
+
+
+class HttpCache:
+    """
+    Дисковый кэш ответов скрейпера: URL (вместе с query) → тело + ETag/Last-Modified.
+    Свежие (моложе ttl) записи отдаются без сети; протухшие ревалидируются
+    условным запросом. Общий размер тел ограничен max_bytes, вытеснение — LRU.
+    """
+    def __init__(self, path: str, max_bytes: int = 64 << 20, ttl: float = 300.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = {"hit": 0, "miss": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+        if path != ":memory:":
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+            " size INTEGER NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used_at)")
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET used_at = ? WHERE url = ?", (time.time(), url))
+        return CachedResponse(url, *row)
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        return time.time() - entry.stored_at < self.ttl
+
+    def put(self, url: str, body: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        if not etag and not last_modified and self.ttl <= 0:
+            return   # ни свежести, ни валидаторов — хранить незачем
+        size = len(body.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, size, stored_at, used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", (url, body, etag, last_modified, size, now, now))
+            self.stats["stored"] += 1
+            self._evict()
+
+    def touch(self, url: str) -> None:
+        """304 Not Modified: тело прежнее, окно свежести начинается заново."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET stored_at = ?, used_at = ? WHERE url = ?", (now, now, url))
+
+    def size(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self._db.execute("SELECT url, size FROM responses ORDER BY used_at").fetchall():
+            self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self.stats["evicted"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def report(self) -> Dict[str, int]:
+        with self._lock:
+            entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {**self.stats, "entries": entries, "bytes": total, "max_bytes": self.max_bytes}
+
+
+_caches: Dict[str, HttpCache] = {}
+_caches_lock = threading.Lock()
+
+def open_cache(path: str, max_bytes: int, ttl: float) -> HttpCache:
+    """Кэш по пути (один на путь: соединение SQLite и счётчики общие)."""
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = HttpCache(path, max_bytes=max_bytes, ttl=ttl)
+        return cache
+
+def get_cache() -> Optional[HttpCache]:
+    """Кэш по SCRAPE_CACHE_PATH для скриптов вне агента; None, если SCRAPE_CACHE_ENABLED=0."""
+    if os.getenv("SCRAPE_CACHE_ENABLED", "1") != "1":
+        return None
+    return open_cache(os.getenv("SCRAPE_CACHE_PATH", "data/scrape_cache.sqlite3"),
+                      max_bytes=int(float(os.getenv("SCRAPE_CACHE_MAX_MB", "64")) * (1 << 20)),
+                      ttl=float(os.getenv("SCRAPE_CACHE_TTL_SEC", "300")))
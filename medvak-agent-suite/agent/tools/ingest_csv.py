@@ -1,46 +1,198 @@
 from __future__ import annotations
-import csv, io
-from typing import List
-from .schema import Record, F_TITLE, F_DEPT, F_ROLE, F_WORKER, F_SCHEDULE, F_SHIFT, F_TIME, F_SALARY, F_CONTACT, F_STATUS, F_REQ
+import codecs, csv, io, itertools, logging, re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .schema import Record, F_TITLE, F_DEPT, F_ROLE, F_WORKER, F_SCHEDULE, F_SHIFT, F_TIME, F_SALARY, F_CONTACT, F_STATUS, F_REQ, MULTI_FIELDS
 
 KNOWN = {
     F_TITLE, F_DEPT, F_ROLE, F_WORKER, F_SCHEDULE, F_SHIFT, F_TIME, F_SALARY, F_CONTACT, F_STATUS, F_REQ
 }
+DELIMITERS = (",", ";", "\t", "|")
+
+log = logging.getLogger("ingest")
+
+def detect_delimiter(csv_text: str, default: str = ",") -> str:
+    """
+    Разделитель — тот, что чаще всего встречается в строке заголовка (вне кавычек).
+    Дешевле csv.Sniffer и не путается на кириллице; при равенстве/нуле — default.
+    """
+    end = csv_text.find("\n")
+    header = csv_text[:end if end >= 0 else len(csv_text)]
+    if '"' in header:
+        header = "".join(header.split('"')[::2])
+    best, best_n = default, header.count(default)
+    for d in DELIMITERS:
+        n = header.count(d)
+        if n > best_n:
+            best, best_n = d, n
+    return best
+
+_STR, _MULTI, _REQ = 0, 1, 2
+
+def _projection(header: List[str]) -> List[Tuple[str, int, int]]:
+    """(поле, индекс колонки, тип) для известных колонок; при дублях побеждает последняя, как в DictReader."""
+    idx: Dict[str, int] = {}
+    for i, name in enumerate(header):
+        key = name.strip()
+        if key in KNOWN:
+            idx[key] = i
+    kind = lambda f: _MULTI if f in MULTI_FIELDS else _REQ if f == F_REQ else _STR
+    return [(f, i, kind(f)) for f, i in sorted(idx.items(), key=lambda kv: kv[1])]
+
+def _split_multi(v: str) -> Tuple[str, ...]:
+    # то же, что Record._ensure_list для строки
+    parts = [p.strip() for p in v.replace(";", ",").split(",") if p.strip()]
+    return tuple(parts or [v])
+
+def _split_req(v: str) -> Optional[List[int]]:
+    req = []
+    for t in v.replace(";", ",").split(","):
+        t = t.strip()
+        if t.isdigit():
+            req.append(int(t))
+    return req or None
 
 def parse_csv_text(csv_text: str, delimiter: str = ",") -> List[Record]:
     """
     Принимает текст CSV (включая кириллицу). Возвращает список Record.
     Неизвестные колонки игнорируем (схему не расширяем).
     """
-    buf = io.StringIO(csv_text)
-    # авто-детект разделителя, если вдруг ; используется
-    sniffer = csv.Sniffer()
-    sample = csv_text[:1024]
-    try:
-        dialect = sniffer.sniff(sample)
-        delim = dialect.delimiter
-    except Exception:
-        delim = delimiter
-
-    buf.seek(0)
-    reader = csv.DictReader(buf, delimiter=delim)
-    out: List[Record] = []
-    for row in reader:
-        payload = {}
-        for k, v in row.items():
-            if k is None:
-                continue
-            key = k.strip()
-            if key not in KNOWN:
+    return list(iter_csv_records(csv_text, delimiter))
+
+def iter_csv_records(csv_text: str, delimiter: str = ",") -> Iterator[Record]:
+    """То же, что parse_csv_text, но лениво: Record отдаётся по мере чтения строк."""
+    reader = csv.reader(io.StringIO(csv_text), delimiter=detect_delimiter(csv_text, delimiter))
+    return records_from_rows(reader)
+
+_SNIFF_BYTES = 4096
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+_BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be"))
+
+def iter_text_chunks(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Байты файла → текст по мере поступления. Кодировка определяется один раз:
+    BOM (UTF-8/UTF-16), иначе первые _SNIFF_BYTES после первого не-ASCII байта
+    пробуем как UTF-8, не вышло — CP1251 (как и раньше при декодировании целиком).
+    Пока идёт ASCII, текст отдаётся сразу: в обеих кодировках он одинаков.
+    Если UTF-8 по окну, а дальше встретился байт не из UTF-8 (склеенные выгрузки),
+    с этого места и до конца файла читаем CP1251. Уже отданный текст остаётся UTF-8 —
+    в отличие от прежнего декодирования целиком, где весь файл стал бы CP1251.
+    """
+    it = iter(chunks)
+    head = b""
+    for chunk in it:
+        head += chunk
+        if len(head) >= 3:
+            break
+    enc: Optional[str] = None
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            enc, head = name, head[len(bom):]
+            break
+    # UTF-8 без BOM определён только по окну — строгий декодер, чтобы заметить CP1251 дальше
+    sniffed = enc is None
+    pending = head
+    if enc is None:
+        # ASCII-префикс отдаём без ожидания, решение — по окну после первого не-ASCII байта
+        while True:
+            m = _NON_ASCII.search(pending)
+            if m is None:
+                if pending:
+                    yield pending.decode("ascii")
+                pending = next(it, None)
+                if pending is None:
+                    return
                 continue
-            payload[key] = (v or "").strip()
-        # Требования → список int
-        if F_REQ in payload and payload[F_REQ]:
-            req = []
-            for t in str(payload[F_REQ]).replace(";", ",").split(","):
-                t = t.strip()
-                if t.isdigit():
-                    req.append(int(t))
-            payload[F_REQ] = req or None
-        out.append(Record(**payload))
-    return out
+            if m.start():
+                yield pending[:m.start()].decode("ascii")
+                pending = pending[m.start():]
+            for chunk in it:
+                pending += chunk
+                if len(pending) >= _SNIFF_BYTES:
+                    break
+            try:
+                codecs.getincrementaldecoder("utf-8")().decode(pending[:_SNIFF_BYTES], final=len(pending) < _SNIFF_BYTES)
+                enc = "utf-8"
+            except UnicodeDecodeError:
+                enc = "cp1251"
+            break
+    dec = codecs.getincrementaldecoder(enc)(errors="strict" if sniffed and enc == "utf-8" else "replace")
+
+    def decode(data: bytes, final: bool = False) -> str:
+        nonlocal dec
+        try:
+            return dec.decode(data, final)
+        except UnicodeDecodeError as e:   # только строгий UTF-8: errors="replace" не бросает
+            # e.object — недекодированный хвост прошлого куска вместе с текущим
+            log.warning("ingest: not UTF-8 past the sniff window, reading the rest as CP1251")
+            raw = e.object
+            dec = codecs.getincrementaldecoder("cp1251")(errors="replace")
+            return raw[:e.start].decode("utf-8") + dec.decode(raw[e.start:], final)
+
+    for chunk in itertools.chain((pending,), it):
+        text = decode(chunk)
+        if text:
+            yield text
+    tail = decode(b"", final=True)
+    if tail:
+        yield tail
+
+def iter_lines(texts: Iterable[str]) -> Iterator[str]:
+    """Текст кусками → строки с '\n' на конце; \r\n и одиночный \r приводятся к \n (в т.ч. на стыке кусков)."""
+    buf = ""
+    for text in texts:
+        text = buf + text
+        cut = text.endswith("\r")              # «\r» в конце куска может оказаться половиной «\r\n»
+        if cut:
+            text = text[:-1]
+        lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        buf = lines.pop() + ("\r" if cut else "")
+        for line in lines:
+            yield line + "\n"
+    buf = buf.replace("\r", "\n")
+    if buf:
+        yield from (line + "\n" for line in buf.split("\n") if line)
+
+def iter_csv_bytes(chunks: Iterable[bytes], delimiter: str = ",") -> Iterator[Record]:
+    """
+    CSV-файл как поток байтов (загрузка без декодирования на стороне бота) → Record.
+    Кодировка, BOM и переводы строк обрабатываются по мере чтения; разделитель — по заголовку.
+    """
+    lines = iter_lines(iter_text_chunks(chunks))
+    header = next((ln for ln in lines if ln.strip()), None)   # пустые строки в начале пропускаем
+    if header is None:
+        return iter(())
+    reader = csv.reader(itertools.chain((header,), lines), delimiter=detect_delimiter(header, delimiter))
+    # строки только из пробелов (хвост файла) — не записи
+    return records_from_rows(row for row in reader if len(row) > 1 or (row and row[0].strip()))
+
+def records_from_rows(rows: Iterable[List[str]]) -> Iterator[Record]:
+    """
+    Табличные строки (первая — заголовок) → Record. Общий путь для CSV и XLSX:
+    проекция колонок считается один раз, значения уже приведены к типам схемы
+    (строки, списки строк, список int) — Record собираем без повторной валидации pydantic.
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    cols = _projection(header)
+    multi: Dict[str, Tuple[str, ...]] = {}
+    construct = Record.construct
+    for row in rows:
+        if not row:
+            continue
+        n = len(row)
+        payload = {}
+        for field, i, kind in cols:
+            v = row[i].strip() if i < n else ""
+            if kind == _MULTI:
+                parts = multi.get(v)
+                if parts is None:
+                    parts = multi[v] = _split_multi(v)
+                payload[field] = list(parts)
+            elif kind == _REQ:
+                # Требования → список int (пустая ячейка — None, а не ошибка валидации)
+                payload[field] = _split_req(v) if v else None
+            else:
+                payload[field] = v
+        yield construct(**payload)
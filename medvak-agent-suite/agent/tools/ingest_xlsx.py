@@ -0,0 +1,136 @@
+from __future__ import annotations
+import posixpath, zipfile
+from typing import IO, Iterator, List, Union
+from xml.etree.ElementTree import iterparse
+
+from .schema import Record
+from .ingest_csv import records_from_rows
+
+# XLSX без сторонних библиотек: zip + потоковый разбор XML листа.
+# Лист читается iterparse с очисткой разобранных строк — в памяти одна строка
+# таблицы, а не DOM листа; целиком держится только sharedStrings (он нужен
+# для произвольного доступа по индексу и обычно в разы меньше листа).
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_C, _V, _T, _IS, _ROW, _SI, _RPH = (_NS_MAIN + t for t in ("c", "v", "t", "is", "row", "si", "rPh"))
+
+Source = Union[str, IO[bytes]]
+
+
+class XlsxError(ValueError):
+    """Файл не похож на книгу Excel (.xlsx)."""
+
+
+def _col_index(ref: str) -> int:
+    """'C12' → 2."""
+    n = 0
+    for ch in ref:
+        if "A" <= ch <= "Z":
+            n = n * 26 + ord(ch) - 64
+        else:
+            break
+    return n - 1
+
+
+def _number(v: str) -> str:
+    # целые Excel хранит как «5» или «5.0» — в CSV это было бы «5»
+    if v.endswith(".0"):
+        v = v[:-2]
+    return v
+
+
+def _text(el) -> str:
+    # <si>/<is>: простой <t> или rich text из нескольких <r><t>; фонетика (<rPh>) не нужна
+    if el.find(_RPH) is None:
+        return "".join(t.text or "" for t in el.iter(_T))
+    return "".join(t.text or "" for r in el if r.tag != _RPH for t in r.iter(_T))
+
+
+def _shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    try:
+        f = zf.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    out: List[str] = []
+    with f:
+        root = None
+        for ev, el in iterparse(f, events=("start", "end")):
+            if root is None:
+                root = el
+            elif ev == "end" and el.tag == _SI:
+                out.append(_text(el))
+                root.clear()   # разобранные <si> не копятся в дереве
+    return out
+
+
+def _first_sheet(zf: zipfile.ZipFile) -> str:
+    """Путь первого листа по workbook.xml и его rels (имя файла листа не обязано быть sheet1.xml)."""
+    try:
+        with zf.open("xl/workbook.xml") as f:
+            rid = next((el.get(_NS_REL + "id") for _, el in iterparse(f) if el.tag == _NS_MAIN + "sheet"), None)
+        with zf.open("xl/_rels/workbook.xml.rels") as f:
+            for _, el in iterparse(f):
+                if el.tag == _NS_PKG_REL + "Relationship" and el.get("Id") == rid:
+                    target = el.get("Target", "")
+                    return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    except KeyError:
+        pass
+    return "xl/worksheets/sheet1.xml"
+
+
+def iter_xlsx_rows(source: Source) -> Iterator[List[str]]:
+    """Строки первого листа как списки строк (пропуски колонок — пустые строки)."""
+    try:
+        zf = zipfile.ZipFile(source)
+    except zipfile.BadZipFile as e:
+        raise XlsxError(f"not an xlsx file: {e}") from None
+    with zf:
+        shared = _shared_strings(zf)
+        try:
+            sheet = zf.open(_first_sheet(zf))
+        except KeyError:
+            raise XlsxError("workbook has no worksheets") from None
+        with sheet:
+            parent = None
+            for ev, el in iterparse(sheet, events=("start", "end")):
+                if ev == "start":
+                    if el.tag == _NS_MAIN + "sheetData":
+                        parent = el
+                    continue
+                if el.tag != _ROW:
+                    continue
+                row: List[str] = []
+                for c in el.iter(_C):
+                    ref = c.get("r")
+                    if ref:
+                        i = _col_index(ref)
+                        if i > len(row):
+                            row.extend([""] * (i - len(row)))
+                    t = c.get("t")
+                    if t == "inlineStr":
+                        is_ = c.find(_IS)
+                        val = _text(is_) if is_ is not None else ""
+                    else:
+                        v = c.find(_V)
+                        val = v.text or "" if v is not None else ""
+                        if t == "s" and val:
+                            val = shared[int(val)]
+                        elif t == "b":
+                            val = "TRUE" if val == "1" else "FALSE"
+                        elif t in (None, "n") and val:
+                            val = _number(val)
+                    row.append(val)
+                if parent is not None:
+                    parent.clear()   # в дереве остаётся не больше одной строки
+                yield row
+
+
+def iter_xlsx_records(source: Source) -> Iterator[Record]:
+    """XLSX → Record по мере чтения листа: первая строка — заголовок, как в CSV."""
+    return records_from_rows(r for r in iter_xlsx_rows(source) if any(r))
+
+
+def parse_xlsx(source: Source) -> List[Record]:
+    return list(iter_xlsx_records(source))
@@ -0,0 +1,97 @@
+from __future__ import annotations
+import asyncio, logging, time, uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+log = logging.getLogger("jobs")
+
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+
+
+@dataclass
+class Job:
+    """Фоновая задача: прогресс (done/total, stage) и накопленные результаты."""
+    id: str
+    kind: str
+    status: str = QUEUED
+    stage: str = ""
+    done: int = 0
+    total: Optional[int] = None
+    version: Optional[str] = None
+    error: Optional[str] = None
+    items: List[Any] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def view(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id, "kind": self.kind, "status": self.status, "stage": self.stage,
+            "done": self.done, "total": self.total, "results": len(self.items),
+            "version": self.version, "error": self.error,
+            "created_at": self.created_at, "started_at": self.started_at, "finished_at": self.finished_at,
+        }
+
+
+JobFn = Callable[[Job], Awaitable[None]]
+
+
+class JobQueue:
+    """
+    Внутрипроцессная очередь задач: submit() сразу отдаёт Job, выполняют её
+    workers фоновых корутин. Очередь ограничена max_pending (переполнение —
+    asyncio.QueueFull); завершённые задачи удаляются через ttl секунд.
+    """
+    def __init__(self, workers: int = 2, ttl: float = 3600.0, max_pending: int = 100):
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker(n)) for n in range(self.workers)]
+
+    async def aclose(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, kind: str, fn: JobFn) -> Job:
+        self._sweep()
+        job = Job(id=uuid.uuid4().hex, kind=kind)
+        self._queue.put_nowait((job, fn))
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._sweep()
+        return self._jobs.get(job_id)
+
+    def _sweep(self) -> None:
+        cutoff = time.time() - self.ttl
+        for jid in [j.id for j in self._jobs.values() if j.finished_at is not None and j.finished_at < cutoff]:
+            del self._jobs[jid]
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job, fn = await self._queue.get()
+            job.status, job.started_at = RUNNING, time.time()
+            try:
+                await fn(job)
+                job.status = DONE
+            except asyncio.CancelledError:
+                job.status, job.error = ERROR, "cancelled"
+                raise
+            except Exception as e:
+                log.exception("job %s (%s) failed", job.id, job.kind)
+                job.status, job.error = ERROR, str(e)
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+            log.info("job %s kind=%s status=%s done=%s worker=%d sec=%.2f", job.id, job.kind, job.status,
+                     job.done, n, job.finished_at - job.started_at)
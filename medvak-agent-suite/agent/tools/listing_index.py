@@ -0,0 +1,132 @@
+from __future__ import annotations
+import hashlib, logging, os, pathlib, sqlite3, threading, time
+from typing import Dict, Iterable, List, Optional
+
+from .scrape_engine import Listing
+
+log = logging.getLogger("listing_index")
+
+_IN_CHUNK = 500   # лимит переменных в одном SQL IN (...)
+_PENDING_TTL = 7 * 86400   # показанные, но не записанные карточки помним неделю
+
+
+def listing_fingerprint(it: Listing) -> str:
+    """Отпечаток содержимого карточки: поменялся — вакансию показываем снова."""
+    raw = "\x1f".join((it.title, it.employer, it.salary, it.address))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class ListingIndex:
+    """
+    Уже импортированные карточки выдачи по источнику (zp, hh): id → отпечаток.
+    SQLite-файл, переживает рестарт; по нему инкрементальный скрейп
+    отбрасывает неизменившиеся вакансии и останавливает пагинацию.
+
+    Скрейп только запоминает показанные карточки (pending); в listings они попадают
+    после успешного /write, которому бот вернул Listing.ref карточки
+    (PreviewItem.listing). Показанное, но не записанное, возвращается снова.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            " source TEXT NOT NULL, listing_id TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " url TEXT, seen_at REAL NOT NULL,"
+            " PRIMARY KEY (source, listing_id)) WITHOUT ROWID"
+        )
+        if "title" in {r[1] for r in self._db.execute("PRAGMA table_info(pending)")}:
+            # pending прежнего формата (ключ — Title записи): там только недельные показы, не жалко
+            self._db.execute("DROP TABLE pending")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            " source TEXT NOT NULL, listing_id TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " url TEXT, seen_at REAL NOT NULL,"
+            " PRIMARY KEY (source, listing_id)) WITHOUT ROWID"
+        )
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _known(self, source: str, ids: List[str]) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        with self._lock:
+            for k in range(0, len(ids), _IN_CHUNK):
+                part = ids[k:k + _IN_CHUNK]
+                q = (f"SELECT listing_id, fingerprint FROM listings"
+                     f" WHERE source = ? AND listing_id IN ({','.join('?' * len(part))})")
+                out.update(self._db.execute(q, [source, *part]).fetchall())
+        return out
+
+    def changed(self, source: str, listings: Iterable[Listing]) -> List[Listing]:
+        """Новые карточки и те, у которых поменялся отпечаток (порядок сохраняется)."""
+        items = list(listings)
+        known = self._known(source, [it.id for it in items])
+        return [it for it in items if known.get(it.id) != listing_fingerprint(it)]
+
+    def mark(self, source: str, listings: Iterable[Listing]) -> None:
+        """Считать карточки импортированными (сразу, минуя pending)."""
+        now = time.time()
+        rows = [(source, it.id, listing_fingerprint(it), it.url, now) for it in listings]
+        if not rows:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO listings (source, listing_id, fingerprint, url, seen_at)"
+                " VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+
+    def remember(self, source: str, listings: Iterable[Listing]) -> None:
+        """Карточки, показанные в preview: ждут /write, в changed() пока не учитываются."""
+        now = time.time()
+        rows = [(source, it.id, listing_fingerprint(it), it.url, now) for it in listings]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM pending WHERE seen_at < ?", (now - _PENDING_TTL,))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO pending (source, listing_id, fingerprint, url, seen_at)"
+                " VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+
+    def mark_imported(self, refs: Iterable[Optional[str]]) -> int:
+        """Карточки Listing.ref, чьи записи ушли в NocoDB, — в listings. Возвращает число карточек."""
+        keys = sorted({tuple(r.split(":", 1)) for r in refs if r and ":" in r})
+        now = time.time()
+        moved = 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            for key in keys:
+                moved += self._db.execute(
+                    "INSERT OR REPLACE INTO listings (source, listing_id, fingerprint, url, seen_at)"
+                    " SELECT source, listing_id, fingerprint, url, ? FROM pending"
+                    " WHERE source = ? AND listing_id = ?", (now, *key)).rowcount
+            self._db.executemany("DELETE FROM pending WHERE source = ? AND listing_id = ?", keys)
+            self._db.execute("COMMIT")
+        return moved
+
+    def count(self, source: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM listings WHERE source = ?", (source,)).fetchone()[0]
+
+
+_indexes: Dict[str, ListingIndex] = {}
+_indexes_lock = threading.Lock()
+
+def open_listing_index(path: str) -> ListingIndex:
+    """Индекс по пути (один на путь: соединение SQLite общее)."""
+    with _indexes_lock:
+        idx = _indexes.get(path)
+        if idx is None:
+            idx = _indexes[path] = ListingIndex(path)
+        return idx
+
+def get_listing_index() -> Optional[ListingIndex]:
+    """Индекс по SCRAPE_SEEN_DB_PATH для скриптов вне агента; None, если SCRAPE_INCREMENTAL=0."""
+    if os.getenv("SCRAPE_INCREMENTAL", "1") != "1":
+        return None
+    return open_listing_index(os.getenv("SCRAPE_SEEN_DB_PATH", "data/listings.sqlite3"))
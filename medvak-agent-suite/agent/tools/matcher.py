@@ -0,0 +1,100 @@
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Ключевые слова источников и должностей для разбора свободного текста.
+# Порядок источников важен: при упоминании обоих выигрывает zarplata (как раньше).
+SOURCE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "zp": ("зарплата", "zarplata", "zp", "зарплата.ру", "зарплата ру"),
+    "hh": ("hh", "headhunter", "хх", "хэдхантер"),
+}
+ROLE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "медсестра": ("медсестр",),
+}
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо–Корасик: все вхождения всех шаблонов за один проход по тексту.
+    Шаблоны и текст сравниваются как есть — регистр приводит вызывающий.
+    """
+    def __init__(self, patterns: List[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, Any]]] = [[]]
+        for pat, payload in patterns:
+            if pat:
+                self._add(pat, payload)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def _add(self, pat: str, payload: Any) -> None:
+        node = 0
+        for ch in pat:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((pat, payload))
+
+    def _link(self) -> None:
+        q = deque(self._goto[0].values())
+        while q:
+            node = q.popleft()
+            for ch, nxt in self._goto[node].items():
+                q.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0   # у детей корня fail — корень
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str, Any]]:
+        """(индекс конца, шаблон, payload) для каждого вхождения."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pat, payload in out[node]:
+                yield i, pat, payload
+
+
+@dataclass
+class IntentHits:
+    source: Optional[str] = None
+    role: Optional[str] = None
+    hospital: Optional[str] = None
+
+
+class IntentMatcher:
+    """
+    Один автомат на алиасы больниц/отделений, источники и должности.
+    При нескольких совпадениях одного вида выигрывает то, что раньше
+    в словаре (порядок aliases.yml, SOURCE_KEYWORDS) — как при старом переборе.
+    """
+    def __init__(self, aliases: Dict[str, str]):
+        pats: List[Tuple[str, Any]] = []
+        for rank, src in enumerate(SOURCE_KEYWORDS):
+            pats += [(w, ("source", rank, src)) for w in SOURCE_KEYWORDS[src]]
+        for rank, role in enumerate(ROLE_KEYWORDS):
+            pats += [(w, ("role", rank, role)) for w in ROLE_KEYWORDS[role]]
+        pats += [(k.lower(), ("hospital", rank, v)) for rank, (k, v) in enumerate(aliases.items())]
+        self._ac = AhoCorasick(pats)
+
+    def scan(self, text: str) -> IntentHits:
+        best: Dict[str, Tuple[int, str]] = {}
+        for _, _, (kind, rank, value) in self._ac.iter_matches(text.lower()):
+            cur = best.get(kind)
+            if cur is None or rank < cur[0]:
+                best[kind] = (rank, value)
+        return IntentHits(**{k: v for k, (_, v) in best.items()})
@@ -0,0 +1,138 @@
+from __future__ import annotations
+import asyncio, logging, time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+from .schema import AllowedMap, SINGLE_FIELDS, MULTI_FIELDS
+from .registry import DictRegistry, Snapshot, registry
+from .nocodb_client import AsyncNocoClient
+
+log = logging.getLogger("meta")
+
+_SELECT_TYPES = {"SingleSelect": "selects", "MultiSelect": "multiselects"}
+
+
+def _column_options(col: Dict[str, Any]) -> List[str]:
+    """Варианты Single/MultiSelect: colOptions.options (v2) или dtxp "'a','b'" (старые версии)."""
+    opts = ((col.get("colOptions") or {}).get("options")) or []
+    if opts:
+        return [str(o.get("title", "")).strip() for o in opts if o.get("title")]
+    dtxp = col.get("dtxp") or ""
+    return [p.strip().strip("'\"") for p in str(dtxp).split(",") if p.strip().strip("'\"")]
+
+
+def allowed_from_columns(columns: Iterable[Dict[str, Any]]) -> AllowedMap:
+    """AllowedMap из метаданных колонок NocoDB — только поля нашей схемы."""
+    out: AllowedMap = {"selects": {}, "multiselects": {}}
+    for col in columns:
+        kind = _SELECT_TYPES.get(col.get("uidt", ""))
+        name = col.get("title") or col.get("column_name")
+        if not kind or not name:
+            continue
+        if name not in (SINGLE_FIELDS if kind == "selects" else MULTI_FIELDS):
+            continue
+        out[kind][name] = sorted(set(_column_options(col)))
+    return out
+
+
+@dataclass
+class TableMeta:
+    columns: List[Dict[str, Any]]
+    names: FrozenSet[str]
+    allowed: AllowedMap
+    snap: Snapshot
+    base_version: str           # версия файлового снимка (алиасы), из которого собран snap
+    fetched_at: float = field(default_factory=time.monotonic)
+
+
+class SchemaCache:
+    """
+    Кэш метаданных таблиц NocoDB: колонки и варианты Single/MultiSelect → AllowedMap/Snapshot.
+    TTL + stale-while-revalidate: протухшая запись отдаётся сразу, а обновление идёт
+    фоновой задачей (одна на таблицу), поэтому медленный /columns не попадает в /preview.
+    """
+    def __init__(self, client: AsyncNocoClient, ttl: float = 300.0, base: DictRegistry = registry):
+        self.client = client
+        self.ttl = ttl
+        self.base = base
+        self._meta: Dict[str, TableMeta] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def peek(self, table_id: str) -> Optional[TableMeta]:
+        return self._meta.get(table_id)
+
+    async def refresh(self, table_id: str) -> TableMeta:
+        """Обновить сейчас (single-flight: параллельные вызовы ждут один запрос)."""
+        task = self._inflight.get(table_id)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(table_id))
+            self._inflight[table_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(table_id, None))
+        return await asyncio.shield(task)
+
+    async def get(self, table_id: str) -> TableMeta:
+        """Метаданные, дожидаясь первой загрузки; дальше — по правилам snapshot_nowait."""
+        meta = self._meta.get(table_id)
+        if meta is None:
+            return await self.refresh(table_id)
+        self._revalidate_if_stale(table_id, meta)
+        return meta
+
+    def snapshot_nowait(self, table_id: str) -> Optional[Snapshot]:
+        """
+        Снимок для preview без ожидания сети. None — метаданных ещё нет
+        (загрузка уже запущена в фоне), вызывающий берёт файловый registry.
+        """
+        meta = self._meta.get(table_id)
+        if meta is None:
+            self._kick(table_id)
+            return None
+        self._revalidate_if_stale(table_id, meta)
+        base = self.base.get()
+        if base.version != meta.base_version:
+            # поменялись алиасы — пересобираем снимок локально, без запроса в NocoDB
+            meta.snap, meta.base_version = self.base.derive(meta.allowed), base.version
+        return meta.snap
+
+    def unknown_keys(self, table_id: str, payload: Dict[str, Any]) -> List[str]:
+        """Ключи payload, которых нет среди колонок таблицы ([] — если схема ещё не загружена)."""
+        meta = self._meta.get(table_id)
+        if meta is None:
+            return []
+        return [k for k in payload if k not in meta.names]
+
+    def _revalidate_if_stale(self, table_id: str, meta: TableMeta) -> None:
+        if time.monotonic() - meta.fetched_at > self.ttl:
+            self._kick(table_id)
+
+    def _kick(self, table_id: str) -> None:
+        if table_id in self._inflight:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._fetch(table_id))
+        self._inflight[table_id] = task
+        task.add_done_callback(lambda t: self._done(table_id, t))
+
+    def _done(self, table_id: str, task: asyncio.Task) -> None:
+        self._inflight.pop(table_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("meta.refresh table=%s failed: %s", table_id, task.exception())
+
+    async def _fetch(self, table_id: str) -> TableMeta:
+        raw = await self.client.columns(table_id)
+        columns = raw.get("columns", raw.get("list", [])) if isinstance(raw, dict) else list(raw or [])
+        allowed = allowed_from_columns(columns)
+        base = self.base.get()
+        meta = TableMeta(
+            columns=columns,
+            names=frozenset(c.get("title") or c.get("column_name") for c in columns),
+            allowed=allowed,
+            snap=self.base.derive(allowed),
+            base_version=base.version,
+        )
+        self._meta[table_id] = meta
+        log.info("meta.refresh table=%s columns=%d version=%s", table_id, len(columns), meta.snap.version)
+        return meta
@@ -1,82 +1,291 @@
 from __future__ import annotations
-import os, httpx, logging
-from typing import Any, Dict, List, Optional
+import asyncio, os, random, threading, time, httpx, logging
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar
 
 log = logging.getLogger("nocodb")
 
-class NocoClient:
+T = TypeVar("T")
+
+# статусы, на которых повторяем и POST: сервер явно не брал запрос в работу.
+# 502/504 сюда не входят — прокси мог отдать их, когда Noco уже вставил строки.
+_RETRY_ALWAYS = {429, 503}
+
+LINK_PATCH = "patch"    # PATCH записи с полем-связью
+LINK_POST = "links"     # POST /records/{id}/links/{rel}
+LINK_ORDER = (LINK_PATCH, LINK_POST)
+
+
+class LinkStrategyCache:
+    """
+    Какой способ линковки сработал для (table_id, rel_name).
+    Запись живёт ttl секунд и сбрасывается, как только способ перестал работать,
+    — тогда следующая строка снова перебирает варианты.
+    """
+    def __init__(self, ttl: float = 3600.0):
+        self.ttl = ttl
+        self._data: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, table_id: str, rel_name: str) -> Optional[str]:
+        with self._lock:
+            hit = self._data.get((table_id, rel_name))
+            if hit is None:
+                return None
+            if hit[1] < time.monotonic():
+                del self._data[(table_id, rel_name)]
+                return None
+            return hit[0]
+
+    def set(self, table_id: str, rel_name: str, strategy: str) -> None:
+        with self._lock:
+            self._data[(table_id, rel_name)] = (strategy, time.monotonic() + self.ttl)
+
+    def reset(self, table_id: str, rel_name: str) -> None:
+        with self._lock:
+            self._data.pop((table_id, rel_name), None)
+
+    def order(self, table_id: str, rel_name: str) -> Tuple[str, ...]:
+        known = self.get(table_id, rel_name)
+        if known is None:
+            return LINK_ORDER
+        return (known,) + tuple(s for s in LINK_ORDER if s != known)
+
+
+# общий на процесс: синхронные клиенты создаются на каждый вызов и сами его не удержат.
+# ttl агент выставляет при старте из settings.LINK_STRATEGY_TTL_SEC
+link_strategies = LinkStrategyCache()
+
+class AsyncNocoClient:
+    """
+    Клиент NocoDB v2 на httpx.AsyncClient (NocoClient — синхронная обёртка над ним).
+    Создаётся один раз на процесс (см. agent/app.py) и держит keep-alive пул,
+    поэтому запросы не платят за новый TCP/TLS-хендшейк.
+    """
     def __init__(self, base: str, token: str, timeout: float = 20.0,
-                 max_conn: int = 4, max_keepalive: int = 2):
+                 max_conn: int = 4, max_keepalive: int = 2, http2: bool = False,
+                 retry_attempts: int = 3, retry_backoff_base: float = 0.7):
         limits = httpx.Limits(max_connections=max_conn, max_keepalive_connections=max_keepalive)
-        self._client = httpx.Client(base_url=base.rstrip("/"), timeout=timeout, limits=limits)
+        if http2:
+            try:
+                import h2  # noqa: F401  (httpx[http2])
+            except ImportError:
+                log.warning("HTTPX_HTTP2=1, но пакет h2 не установлен — работаем по HTTP/1.1")
+                http2 = False
+        self._client = httpx.AsyncClient(base_url=base.rstrip("/"), timeout=timeout, limits=limits, http2=http2)
         self._hdr = {"xc-token": token}
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_backoff_base = retry_backoff_base
+        self._probe_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
 
-    def close(self):
-        self._client.close()
+    async def aclose(self):
+        await self._client.aclose()
+
+    def _backoff(self, attempt: int, resp: Optional[httpx.Response] = None) -> float:
+        if resp is not None and resp.status_code in _RETRY_ALWAYS:
+            try:
+                # Retry-After уважаем, но не дольше, чем заняли бы все попытки по экспоненте
+                cap = self.retry_backoff_base * (2 ** self.retry_attempts)
+                return max(0.0, min(float(resp.headers.get("Retry-After", "")), cap))
+            except ValueError:
+                pass
+        # экспоненциально с джиттером: base * 2^n * [0.5; 1.5)
+        return self.retry_backoff_base * (2 ** attempt) * (0.5 + random.random())
+
+    async def _send(self, method: str, url: str, **kw: Any) -> httpx.Response:
+        """
+        Запрос с повторами на 429/5xx и сетевых сбоях (RETRY_ATTEMPTS, RETRY_BACKOFF_BASE).
+        POST не идемпотентен: его повторяем только если запрос точно не дошёл
+        (ошибка соединения) или сервер явно ответил 429/503.
+        """
+        idempotent = method != "POST"
+        for attempt in range(self.retry_attempts):
+            last = attempt == self.retry_attempts - 1
+            try:
+                r = await self._client.request(method, url, **kw)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                if last:
+                    raise
+                log.warning("NocoDB %s %s: %s — retry %d", method, url, e, attempt + 1)
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            except httpx.TimeoutException as e:
+                if last or not idempotent:
+                    raise
+                log.warning("NocoDB %s %s: %s — retry %d", method, url, e, attempt + 1)
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            retryable = r.status_code in _RETRY_ALWAYS or (idempotent and r.status_code >= 500)
+            if not retryable or last:
+                return r
+            log.warning("NocoDB %s %s: %s — retry %d", method, url, r.status_code, attempt + 1)
+            await asyncio.sleep(self._backoff(attempt, r))
+        raise AssertionError("unreachable")
 
     # ----- metadata -----
-    def columns(self, table_id: str) -> List[Dict[str, Any]]:
-        r = self._client.get(f"/tables/{table_id}/columns", headers=self._hdr)
+    async def columns(self, table_id: str) -> List[Dict[str, Any]]:
+        r = await self._send("GET", f"/tables/{table_id}/columns")
         r.raise_for_status()
         return r.json()
 
     # ----- records -----
-    def list_records(self, table_id: str, limit: int = 50, offset: int = 0) -> Any:
-        r = self._client.get(f"/tables/{table_id}/records", headers=self._hdr,
+    async def list_records(self, table_id: str, limit: int = 50, offset: int = 0) -> Any:
+        r = await self._send("GET", f"/tables/{table_id}/records",
                              params={"limit": limit, "offset": offset})
         r.raise_for_status()
         return r.json()
 
-    def create_record(self, table_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-        r = self._client.post(f"/tables/{table_id}/records", headers=self._hdr, json=payload)
+    async def create_record(self, table_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        r = await self._send("POST", f"/tables/{table_id}/records", json=payload)
         if r.status_code >= 400:
             log.error("NocoDB create error %s: %s", r.status_code, r.text)
         r.raise_for_status()
         return r.json()
 
-    def patch_record(self, table_id: str, row_id: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
-        r = self._client.patch(f"/tables/{table_id}/records/{row_id}", headers=self._hdr, json=payload)
+    async def create_records(self, table_id: str, payloads: List[Dict[str, Any]],
+                             chunk_size: int = 100) -> List[Dict[str, Any]]:
+        """
+        Пакетная вставка: POST /records со списком в теле, кусками по chunk_size.
+        Возвращает список той же длины, что payloads: ответ NocoDB для строки
+        (обычно {"Id": ...}) или {"error": "..."} для упавших.
+        Если кусок отклонён целиком (Noco вставляет пакет в транзакции),
+        повторяем его построчно, чтобы понять, какие именно строки плохие.
+        """
+        out: List[Dict[str, Any]] = []
+        for start in range(0, len(payloads), max(1, chunk_size)):
+            chunk = payloads[start:start + chunk_size]
+            r = await self._send("POST", f"/tables/{table_id}/records", json=chunk)
+            if r.status_code // 100 == 2:
+                rows = r.json()
+                if isinstance(rows, dict):
+                    rows = [rows]
+                if isinstance(rows, list) and len(rows) == len(chunk):
+                    out.extend(row if isinstance(row, dict) else {"Id": row} for row in rows)
+                    continue
+                log.warning("NocoDB bulk create: unexpected response for %d rows: %s", len(chunk), r.text[:200])
+                out.extend({"error": "bulk_response_mismatch"} for _ in chunk)
+                continue
+            if r.status_code == 429 or r.status_code >= 500:
+                # повторы в _send исчерпаны, а после 502/504 пакет мог и вставиться —
+                # построчный повтор дал бы дубли
+                log.error("NocoDB bulk create error %s: %s", r.status_code, r.text[:200])
+                out.extend({"error": f"HTTP {r.status_code}"} for _ in chunk)
+                continue
+            log.warning("NocoDB bulk create error %s: %s — retrying row by row", r.status_code, r.text[:200])
+            for payload in chunk:
+                try:
+                    out.append(await self.create_record(table_id, payload))
+                except httpx.HTTPError as e:
+                    out.append({"error": str(e)})
+        return out
+
+    async def patch_record(self, table_id: str, row_id: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
+        r = await self._send("PATCH", f"/tables/{table_id}/records/{row_id}", json=payload)
         if r.status_code >= 400:
             log.error("NocoDB patch error %s: %s", r.status_code, r.text)
         r.raise_for_status()
         return r.json()
 
     # ----- links -----
-    def link_requirements(self, table_id: str, rel_name: str, row_id: Any, req_ids: List[int]) -> bool:
+    async def _link_via(self, strategy: str, table_id: str, rel_name: str, row_id: Any, req_ids: List[int]) -> bool:
+        try:
+            if strategy == LINK_PATCH:
+                r = await self._send("PATCH", f"/tables/{table_id}/records/{row_id}",
+                                     json={rel_name: [{"id": rid} for rid in req_ids]})
+            else:
+                r = await self._send("POST", f"/tables/{table_id}/records/{row_id}/links/{rel_name}",
+                                     json={"add": req_ids})
+            if r.status_code // 100 == 2:
+                return True
+            log.warning("Link via %s failed %s: %s", strategy, r.status_code, r.text)
+        except Exception as e:
+            log.warning("Link via %s exception: %s", strategy, e)
+        return False
+
+    async def link_requirements(self, table_id: str, rel_name: str, row_id: Any, req_ids: List[int]) -> bool:
         """
         Пробуем самые распространённые варианты API линковки.
         1) PATCH записью поля-связи (Noco умеет, если связь M2M названа колонкой)
         2) POST в /records/{id}/links/{relation} (некоторые версии v2)
+        Сработавший способ запоминаем в link_strategies: дальше — один запрос на строку.
         Возвращаем True, если один из способов прошёл 2xx.
         """
-        # 1) PATCH через поле-связь
-        try:
-            payload = {rel_name: [{"id": rid} for rid in req_ids]}
-            r = self._client.patch(f"/tables/{table_id}/records/{row_id}", headers=self._hdr, json=payload)
-            if r.status_code // 100 == 2:
-                return True
-            log.warning("Link via PATCH failed %s: %s", r.status_code, r.text)
-        except Exception as e:
-            log.warning("Link via PATCH exception: %s", e)
+        if link_strategies.get(table_id, rel_name) is None:
+            # способ неизвестен: перебирает одна корутина, остальные ждут её результата,
+            # чтобы параллельные строки не платили каждая за неудачную попытку
+            lock = self._probe_locks.setdefault((table_id, rel_name), asyncio.Lock())
+            async with lock:
+                return await self._link_ordered(table_id, rel_name, row_id, req_ids)
+        return await self._link_ordered(table_id, rel_name, row_id, req_ids)
 
-        # 2) Через отдельный endpoint ссылок (если включён)
-        try:
-            r = self._client.post(
-                f"/tables/{table_id}/records/{row_id}/links/{rel_name}",
-                headers=self._hdr, json={"add": req_ids}
-            )
-            if r.status_code // 100 == 2:
+    async def _link_ordered(self, table_id: str, rel_name: str, row_id: Any, req_ids: List[int]) -> bool:
+        for strategy in link_strategies.order(table_id, rel_name):
+            if await self._link_via(strategy, table_id, rel_name, row_id, req_ids):
+                link_strategies.set(table_id, rel_name, strategy)
                 return True
-            log.warning("Link via /links failed %s: %s", r.status_code, r.text)
-        except Exception as e:
-            log.warning("Link via /links exception: %s", e)
+            link_strategies.reset(table_id, rel_name)
         return False
 
 
+class NocoClient:
+    """
+    Синхронная обёртка над AsyncNocoClient для скриптов и вызовов вне event loop:
+    запросы, повторы и перебор способов линковки — те же. У клиента свой event loop
+    (asyncio.Runner), поэтому из работающего loop его не вызывают — там AsyncNocoClient.
+    """
+    def __init__(self, base: str, token: str, timeout: float = 20.0,
+                 max_conn: int = 4, max_keepalive: int = 2, **kw: Any):
+        self._runner = asyncio.Runner()
+        self._async = AsyncNocoClient(base, token, timeout=timeout, max_conn=max_conn,
+                                      max_keepalive=max_keepalive, **kw)
+
+    def _run(self, coro: Awaitable[T]) -> T:
+        return self._runner.run(coro)
+
+    def close(self):
+        try:
+            self._run(self._async.aclose())
+        finally:
+            self._runner.close()
+
+    def columns(self, table_id: str) -> List[Dict[str, Any]]:
+        return self._run(self._async.columns(table_id))
+
+    def list_records(self, table_id: str, limit: int = 50, offset: int = 0) -> Any:
+        return self._run(self._async.list_records(table_id, limit=limit, offset=offset))
+
+    def create_record(self, table_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._run(self._async.create_record(table_id, payload))
+
+    def create_records(self, table_id: str, payloads: List[Dict[str, Any]],
+                       chunk_size: int = 100) -> List[Dict[str, Any]]:
+        """См. AsyncNocoClient.create_records."""
+        return self._run(self._async.create_records(table_id, payloads, chunk_size=chunk_size))
+
+    def patch_record(self, table_id: str, row_id: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._run(self._async.patch_record(table_id, row_id, payload))
+
+    def link_requirements(self, table_id: str, rel_name: str, row_id: Any, req_ids: List[int]) -> bool:
+        """См. AsyncNocoClient.link_requirements."""
+        return self._run(self._async.link_requirements(table_id, rel_name, row_id, req_ids))
+
+
+def _env_kwargs(kind: str) -> Dict[str, Any]:
+    # для скриптов и тестов вне агента; сам агент строит клиент из agent.config.settings (см. app.py)
+    return {
+        "base": os.getenv("NOCODB_BASE", "").rstrip("/"),
+        "token": os.getenv("NOCODB_TOKEN_VAC" if kind == "VAC" else "NOCODB_TOKEN_STAT", ""),
+        "max_conn": int(os.getenv("HTTPX_MAX_CONN", "4")),
+        "max_keepalive": int(os.getenv("HTTPX_MAX_KEEPALIVE", "2")),
+        "timeout": float(os.getenv("REQUEST_TIMEOUT_SEC", "20")),
+        "http2": os.getenv("HTTPX_HTTP2", "0") == "1",
+        "retry_attempts": int(os.getenv("RETRY_ATTEMPTS", "3")),
+        "retry_backoff_base": float(os.getenv("RETRY_BACKOFF_BASE", "0.7")),
+    }
+
+
+def async_from_env(kind: str = "VAC") -> AsyncNocoClient:
+    return AsyncNocoClient(**_env_kwargs(kind))
+
+
 def from_env(kind: str = "VAC") -> NocoClient:
-    base = os.getenv("NOCODB_BASE", "").rstrip("/")
-    token = os.getenv("NOCODB_TOKEN_VAC" if kind == "VAC" else "NOCODB_TOKEN_STAT", "")
-    max_conn = int(os.getenv("HTTPX_MAX_CONN", "4"))
-    max_keep = int(os.getenv("HTTPX_MAX_KEEPALIVE", "2"))
-    timeout = float(os.getenv("REQUEST_TIMEOUT_SEC", "20"))
-    return NocoClient(base=base, token=token, timeout=timeout, max_conn=max_conn, max_keepalive=max_keep)
+    return NocoClient(**_env_kwargs(kind))
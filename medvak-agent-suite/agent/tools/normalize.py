@@ -1,6 +1,6 @@
 from __future__ import annotations
-import re, difflib, os, pathlib
-from typing import Dict, List, Tuple, Set, Optional
+import re, bisect, difflib, os, pathlib, heapq
+from typing import Dict, List, Tuple, Set, Optional, Union
 
 TIME_RE = re.compile(
     r"(?P<h1>\d{1,2})[:.\-‐–—]?(?P<m1>\d{2})\s*[-–—]\s*(?P<h2>\d{1,2})[:.\-‐–—]?(?P<m2>\d{2})"
@@ -76,7 +76,8 @@ def normalize_role(raw: str) -> Tuple[str, List[str]]:
         return ROLE_SYNONYMS[l], []
     return s, []
 
-def normalize_dept(raw: str, aliases: Dict[str, str]) -> Tuple[str, List[str]]:
+def normalize_dept(raw: str, aliases: Dict[str, str],
+                   index: Optional[Dict[str, str]] = None) -> Tuple[str, List[str]]:
     s = trim(raw)
     base = s
     # правим опечатки
@@ -84,21 +85,149 @@ def normalize_dept(raw: str, aliases: Dict[str, str]) -> Tuple[str, List[str]]:
         base = re.sub(bad, good, base, flags=re.I)
     # алиасы
     low = base.lower()
+    if index is not None:
+        # готовый индекс lower(ключ) → канон (см. alias_index)
+        return index.get(low, base), []
     for k, v in aliases.items():
         if low == k.lower():
             return v, []
     return base, []
 
-def suggest_close(value: str, options: List[str], n: int = 3) -> List[str]:
-    return difflib.get_close_matches(value, options, n=n, cutoff=0.55)
+SUGGEST_CUTOFF = 0.55
+
+def _trigrams(s: str) -> Set[str]:
+    t = " " + trim(s).lower() + " "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+class SuggestIndex:
+    """
+    Триграммный инвертированный индекс по вариантам одного поля.
+    Триграммы дают короткий список кандидатов, финальный скоринг — тот же
+    SequenceMatcher.ratio, что и у difflib.get_close_matches. Варианты вне
+    короткого списка досматриваются по верхней оценке ratio (окно длин + quick_ratio
+    по счётчикам символов), поэтому результат совпадает с difflib 1-в-1.
+    Цена точности: оценка считается для каждого варианта окна длин, то есть запрос
+    остаётся O(N) по справочнику (дешёвые сравнения счётчиков, ratio() — лишь для
+    немногих); повторные значения отдаёт LRU-мемо снимка. Замеры — bench/bench_suggest.py.
+    """
+    __slots__ = ("options", "_postings", "_sizes", "_chars", "_by_len", "_lens")
+
+    def __init__(self, options: List[str]):
+        self.options: List[str] = list(dict.fromkeys(options))
+        self._postings: Dict[str, List[int]] = {}
+        self._sizes: List[int] = []
+        self._chars: List[Dict[str, int]] = []
+        for i, opt in enumerate(self.options):
+            grams = _trigrams(opt)
+            self._sizes.append(len(grams))
+            for g in grams:
+                self._postings.setdefault(g, []).append(i)
+            counts: Dict[str, int] = {}
+            for ch in opt:
+                counts[ch] = counts.get(ch, 0) + 1
+            self._chars.append(counts)
+        self._by_len: List[int] = sorted(range(len(self.options)), key=lambda i: len(self.options[i]))
+        self._lens: List[int] = [len(self.options[i]) for i in self._by_len]
+
+    def query(self, value: str, n: int = 3, cutoff: float = SUGGEST_CUTOFF,
+              shortlist: int = 32) -> List[Tuple[str, float]]:
+        """Top-n (вариант, score) с score >= cutoff, по убыванию."""
+        shortlist = max(shortlist, 8 * n)
+        sm = difflib.SequenceMatcher()
+        sm.set_seq2(value)
+        scored: List[Tuple[float, str]] = []
+
+        def score(i: int) -> None:
+            sm.set_seq1(self.options[i])
+            if sm.real_quick_ratio() >= cutoff and sm.quick_ratio() >= cutoff:
+                r = sm.ratio()
+                if r >= cutoff:
+                    scored.append((r, self.options[i]))
+
+        if len(self.options) <= shortlist:
+            # маленький справочник: дешевле проверить всё
+            for i in range(len(self.options)):
+                score(i)
+            return [(x, r) for r, x in heapq.nlargest(n, scored)]
+
+        grams = _trigrams(value)
+        hits: Dict[int, int] = {}
+        for g in grams:
+            for i in self._postings.get(g, ()):
+                hits[i] = hits.get(i, 0) + 1
+        # грубый отбор по коэффициенту Дайса, точный — по ratio()
+        qn = len(grams)
+        sizes = self._sizes
+        first = heapq.nlargest(shortlist, hits, key=lambda i: 2.0 * hits[i] / (qn + sizes[i]))
+        for i in first:
+            score(i)
+
+        # остальные: ratio <= 2·M/(la+lb), M — пересечение мультимножеств символов.
+        # Кто не дотягивает даже оценкой до n-го лучшего (или cutoff), в top-n не попадёт.
+        # Оценка считается для всех вариантов окна длин (O(N) сравнений счётчиков символов),
+        # ratio() — по убыванию оценки и только пока она не ниже текущего n-го лучшего.
+        top = heapq.nlargest(n, scored)
+        floor = max(cutoff, top[-1][0]) if len(top) == n else cutoff
+        lb = len(value)
+        if floor <= 0:
+            lo, hi = 0, len(self._lens)
+        else:
+            # окно длин из 2·min(la, lb)/(la+lb) >= floor
+            lo = bisect.bisect_left(self._lens, floor * lb / (2 - floor) - 1e-9)
+            hi = bisect.bisect_right(self._lens, lb * (2 - floor) / floor + 1e-9)
+        qchars: Dict[str, int] = {}
+        for ch in value:
+            qchars[ch] = qchars.get(ch, 0) + 1
+        seen = set(first)
+        chars = self._chars
+        rest: List[Tuple[float, int]] = []
+        for k in range(lo, hi):
+            i = self._by_len[k]
+            if i in seen:
+                continue
+            oc = chars[i]
+            m = 0
+            for ch, q in qchars.items():
+                c = oc.get(ch)
+                if c:
+                    m += q if q < c else c
+            total = lb + self._lens[k]
+            bound = 2.0 * m / total if total else 1.0
+            if bound >= floor:
+                rest.append((bound, i))
+        # при равных ratio difflib оставляет лексикографически больший вариант — равные оценки досматриваются все
+        rest.sort(reverse=True)
+        for bound, i in rest:
+            if bound < floor:
+                break
+            before = len(scored)
+            score(i)
+            if len(scored) > before and len(scored) >= n:
+                floor = max(floor, heapq.nlargest(n, scored)[-1][0])
+        return [(x, r) for r, x in heapq.nlargest(n, scored)]
+
+def suggest_close(value: str, options: Union[List[str], SuggestIndex], n: int = 3) -> List[str]:
+    if isinstance(options, SuggestIndex):
+        return [x for x, _ in options.query(value, n=n)]
+    return difflib.get_close_matches(value, options, n=n, cutoff=SUGGEST_CUTOFF)
+
+def alias_index(aliases: Dict[str, str]) -> Dict[str, str]:
+    """lower(ключ) → канон; при коллизии побеждает первый ключ, как в normalize_dept."""
+    out: Dict[str, str] = {}
+    for k, v in aliases.items():
+        out.setdefault(k.lower(), v)
+    return out
 
 def load_aliases(path: str) -> Dict[str, str]:
     """Простой YAML-парсер 'ключ: значение' (без зависимостей)."""
-    out: Dict[str, str] = {}
     p = pathlib.Path(path)
     if not p.exists():
-        return out
-    for line in p.read_text(encoding="utf-8").splitlines():
+        return {}
+    return parse_aliases(p.read_text(encoding="utf-8"))
+
+def parse_aliases(text: str) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for line in text.splitlines():
         line = line.strip()
         if not line or line.startswith("#"):
             continue
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import itertools, logging, multiprocessing, os, threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from .schema import Record, PreviewItem, ALL_FIELDS
+from .registry import Snapshot, build_snapshot
+from .signing import current_secret, use_secret
+
+log = logging.getLogger("preview.parallel")
+
+# Значения по умолчанию (пул выключен); агент при старте задаёт их через configure()
+# из settings: PREVIEW_WORKERS, PREVIEW_PARALLEL_MIN_ROWS, PREVIEW_SHARD_ROWS.
+# Выигрыш по времени на нескольких ядрах не замерен; на одном CPU пул медленнее
+# последовательного пути (передача шардов) — включать после bench/bench_preview_parallel.py
+# на целевой машине.
+PARALLEL_WORKERS = 1
+PARALLEL_MIN_ROWS = 20000
+SHARD_ROWS = 5000
+_AUTO_WORKERS_MAX = 4   # PREVIEW_WORKERS=0: больше процессов упирается в pickle и память, а не в CPU
+_INFLIGHT_PER_WORKER = 2   # шардов в работе на процесс: один считается, один ждёт в очереди
+
+
+def available_cpus() -> int:
+    """Ядра, доступные процессу (affinity/cpuset контейнера), а не всего хоста."""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:   # нет на macOS/Windows
+        return os.cpu_count() or 1
+
+
+def resolve_workers(n: int) -> int:
+    """PREVIEW_WORKERS: 1 — без пула (по умолчанию), 0 — по доступным ядрам, но не больше _AUTO_WORKERS_MAX."""
+    return n if n > 0 else min(available_cpus(), _AUTO_WORKERS_MAX)
+
+
+def configure(workers: int, min_rows: int, shard_rows: int) -> None:
+    global PARALLEL_WORKERS, PARALLEL_MIN_ROWS, SHARD_ROWS
+    PARALLEL_WORKERS, PARALLEL_MIN_ROWS, SHARD_ROWS = resolve_workers(workers), min_rows, max(1, shard_rows)
+
+
+_MAX_POOLS = 2   # живой AllowedMap по нескольким таблицам — не пересоздавать пул на каждый запрос
+
+# Между процессами ходят кортежи значений полей, а не модели pydantic:
+# так дешевле pickle, а значения уже провалидированы — собираем через construct().
+_Packed = Tuple[Any, ...]
+
+
+def _pack_record(rec: Record) -> _Packed:
+    return tuple(getattr(rec, f) for f in ALL_FIELDS)
+
+
+def _unpack_record(vals: _Packed) -> Record:
+    return Record.construct(**dict(zip(ALL_FIELDS, vals)))
+
+
+# ─ воркер: снимок справочников строится один раз, в initializer
+_worker_snap: Optional[Snapshot] = None
+
+
+def _init_worker(map_raw: bytes, aliases_raw: bytes, secret: bytes) -> None:
+    global _worker_snap
+    use_secret(secret)
+    _worker_snap = build_snapshot(map_raw, aliases_raw)
+
+
+def _run_shard(rows: List[_Packed]) -> List[Tuple[Any, ...]]:
+    from .preview import _preview_columnar
+    items = _preview_columnar([_unpack_record(r) for r in rows], _worker_snap)
+    return [(_pack_record(it.record), it.uncertain, it.notes, it.confidence, it.token) for it in items]
+
+
+class _Pools:
+    """Пулы процессов по версии снимка (LRU на _MAX_POOLS версий)."""
+    def __init__(self):
+        self._pools: "OrderedDict[Tuple[str, int], ProcessPoolExecutor]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, snap: Snapshot, workers: int) -> ProcessPoolExecutor:
+        key = (snap.version, workers)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                map_raw, aliases_raw = snap.source
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),   # fork из многопоточного сервера небезопасен
+                    initializer=_init_worker,
+                    initargs=(map_raw, aliases_raw, current_secret()),
+                )
+                self._pools[key] = pool
+                log.info("preview.pool start version=%s workers=%d", snap.version, workers)
+                while len(self._pools) > _MAX_POOLS:
+                    _, old = self._pools.popitem(last=False)
+                    old.shutdown(wait=False)   # уже отправленные шарды доработают
+            self._pools.move_to_end(key)
+            return pool
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            self._pools.clear()
+
+
+pools = _Pools()
+
+
+def parallel_enabled(workers: Optional[int] = None) -> bool:
+    return (workers or PARALLEL_WORKERS) > 1
+
+
+def use_parallel(rows: int, workers: Optional[int] = None) -> bool:
+    return parallel_enabled(workers) and rows >= PARALLEL_MIN_ROWS
+
+
+def _unpack_items(packed: List[Tuple[Any, ...]]) -> List[PreviewItem]:
+    return [
+        PreviewItem.construct(record=_unpack_record(rec), uncertain=unc, notes=notes,
+                              confidence=conf, token=token)
+        for rec, unc, notes, conf, token in packed
+    ]
+
+
+def preview_shards(records: Iterable[Record], snap: Snapshot, workers: Optional[int] = None,
+                   shard_rows: Optional[int] = None) -> Iterator[List[PreviewItem]]:
+    """
+    Preview шардами по shard_rows строк в пуле процессов; шарды отдаются строго по порядку.
+    records читаются лениво: в работе не больше _INFLIGHT_PER_WORKER шардов на процесс,
+    следующий упаковывается, когда потребитель забрал готовый. Так в памяти родителя
+    нет упакованной копии всего файла, а итератор (разбор загрузки) идёт вровень с пулом.
+    Результат совпадает с последовательным preview_records побайтно.
+    """
+    workers = workers or PARALLEL_WORKERS
+    pool = pools.get(snap, workers)
+    shard_rows = shard_rows or SHARD_ROWS
+    it = iter(records)
+    inflight: Deque[Future] = deque()
+    try:
+        while True:
+            while len(inflight) < workers * _INFLIGHT_PER_WORKER:
+                shard = [_pack_record(r) for r in itertools.islice(it, shard_rows)]
+                if not shard:
+                    break
+                inflight.append(pool.submit(_run_shard, shard))
+            if not inflight:
+                return
+            yield _unpack_items(inflight.popleft().result())
+    finally:
+        for fut in inflight:   # потребитель бросил чтение (задача отменена) — неначатые шарды не считаем
+            fut.cancel()
+
+
+def preview_parallel(records: Iterable[Record], snap: Snapshot, workers: Optional[int] = None,
+                     shard_rows: Optional[int] = None) -> List[PreviewItem]:
+    out: List[PreviewItem] = []
+    for part in preview_shards(records, snap, workers, shard_rows):
+        out.extend(part)
+    return out
@@ -1,37 +1,31 @@
 from __future__ import annotations
-import json, pathlib, os
-from typing import Dict, List, Any, Tuple
-from .schema import Record, PreviewItem, AllowedMap, SINGLE_FIELDS, MULTI_FIELDS
+from typing import AbstractSet, Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from .schema import (
+    Record, PreviewItem, SINGLE_FIELDS, MULTI_FIELDS,
+    F_DEPT, F_ROLE, F_STATUS, F_WORKER, F_SCHEDULE, F_SHIFT, F_TIME,
+)
 from .normalize import (
-    trim, normalize_time_tokens, normalize_schedule, normalize_shift,
-    normalize_role, normalize_dept, suggest_close, load_aliases
+    normalize_time_tokens, normalize_schedule, normalize_shift,
+    normalize_role, normalize_dept
 )
+from .registry import Snapshot, registry
+from .signing import sign_record
+from .parallel import use_parallel, preview_parallel
 
-def _load_allowed_map(path: str) -> AllowedMap:
-    p = pathlib.Path(path)
-    if not p.exists():
-        return {"selects": {}, "multiselects": {}}
-    data = json.loads(p.read_text(encoding="utf-8"))
-    # trim & unique
-    for k in ("selects","multiselects"):
-        data[k] = {fld: sorted({str(v).strip() for v in vals}) for fld, vals in data.get(k, {}).items()}
-    return data  # type: ignore
-
-def _validate_select(field: str, value: str, allowed: Dict[str, List[str]]) -> Tuple[bool, List[str]]:
-    opts = allowed.get(field, [])
-    if value in opts:
+def _validate_select(field: str, value: str, snap: Snapshot) -> Tuple[bool, List[str]]:
+    if value in snap.selects.get(field, ()):
         return True, []
-    return False, suggest_close(value, opts, n=3)
+    return False, snap.suggest("select", field, value)
 
-def _validate_multi(field: str, values: List[str], allowed: Dict[str, List[str]]) -> Tuple[List[str], List[Dict[str, Any]]]:
-    opts = set(allowed.get(field, []))
+def _validate_multi(field: str, values: List[str], snap: Snapshot) -> Tuple[List[str], List[Dict[str, Any]]]:
+    opts: AbstractSet[str] = snap.multiselects.get(field, frozenset())
     valid: List[str] = []
     uncertain: List[Dict[str, Any]] = []
     for v in values:
         if v in opts:
             valid.append(v)
         else:
-            uncertain.append({"field": field, "value": v, "suggest": suggest_close(v, list(opts), n=3)})
+            uncertain.append({"field": field, "value": v, "suggest": snap.suggest("multi", field, v)})
     return sorted(valid), uncertain
 
 def _confidence(item: PreviewItem) -> float:
@@ -41,73 +35,125 @@ def _confidence(item: PreviewItem) -> float:
     conf = max(0.0, 1.0 - uncertain/denom)
     return round(conf, 2)
 
-def preview_records(records: List[Record]) -> List[PreviewItem]:
-    allowed_path = os.getenv("AGENT_MAP_PATH", "agent/agent_map/agent-map.json")
-    aliases_file = os.getenv("ALIASES_FILE", "shared/aliases.yml")
-    allowed = _load_allowed_map(allowed_path)
-    aliases = load_aliases(aliases_file)
+# Порядок полей фиксирован: так uncertain/notes детерминированы и одинаковы
+# в построчном и колоночном проходах.
+_CHECK_ORDER = (F_ROLE, F_STATUS, F_DEPT, F_WORKER, F_SCHEDULE, F_SHIFT, F_TIME)
+_NOTE_ORDER = (F_ROLE, F_TIME, F_DEPT)
+_CHUNK = 256
 
-    items: List[PreviewItem] = []
-    for rec in records:
-        notes: List[str] = []
-        uncertain: List[Dict[str, Any]] = []
+FieldResult = Tuple[Any, List[str], List[Dict[str, Any]]]   # (значение, notes, uncertain)
 
-        # --- нормализация ---
-        # Должность
-        if rec.Должность:
-            rec.Должность, note_role = normalize_role(rec.Должность)
-            notes += note_role
+def _normalize_value(field: str, raw: Any, snap: Snapshot) -> Tuple[Any, List[str]]:
+    """Только нормализация одного поля (без сверки со справочником): (значение, notes)."""
+    notes: List[str] = []
+    val = raw
+    if field == F_ROLE and val:
+        val, note_role = normalize_role(val)
+        notes += note_role
+    elif field == F_SHIFT and val:
+        norm = set()
+        for v in val:
+            for t in normalize_shift(v):
+                norm.add(t)
+        val = sorted(norm) or val
+    elif field == F_SCHEDULE and val:
+        acc = set()
+        for v in val:
+            vs, _ = normalize_schedule(v)
+            acc.update(vs)
+        val = sorted(acc) or val
+    elif field == F_TIME and val:
+        acc = set()
+        for v in val:
+            times, note = normalize_time_tokens(v)
+            notes += note
+            acc.update(times)
+        val = sorted(acc) or val
+    elif field == F_DEPT and val:
+        val, note_d = normalize_dept(val, snap.aliases, snap.alias_index)
+        notes += note_d
+    return val, notes
 
-        # Тип_смены
-        if rec.Тип_смены:
-            norm = set()
-            for v in rec.Тип_смены:
-                for t in normalize_shift(v):
-                    norm.add(t)
-            rec.Тип_смены = sorted(norm) or rec.Тип_смены
+def _norm_field(field: str, raw: Any, snap: Snapshot) -> FieldResult:
+    """Нормализация + валидация одного поля; зависит только от значения этого поля."""
+    uncertain: List[Dict[str, Any]] = []
+    val, notes = _normalize_value(field, raw, snap)
 
-        # График
-        if rec.График:
-            acc = set()
-            for v in rec.График:
-                vs, _ = normalize_schedule(v)
-                acc.update(vs)
-            rec.График = sorted(acc) or rec.График
+    # --- валидация against allowed ---
+    if not val:
+        return val, notes, uncertain
+    if field in SINGLE_FIELDS:
+        ok, suggest = _validate_select(field, val, snap)
+        if not ok:
+            uncertain.append({"field": field, "value": val, "suggest": suggest})
+    elif field in MULTI_FIELDS:
+        val, uncertain = _validate_multi(field, val, snap)
+    return val, notes, uncertain
 
-        # Время
-        if rec.Время_работы:
-            acc = set()
-            for v in rec.Время_работы:
-                times, note = normalize_time_tokens(v)
-                notes += note
-                acc.update(times)
-            rec.Время_работы = sorted(acc) or rec.Время_работы
+def _make_item(rec: Record, results: Dict[str, FieldResult], snap: Snapshot) -> PreviewItem:
+    notes: List[str] = []
+    uncertain: List[Dict[str, Any]] = []
+    for field in _CHECK_ORDER:
+        val, _, uncs = results[field]
+        if val != getattr(rec, field):
+            setattr(rec, field, list(val) if isinstance(val, list) else val)
+        uncertain += [{**u, "suggest": list(u["suggest"])} for u in uncs]
+    for field in _NOTE_ORDER:
+        notes += results[field][1]
+    # поля уже провалидированы выше — собираем модель без повторной валидации pydantic
+    item = PreviewItem.construct(record=rec, uncertain=uncertain, notes=notes, confidence=0.0,
+                                 token=None if uncertain else sign_record(rec, snap.version))
+    item.confidence = _confidence(item)
+    return item
 
-        # Отделение
-        if rec.Отделение:
-            rec.Отделение, note_d = normalize_dept(rec.Отделение, aliases)
-            notes += note_d
+def _preview_one(rec: Record, snap: Snapshot) -> PreviewItem:
+    """Построчный путь: каждое поле нормализуется заново."""
+    return _make_item(rec, {f: _norm_field(f, getattr(rec, f), snap) for f in _CHECK_ORDER}, snap)
 
-        # --- валидация against allowed ---
-        # SINGLE
-        for field in {"Должность","Статус","Отделение"}:
-            val = getattr(rec, field, None)
-            if not val:
-                continue
-            ok, suggest = _validate_select(field, val, allowed.get("selects", {}))
-            if not ok:
-                uncertain.append({"field": field, "value": val, "suggest": suggest})
+def _preview_columnar(records: List[Record], snap: Snapshot) -> List[PreviewItem]:
+    """
+    Колоночный путь: по каждому полю берём различные сырые значения,
+    нормализуем/валидируем каждое один раз и раскладываем обратно по строкам.
+    Результат совпадает с _preview_one построчно.
+    """
+    keys: Dict[str, List[Any]] = {}
+    done: Dict[str, Dict[Any, FieldResult]] = {}
+    for field in _CHECK_ORDER:
+        col = [getattr(rec, field) for rec in records]
+        ks = [tuple(v) if isinstance(v, list) else v for v in col]
+        distinct: Dict[Any, FieldResult] = {}
+        for k, raw in zip(ks, col):
+            if k not in distinct:
+                distinct[k] = _norm_field(field, raw, snap)
+        keys[field] = ks
+        done[field] = distinct
+    return [
+        _make_item(rec, {f: done[f][keys[f][i]] for f in _CHECK_ORDER}, snap)
+        for i, rec in enumerate(records)
+    ]
 
-        # MULTI
-        for field in {"Работник","График","Тип_смены","Время_работы"}:
-            vals = getattr(rec, field, None)
-            if not vals:
-                continue
-            valid, uncs = _validate_multi(field, vals, allowed.get("multiselects", {}))
-            setattr(rec, field, valid)
-            uncertain += uncs
+def preview_records(records: List[Record], snap: Optional[Snapshot] = None) -> List[PreviewItem]:
+    """
+    Нормализация + валидация против справочников.
+    snap — снимок реестра; если не передан, берём текущий (перечитывается только при изменении файлов).
+    """
+    if snap is None:
+        snap = registry.get()
+    records = list(records)
+    if use_parallel(len(records)):
+        # большой файл: шарды в пуле процессов (PREVIEW_WORKERS), порядок и результат — те же
+        return preview_parallel(records, snap)
+    return _preview_columnar(records, snap)
 
-        item = PreviewItem(record=rec, uncertain=uncertain, notes=notes)
-        item.confidence = _confidence(item)
-        items.append(item)
-    return items
+def iter_preview(records: Iterable[Record], snap: Optional[Snapshot] = None) -> Iterator[PreviewItem]:
+    """Потоковый вариант preview_records: строки обрабатываются пачками по _CHUNK."""
+    if snap is None:
+        snap = registry.get()
+    chunk: List[Record] = []
+    for rec in records:
+        chunk.append(rec)
+        if len(chunk) >= _CHUNK:
+            yield from _preview_columnar(chunk, snap)
+            chunk = []
+    if chunk:
+        yield from _preview_columnar(chunk, snap)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+import hashlib, threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from .signing import current_secret
+
+# (sha256(csv), версия справочников)
+CacheKey = Tuple[str, str]
+
+
+def csv_digest(csv_text: str) -> str:
+    return hashlib.sha256(csv_text.encode("utf-8")).hexdigest()
+
+
+def make_etag(*parts: str) -> str:
+    """
+    Сильный ETag ответа. В хэш входит отпечаток секрета токенов: после смены
+    PREVIEW_TOKEN_SECRET (или рестарта без него) старые токены не проходят — и ETag другой.
+    """
+    h = hashlib.sha256(hashlib.sha256(current_secret()).digest())
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return '"' + h.hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match: список тегов через запятую, «*», слабые W/ — сравнение по RFC 9110 (слабое)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class PreviewCache:
+    """
+    LRU готовых ответов /preview (сериализованный JSON) по (sha256(csv), версия справочников).
+    Ограничен числом записей и суммарным объёмом. Одинаковые одновременные запросы
+    (повтор после таймаута клиента) ждут одно вычисление, а не запускают второе.
+    """
+    def __init__(self, max_items: int = 64, max_bytes: int = 64 * 2**20):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.stats = {"hit": 0, "miss": 0, "coalesced": 0, "evicted": 0}
+        self._data: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._inflight: Dict[CacheKey, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        with self._lock:
+            body = self._data.get(key)
+            if body is not None:
+                self._data.move_to_end(key)
+            return body
+
+    def put(self, key: CacheKey, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._data[key] = body
+            self.bytes += len(body)
+            while len(self._data) > self.max_items or self.bytes > self.max_bytes:
+                _, dropped = self._data.popitem(last=False)
+                self.bytes -= len(dropped)
+                self.stats["evicted"] += 1
+
+    def get_or_compute(self, key: CacheKey, compute: Callable[[], bytes]) -> bytes:
+        """Ответ из кэша или compute() (для потоков пула FastAPI: блокирующий вызов)."""
+        waited = False
+        while True:
+            with self._lock:
+                body = self._data.get(key)
+                if body is not None:
+                    self._data.move_to_end(key)
+                    self.stats["coalesced" if waited else "hit"] += 1
+                    return body
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    self.stats["miss"] += 1
+                    done = self._inflight[key] = threading.Event()
+                    break
+            waiting.wait()
+            # первый запрос мог упасть — тогда ответа в кэше нет, и следующий круг посчитает сам
+            waited = True
+        try:
+            body = compute()
+            self.put(key, body)
+            return body
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            done.set()
+
+    def report(self) -> dict:
+        return {"items": len(self._data), "bytes": self.bytes, **self.stats}
+
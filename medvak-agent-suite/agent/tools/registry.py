@@ -0,0 +1,199 @@
+from __future__ import annotations
+import hashlib, json, logging, os, threading
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from .schema import AllowedMap
+from .normalize import parse_aliases, alias_index, SuggestIndex
+from .matcher import IntentMatcher
+
+log = logging.getLogger("registry")
+
+DEFAULT_MAP_PATH = "agent/agent_map/agent-map.json"
+DEFAULT_ALIASES_FILE = "shared/aliases.yml"
+SUGGEST_CACHE_SIZE = int(os.getenv("SUGGEST_CACHE_SIZE", "4096"))
+
+# (st_mtime_ns, st_size) — дешёвая подпись файла без чтения содержимого
+_StatSig = Optional[Tuple[int, int]]
+
+
+def _stat_sig(path: str) -> _StatSig:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_bytes(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+
+def _parse_allowed_map(raw: bytes) -> AllowedMap:
+    if not raw:
+        return {"selects": {}, "multiselects": {}}
+    data = json.loads(raw.decode("utf-8"))
+    # trim & unique
+    for k in ("selects", "multiselects"):
+        data[k] = {fld: sorted({str(v).strip() for v in vals}) for fld, vals in data.get(k, {}).items()}
+    return data  # type: ignore
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Неизменяемый снимок справочников: то, что нужно preview на каждую строку."""
+    allowed: AllowedMap
+    selects: Dict[str, FrozenSet[str]]
+    multiselects: Dict[str, FrozenSet[str]]
+    aliases: Dict[str, str]
+    alias_index: Dict[str, str]       # lower(ключ) → канон
+    version: str
+    source: Tuple[bytes, bytes] = field(default=(b"", b""), repr=False, compare=False)  # (map, aliases) как есть
+    _memo: Callable[[str, str, str], Tuple[str, ...]] = field(init=False, repr=False, compare=False)
+    # нечёткие индексы и автомат /chat строятся при первом обращении (или в warm())
+    _lazy: Dict[Any, Any] = field(init=False, repr=False, compare=False)
+    _lazy_lock: threading.Lock = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # LRU по (тип, поле, значение): живёт столько же, сколько снимок
+        object.__setattr__(self, "_memo", lru_cache(maxsize=SUGGEST_CACHE_SIZE)(self._suggest))
+        object.__setattr__(self, "_lazy", {})
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _get_lazy(self, key: Any, build: Callable[[], Any]) -> Any:
+        val = self._lazy.get(key)
+        if val is None:
+            with self._lazy_lock:
+                val = self._lazy.get(key)
+                if val is None:
+                    val = self._lazy[key] = build()
+        return val
+
+    def suggest_index(self, kind: str, fld: str) -> Optional[SuggestIndex]:
+        group = self.allowed.get("selects" if kind == "select" else "multiselects", {})
+        if fld not in group:
+            return None
+        return self._get_lazy((kind, fld), lambda: SuggestIndex(group[fld]))
+
+    @property
+    def matcher(self) -> IntentMatcher:
+        """Автомат для разбора свободного текста (/chat)."""
+        return self._get_lazy("matcher", lambda: IntentMatcher(self.aliases))
+
+    def warm(self) -> "Snapshot":
+        """Построить всё ленивое сразу (прогрев при старте)."""
+        for fld in self.allowed.get("selects", {}):
+            self.suggest_index("select", fld)
+        for fld in self.allowed.get("multiselects", {}):
+            self.suggest_index("multi", fld)
+        self.matcher
+        return self
+
+    def _suggest(self, kind: str, fld: str, value: str) -> Tuple[str, ...]:
+        idx = self.suggest_index(kind, fld)
+        if idx is None:
+            return ()
+        return tuple(x for x, _ in idx.query(value, n=3))
+
+    def suggest(self, kind: str, fld: str, value: str) -> List[str]:
+        """Top-3 подсказки для значения вне справочника; kind — "select" | "multi"."""
+        return list(self._memo(kind, fld, value))
+
+    def select_options(self, fld: str) -> List[str]:
+        return self.allowed.get("selects", {}).get(fld, [])
+
+    def multi_options(self, fld: str) -> List[str]:
+        return self.allowed.get("multiselects", {}).get(fld, [])
+
+
+def build_snapshot(map_raw: bytes, aliases_raw: bytes) -> Snapshot:
+    allowed = _parse_allowed_map(map_raw)
+    aliases = parse_aliases(aliases_raw.decode("utf-8")) if aliases_raw else {}
+    h = hashlib.sha256()
+    h.update(map_raw)
+    h.update(b"\0")
+    h.update(aliases_raw)
+    return Snapshot(
+        allowed=allowed,
+        selects={k: frozenset(v) for k, v in allowed.get("selects", {}).items()},
+        multiselects={k: frozenset(v) for k, v in allowed.get("multiselects", {}).items()},
+        aliases=aliases,
+        alias_index=alias_index(aliases),
+        version="map-" + h.hexdigest()[:12],
+        source=(map_raw, aliases_raw),
+    )
+
+
+@dataclass
+class _Source:
+    path: str = ""
+    sig: _StatSig = None
+    digest: str = ""
+    raw: bytes = b""
+
+
+@dataclass
+class DictRegistry:
+    """
+    Процессный кэш agent-map.json + aliases.yml.
+    Файлы перечитываются только при смене пути, mtime/size; если содержимое
+    (sha256) не поменялось — снимок остаётся прежним.
+    Пути берём из окружения на каждом get(), как и раньше в preview.
+    """
+    map_env: str = "AGENT_MAP_PATH"
+    aliases_env: str = "ALIASES_FILE"
+    _map: _Source = field(default_factory=_Source)
+    _aliases: _Source = field(default_factory=_Source)
+    _snap: Optional[Snapshot] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def _paths(self) -> Tuple[str, str]:
+        return (os.getenv(self.map_env, DEFAULT_MAP_PATH), os.getenv(self.aliases_env, DEFAULT_ALIASES_FILE))
+
+    @staticmethod
+    def _refresh(src: _Source, path: str, force: bool) -> bool:
+        """Обновить источник; True — если содержимое поменялось."""
+        sig = _stat_sig(path)
+        if not force and src.path == path and src.sig == sig:
+            return False
+        raw = _read_bytes(path) if sig is not None else b""
+        digest = hashlib.sha256(raw).hexdigest()
+        changed = src.path != path or src.digest != digest
+        src.path, src.sig, src.digest, src.raw = path, sig, digest, raw
+        return changed
+
+    def get(self) -> Snapshot:
+        map_path, aliases_path = self._paths()
+        snap = self._snap
+        if (snap is not None and self._map.path == map_path and self._aliases.path == aliases_path
+                and _stat_sig(map_path) == self._map.sig and _stat_sig(aliases_path) == self._aliases.sig):
+            return snap
+        return self._load(force=False)
+
+    def derive(self, allowed: AllowedMap) -> Snapshot:
+        """Снимок с теми же алиасами, но другим AllowedMap (например, собранным из NocoDB)."""
+        self.get()
+        raw = json.dumps(allowed, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return build_snapshot(raw, self._aliases.raw)
+
+    def reload(self) -> Snapshot:
+        """Принудительно перечитать файлы (админ-эндпоинт)."""
+        return self._load(force=True)
+
+    def _load(self, force: bool) -> Snapshot:
+        map_path, aliases_path = self._paths()
+        with self._lock:
+            changed = self._refresh(self._map, map_path, force)
+            changed = self._refresh(self._aliases, aliases_path, force) or changed
+            if changed or self._snap is None:
+                self._snap = build_snapshot(self._map.raw, self._aliases.raw)
+                log.info("registry.load map=%s aliases=%s version=%s", map_path, aliases_path, self._snap.version)
+            return self._snap
+
+
+registry = DictRegistry()
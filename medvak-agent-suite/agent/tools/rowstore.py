@@ -0,0 +1,165 @@
+from __future__ import annotations
+from array import array
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, Union, overload
+
+from .schema import Record, PreviewItem, ALL_FIELDS, SINGLE_FIELDS, MULTI_FIELDS
+from .registry import Snapshot
+from .signing import sign_record
+from .preview import _CHECK_ORDER, _NOTE_ORDER, _normalize_value, _confidence
+
+
+class Vocab:
+    """
+    Словарь значение ↔ целый код. Значения справочника (allowed) получают
+    коды 0..n_allowed-1, поэтому «значение допустимо» — это code < n_allowed.
+    """
+    __slots__ = ("values", "index", "n_allowed")
+
+    def __init__(self, allowed: Iterable[Hashable] = ()):
+        self.values: List[Any] = sorted(set(allowed))
+        self.index: Dict[Hashable, int] = {v: i for i, v in enumerate(self.values)}
+        self.n_allowed = len(self.values)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value: Hashable) -> int:
+        c = self.index.get(value)
+        if c is None:
+            c = self.index[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+
+class PreviewStore:
+    """
+    Колоночное хранилище результата preview: на строку — по одному целому коду
+    на поле (array('I')), значения — в словарях полей. Селекты кодируются в словарь
+    AllowedMap, мультиселекты — кортежем кодов элементов (сам кортеж тоже код),
+    поэтому сверка со справочником — сравнение целых. uncertain, confidence и
+    token не хранятся — выводятся при материализации. Модели pydantic
+    (PreviewItem/Record) создаются только на границе API: item(i), срезы, итерация.
+    Результат материализации совпадает с preview_records побайтно.
+    """
+    __slots__ = ("snap", "n", "vocab", "elems", "codes", "notes", "note_codes", "listings", "_memo")
+
+    def __init__(self, snap: Snapshot):
+        self.snap = snap
+        self.n = 0
+        # значения полей: для мультиселектов — кортежи кодов elems[field] (или None)
+        self.vocab: Dict[str, Vocab] = {}
+        self.elems: Dict[str, Vocab] = {}
+        for f in ALL_FIELDS:
+            if f in SINGLE_FIELDS:
+                self.vocab[f] = Vocab(snap.selects.get(f, ()))
+            else:
+                self.vocab[f] = Vocab()
+            if f in MULTI_FIELDS:
+                self.elems[f] = Vocab(snap.multiselects.get(f, ()))
+        self.codes: Dict[str, array] = {f: array("I") for f in ALL_FIELDS}
+        self.notes = Vocab([()])
+        self.note_codes = array("I")
+        # PreviewItem.listing по номеру строки (только у результатов скрейпа)
+        self.listings: Optional[List[str]] = None
+        # (поле, сырой ключ) → (код нормализованного значения, notes)
+        self._memo: Dict[Tuple[str, Hashable], Tuple[int, Tuple[str, ...]]] = {}
+
+    # ─ запись
+    def _encode(self, field: str, val: Any) -> int:
+        if field in MULTI_FIELDS:
+            if val is not None:
+                enc = self.elems[field].code
+                val = tuple(enc(v) for v in val)
+            return self.vocab[field].code(val)
+        return self.vocab[field].code(tuple(val) if isinstance(val, list) else val)
+
+    def extend(self, records: Iterable[Record]) -> "PreviewStore":
+        """Нормализовать записи и дописать в хранилище; каждое различное сырое значение — один раз."""
+        memo, snap, codes = self._memo, self.snap, self.codes
+        for rec in records:
+            row_notes: Dict[str, Tuple[str, ...]] = {}
+            for f in ALL_FIELDS:
+                raw = getattr(rec, f)
+                if f not in _CHECK_ORDER:
+                    codes[f].append(self._encode(f, raw))
+                    continue
+                key = (f, tuple(raw) if isinstance(raw, list) else raw)
+                hit = memo.get(key)
+                if hit is None:
+                    val, notes = _normalize_value(f, raw, snap)
+                    hit = memo[key] = (self._encode(f, val), tuple(notes))
+                codes[f].append(hit[0])
+                row_notes[f] = hit[1]
+            self.note_codes.append(self.notes.code(sum((row_notes[f] for f in _NOTE_ORDER), ())))
+            self.n += 1
+        return self
+
+    def extend_items(self, items: Iterable[PreviewItem]) -> "PreviewStore":
+        """Дописать уже готовые PreviewItem (например, из шардов пула процессов)."""
+        for it in items:
+            rec = it.record
+            for f in ALL_FIELDS:
+                val = getattr(rec, f)
+                if f in MULTI_FIELDS and val is not None:
+                    # допустимые значения + отбракованные в порядке uncertain: так материализация их повторит
+                    val = list(val) + [u["value"] for u in it.uncertain if u["field"] == f]
+                self.codes[f].append(self._encode(f, val))
+            self.note_codes.append(self.notes.code(tuple(it.notes)))
+            self.n += 1
+        return self
+
+    # ─ чтение
+    def __len__(self) -> int:
+        return self.n
+
+    def item(self, i: int) -> PreviewItem:
+        snap = self.snap
+        vals: Dict[str, Any] = {}
+        uncertain: List[Dict[str, Any]] = []
+        for f in _CHECK_ORDER:
+            code = self.codes[f][i]
+            val = self.vocab[f].values[code]
+            if f in MULTI_FIELDS:
+                if val is None or not val:
+                    vals[f] = None if val is None else []
+                    continue
+                elems = self.elems[f]
+                n_ok = elems.n_allowed
+                vals[f] = sorted(elems.values[c] for c in val if c < n_ok)
+                uncertain += [{"field": f, "value": elems.values[c], "suggest": snap.suggest("multi", f, elems.values[c])}
+                              for c in val if c >= n_ok]
+            else:
+                vals[f] = val
+                if val and code >= self.vocab[f].n_allowed:
+                    uncertain.append({"field": f, "value": val, "suggest": snap.suggest("select", f, val)})
+        for f in ALL_FIELDS:
+            if f not in vals:
+                v = self.vocab[f].values[self.codes[f][i]]
+                vals[f] = list(v) if isinstance(v, tuple) else v
+        rec = Record.construct(**{f: vals[f] for f in ALL_FIELDS})
+        item = PreviewItem.construct(record=rec, uncertain=uncertain, notes=list(self.notes.values[self.note_codes[i]]),
+                                     confidence=0.0, token=None if uncertain else sign_record(rec, snap.version),
+                                     listing=self.listings[i] if self.listings is not None else None)
+        item.confidence = _confidence(item)
+        return item
+
+    @overload
+    def __getitem__(self, i: int) -> PreviewItem: ...
+    @overload
+    def __getitem__(self, i: slice) -> List[PreviewItem]: ...
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self.item(k) for k in range(*i.indices(self.n))]
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        return self.item(i)
+
+    def __iter__(self) -> Iterator[PreviewItem]:
+        return (self.item(i) for i in range(self.n))
+
+    def nbytes(self) -> int:
+        """Оценка размера колонок кодов (без словарей)."""
+        return sum(a.itemsize * len(a) for a in self.codes.values()) + self.note_codes.itemsize * len(self.note_codes)
@@ -58,5 +58,7 @@ class PreviewItem(BaseModel):
     uncertain: List[Uncertain] = Field(default_factory=list)
     notes: List[str] = Field(default_factory=list)
     confidence: float = 0.0
+    token: Optional[str] = None   # подпись чистой записи (см. tools/signing.py) — /write по ней не перепроверяет
+    listing: Optional[str] = None   # Listing.ref карточки скрейпа — /write отмечает её импортированной
 
 AllowedMap = Dict[str, Dict[str, List[str]]]   # {"selects": {...}, "multiselects": {...}}
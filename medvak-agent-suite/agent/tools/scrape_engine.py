@@ -0,0 +1,141 @@
+from __future__ import annotations
+import asyncio, logging, os, time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from .schema import Record
+from .normalize import trim
+from .http_cache import HttpCache, get_cache
+
+log = logging.getLogger("scrape")
+
+DEFAULT_UA = "Mozilla/5.0 (compatible; medvak-agent/0.1)"
+
+
+@dataclass
+class Listing:
+    """Одна карточка из выдачи сайта — до приведения к Record."""
+    source: str
+    id: str
+    url: str
+    title: str = ""
+    employer: str = ""
+    salary: str = ""
+    address: str = ""
+
+    @property
+    def ref(self) -> str:
+        """Ключ карточки между preview и /write: «источник:id»."""
+        return f"{self.source}:{self.id}"
+
+
+def listing_to_record(it: Listing) -> Record:
+    """Карточка выдачи → Record; дальше её нормализует и валидирует preview_records."""
+    return Record(
+        Title=trim(f"{it.title} — {it.employer}" if it.employer else it.title) or None,
+        Должность=trim(it.title) or None,
+        Зарплата=trim(it.salary) or None,
+        Статус="Открыта",
+    )
+
+
+class _HostGate:
+    """Не больше limit одновременных запросов к хосту и не чаще одного старта в delay секунд."""
+    def __init__(self, limit: int, delay: float):
+        self.sem = asyncio.Semaphore(max(1, limit))
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next = 0.0
+
+    async def wait_turn(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+            self._next = max(now, self._next) + self.delay
+
+
+class ScrapeEngine:
+    """
+    Асинхронная загрузка страниц выдачи на общем httpx.AsyncClient.
+    Страницы одного запроса качаются параллельно, но с лимитом на хост
+    (per_host) и паузой между стартами запросов к одному хосту (delay).
+    С cache свежие страницы берутся с диска без сети, протухшие — ревалидируются
+    через If-None-Match/If-Modified-Since. Обращения к SQLite кэша (включая
+    вытеснение в put) идут в потоке, а не в event loop.
+    """
+    def __init__(self, client: httpx.AsyncClient, per_host: int = 2, delay: float = 0.5,
+                 cache: Optional[HttpCache] = None):
+        self.client = client
+        self.per_host = per_host
+        self.delay = delay
+        self.cache = cache
+        self._gates: Dict[str, _HostGate] = {}
+
+    def _gate(self, url: str) -> _HostGate:
+        host = urlsplit(url).netloc
+        gate = self._gates.get(host)
+        if gate is None:
+            gate = self._gates[host] = _HostGate(self.per_host, self.delay)
+        return gate
+
+    async def fetch(self, url: str) -> Optional[str]:
+        cache = self.cache
+        cached = await asyncio.to_thread(cache.get, url) if cache is not None else None
+        if cached is not None and cache.is_fresh(cached):
+            cache.stats["hit"] += 1
+            return cached.body
+        gate = self._gate(url)
+        async with gate.sem:
+            await gate.wait_turn()
+            try:
+                r = await self.client.get(url, headers=cached.validators() if cached else None)
+            except httpx.HTTPError as e:
+                log.warning("scrape fetch %s failed: %s", url, e)
+                return None
+        if cached is not None and r.status_code == 304:
+            cache.stats["revalidated"] += 1
+            await asyncio.to_thread(cache.touch, url)
+            return cached.body
+        if cache is not None:
+            cache.stats["miss"] += 1
+            if r.status_code == 200:
+                await asyncio.to_thread(cache.put, url, r.text, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        if r.status_code != 200:
+            log.warning("scrape fetch %s: HTTP %s", url, r.status_code)
+            return None
+        return r.text
+
+    async def fetch_all(self, urls: List[str]) -> List[Optional[str]]:
+        """Тексты страниц в порядке urls (None — страница не загрузилась)."""
+        return list(await asyncio.gather(*(self.fetch(u) for u in urls)))
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def make_engine(timeout: float = 20.0, max_conn: int = 4, max_keepalive: int = 2,
+                per_host: int = 2, delay: float = 0.5, user_agent: str = "",
+                cache: Optional[HttpCache] = None) -> ScrapeEngine:
+    limits = httpx.Limits(max_connections=max_conn, max_keepalive_connections=max_keepalive)
+    client = httpx.AsyncClient(
+        timeout=timeout, limits=limits, follow_redirects=True,
+        headers={"User-Agent": user_agent or DEFAULT_UA, "Accept-Language": "ru-RU,ru;q=0.9"},
+    )
+    return ScrapeEngine(client, per_host=per_host, delay=delay, cache=cache)
+
+
+def engine_from_env() -> ScrapeEngine:
+    """Для скриптов вне агента; агент строит движок из agent.config.settings (router.new_scraper)."""
+    return make_engine(
+        timeout=float(os.getenv("REQUEST_TIMEOUT_SEC", "20")),
+        max_conn=int(os.getenv("HTTPX_MAX_CONN", "4")),
+        max_keepalive=int(os.getenv("HTTPX_MAX_KEEPALIVE", "2")),
+        per_host=int(os.getenv("SCRAPE_PER_HOST", "2")),
+        delay=float(os.getenv("SCRAPE_DELAY_SEC", "0.5")),
+        user_agent=os.getenv("SCRAPE_USER_AGENT", ""),
+        cache=get_cache(),
+    )
@@ -1,14 +1,162 @@
 from __future__ import annotations
-import os
-from typing import List
+import asyncio, logging, os, re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urljoin
+
 from .schema import Record
+from .scrape_engine import Listing, ScrapeEngine, engine_from_env, listing_to_record
+from .listing_index import ListingIndex
+
+# data-qa разметки выдачи hh-платформы (hh.ru и zarplata.ru) → поле Listing
+_ITEM_QA = {"vacancy-serp__vacancy", "serp-item"}
+_FIELD_QA = {
+    "serp-item__title": "title",
+    "vacancy-serp__vacancy-employer": "employer",
+    "vacancy-serp__vacancy-compensation": "salary",
+    "vacancy-serp__vacancy-address": "address",
+}
+log = logging.getLogger("scrape")
+
+# не имеют закрывающего тега: вложенность поля они не меняют
+_VOID_TAGS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+                        "meta", "source", "track", "wbr"})
+_VACANCY_ID = re.compile(r"/vacancy/(\d+)")
+_WS = re.compile(r"\s+")
+
+
+def _base() -> str:
+    """Для скриптов вне агента; агент передаёт base из agent.config.settings."""
+    return os.getenv("SCRAPE_HH_BASE", "https://hh.ru")
+
+
+def search_url(base: str, query: str, page: int) -> str:
+    """URL страницы выдачи; page считается с 0, как на сайте."""
+    return f"{base.rstrip('/')}/search/vacancy?" + urlencode({"text": query, "page": page})
+
+
+class _SerpParser(HTMLParser):
+    """Собирает карточки выдачи по атрибутам data-qa; текст внутри поля склеивается."""
+    def __init__(self, source: str, page_url: str):
+        super().__init__(convert_charrefs=True)
+        self.source = source
+        self.page_url = page_url
+        self.items: List[Listing] = []
+        self._cur: Optional[Listing] = None
+        self._field: Optional[str] = None
+        self._depth = 0          # вложенность внутри текущего поля
+        self._buf: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs):
+        a: Dict[str, str] = {k: v or "" for k, v in attrs}
+        qa = set(a.get("data-qa", "").split())
+        if qa & _ITEM_QA:
+            self._flush_field()
+            self._cur = Listing(source=self.source, id="", url="")
+            self.items.append(self._cur)
+            return
+        if self._cur is None:
+            return
+        if self._field is not None:
+            if tag == "br":
+                self._buf.append(" ")   # перенос строки внутри поля — пробел, а не склейка слов
+            elif tag not in _VOID_TAGS:
+                self._depth += 1
+            return
+        for q in qa:
+            fld = _FIELD_QA.get(q)
+            if fld:
+                self._field, self._depth, self._buf = fld, 1, []
+                if fld == "title" and a.get("href"):
+                    self._cur.url = urljoin(self.page_url, a["href"])
+                    m = _VACANCY_ID.search(self._cur.url)
+                    self._cur.id = m.group(1) if m else self._cur.url
+                break
+
+    def handle_endtag(self, tag: str):
+        if self._field is None:
+            return
+        self._depth -= 1
+        if self._depth <= 0:
+            self._flush_field()
+
+    def handle_data(self, data: str):
+        if self._field is not None:
+            self._buf.append(data)
 
-def scrape_hh(query: str, hospital: str | None = None, pages: int = 2) -> List[Record]:
+    def _flush_field(self):
+        if self._cur is not None and self._field is not None:
+            setattr(self._cur, self._field, _WS.sub(" ", "".join(self._buf)).strip())
+        self._field, self._depth, self._buf = None, 0, []
+
+
+def parse_serp(html: str, source: str = "hh", page_url: str = "") -> List[Listing]:
+    """Карточки со страницы выдачи; без ссылки на вакансию карточка пропускается."""
+    p = _SerpParser(source, page_url)
+    p.feed(html)
+    p.close()
+    return [it for it in p.items if it.url and it.title]
+
+
+async def fetch_listings(engine: ScrapeEngine, base: str, source: str, query: str, pages: int,
+                         index: Optional[ListingIndex] = None) -> List[Listing]:
     """
-    Заглушка: онлайн-скрейп выключен по умолчанию.
-    Включить можно, установив WEB_SCRAPE_ENABLED=1 и реализовав httpx-парсинг.
+    Карточки со страниц выдачи; дубли (одна вакансия на двух страницах) убираются.
+    Без index все страницы качаются параллельно. С index — волнами по per_host
+    страниц: возвращаются только не импортированные (или изменившиеся) карточки,
+    а пагинация останавливается на первой загруженной странице, где таких нет (или
+    карточек нет вовсе). Незагрузившаяся страница пропускается и пагинацию не останавливает.
+    Импортированными карточки станут после успешного /write (index.mark_imported).
     """
+    urls = [search_url(base, query, p) for p in range(max(1, pages))]
+    step = len(urls) if index is None else max(1, engine.per_host)
+    seen, out = set(), []
+    for k in range(0, len(urls), step):
+        wave = urls[k:k + step]
+        stop = False
+        for url, html in zip(wave, await engine.fetch_all(wave)):
+            if html is None:
+                log.warning("scrape.%s page %d skipped: fetch failed", source, urls.index(url))
+                continue
+            page = [it for it in parse_serp(html, source, url) if it.id not in seen]
+            seen.update(it.id for it in page)
+            if index is not None:
+                page = await asyncio.to_thread(index.changed, source, page)
+                if not page:
+                    stop = True
+                    break
+            out.extend(page)
+        if stop:
+            log.info("scrape.%s stop at page %d: nothing new", source, urls.index(url))
+            break
+    if index is not None:
+        await asyncio.to_thread(index.remember, source, out)
+    return out
+
+
+def search_text(query: str, hospital: str | None) -> str:
+    return f"{query} {hospital}".strip() if hospital else query
+
+
+async def scrape_hh_listings(engine: ScrapeEngine, query: str, hospital: str | None = None, pages: int = 2,
+                             index: Optional[ListingIndex] = None, base: Optional[str] = None) -> List[Listing]:
     if os.getenv("WEB_SCRAPE_ENABLED", "0") != "1":
         raise RuntimeError("WEB scraping is disabled. Set WEB_SCRAPE_ENABLED=1 to enable.")
-    # TODO: httpx + парсер выдачи hh.ru → Record
-    return []
+    return await fetch_listings(engine, base or _base(), "hh", search_text(query, hospital), pages, index)
+
+
+async def scrape_hh_async(engine: ScrapeEngine, query: str, hospital: str | None = None, pages: int = 2,
+                          index: Optional[ListingIndex] = None) -> List[Record]:
+    return [listing_to_record(it) for it in await scrape_hh_listings(engine, query, hospital, pages, index)]
+
+
+def scrape_hh(query: str, hospital: str | None = None, pages: int = 2,
+              index: Optional[ListingIndex] = None) -> List[Record]:
+    """Синхронная обёртка для скриптов: свой движок на время вызова."""
+    async def run():
+        engine = engine_from_env()
+        try:
+            return await scrape_hh_async(engine, query, hospital, pages, index)
+        finally:
+            await engine.aclose()
+    return asyncio.run(run())
@@ -1,14 +1,40 @@
 from __future__ import annotations
-import os
-from typing import List
+import asyncio, os
+from typing import List, Optional
+
 from .schema import Record
+from .scrape_engine import Listing, ScrapeEngine, engine_from_env, listing_to_record
+from .scrape_hh import search_text, fetch_listings
+from .listing_index import ListingIndex
+
+# zarplata.ru работает на платформе hh: та же выдача /search/vacancy и та же разметка data-qa
+
+
+def _base() -> str:
+    """Для скриптов вне агента; агент передаёт base из agent.config.settings."""
+    return os.getenv("SCRAPE_ZP_BASE", "https://www.zarplata.ru")
+
 
-def scrape_zarplata(query: str, hospital: str | None = None, pages: int = 2) -> List[Record]:
-    """
-    Заглушка: онлайн-скрейп выключен по умолчанию.
-    Включить можно, установив WEB_SCRAPE_ENABLED=1 и реализовав httpx-парсинг.
-    """
+async def scrape_zarplata_listings(engine: ScrapeEngine, query: str, hospital: str | None = None,
+                                   pages: int = 2, index: Optional[ListingIndex] = None,
+                                   base: Optional[str] = None) -> List[Listing]:
     if os.getenv("WEB_SCRAPE_ENABLED", "0") != "1":
         raise RuntimeError("WEB scraping is disabled. Set WEB_SCRAPE_ENABLED=1 to enable.")
-    # TODO: httpx + парсер разметки zarplata.ru, нормализация в Record
-    return []
+    return await fetch_listings(engine, base or _base(), "zp", search_text(query, hospital), pages, index)
+
+
+async def scrape_zarplata_async(engine: ScrapeEngine, query: str, hospital: str | None = None,
+                                pages: int = 2, index: Optional[ListingIndex] = None) -> List[Record]:
+    return [listing_to_record(it) for it in await scrape_zarplata_listings(engine, query, hospital, pages, index)]
+
+
+def scrape_zarplata(query: str, hospital: str | None = None, pages: int = 2,
+                    index: Optional[ListingIndex] = None) -> List[Record]:
+    """Синхронная обёртка для скриптов: свой движок на время вызова."""
+    async def run():
+        engine = engine_from_env()
+        try:
+            return await scrape_zarplata_async(engine, query, hospital, pages, index)
+        finally:
+            await engine.aclose()
+    return asyncio.run(run())
@@ -0,0 +1,46 @@
+from __future__ import annotations
+import hashlib, hmac, json, logging, secrets
+from typing import Optional
+from .schema import Record, ALL_FIELDS
+
+log = logging.getLogger("signing")
+
+# Без общего секрета токены живут до рестарта процесса: после него /write
+# просто перепроверит записи целиком — это безопасно, только медленнее.
+_SECRET = secrets.token_hex(32).encode("utf-8")
+
+def configure(secret: str) -> None:
+    """Секрет из настроек агента (PREVIEW_TOKEN_SECRET); пустой — остаётся случайный."""
+    if secret:
+        use_secret(secret.encode("utf-8"))
+        return
+    log.warning("PREVIEW_TOKEN_SECRET is not set: using a random secret, preview tokens "
+                "are not valid across restarts or agent replicas (/write will re-validate records)")
+
+def current_secret() -> bytes:
+    return _SECRET
+
+def use_secret(secret: bytes) -> None:
+    """Секрет родительского процесса в воркерах пула: их токены должны проходить verify_record."""
+    global _SECRET
+    _SECRET = secret
+
+def _canonical(rec: Record) -> bytes:
+    # значения полей в фиксированном порядке схемы — дешевле, чем rec.dict() + sort_keys
+    return json.dumps([getattr(rec, f) for f in ALL_FIELDS], ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+def record_digest(rec: Record) -> str:
+    """Канонический sha256 записи."""
+    return hashlib.sha256(_canonical(rec)).hexdigest()
+
+def sign_record(rec: Record, version: str) -> str:
+    """Токен «запись прошла PREVIEW без uncertain на справочниках version»: '<version>.<hmac>'."""
+    mac = hmac.new(_SECRET, version.encode("utf-8") + b"\n" + _canonical(rec), hashlib.sha256)
+    return f"{version}.{mac.hexdigest()}"
+
+def verify_record(rec: Record, version: str, token: Optional[str]) -> bool:
+    """True — запись не менялась и справочники той же версии: повторная валидация не нужна."""
+    if not token or not token.startswith(version + "."):
+        return False
+    return hmac.compare_digest(token, sign_record(rec, version))
@@ -0,0 +1,140 @@
+from __future__ import annotations
+import asyncio, logging, os, re, threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+log = logging.getLogger("smalltalk")
+
+SYSTEM_PROMPT = (
+    "Ты — помощник HR-бота клиники. Отвечай кратко и дружелюбно. "
+    "Если спрашивают про вакансии/поиск — подскажи, что можно написать: "
+    "«найди на зарплата ру медсестёр в ОДКБ на 2 страницы», "
+    "и что перед записью нужна команда /use_table <TABLE_ID>."
+)
+FALLBACK_REPLY = (
+    "Сейчас не могу ответить подробно. Я умею делать PREVIEW из CSV и искать вакансии: "
+    "«найди на зарплата ру медсестёр в ОДКБ на 2 страницы». Перед записью — /use_table <TABLE_ID>."
+)
+
+_SPACES = re.compile(r"\s+")
+_EDGE_PUNCT = " .,!?…;:)(«»\"'"
+
+
+def normalize_prompt(message: str) -> str:
+    """Ключ кэша: регистр, ё/е, пробелы и пунктуация по краям не важны."""
+    return _SPACES.sub(" ", message.lower().replace("ё", "е")).strip(_EDGE_PUNCT)
+
+
+class SmallTalk:
+    """
+    Small talk через AsyncOpenAI: кэш ответов LRU+TTL по нормализованному сообщению,
+    одинаковые одновременные вопросы ждут один запрос к модели (single-flight),
+    жёсткий таймаут — и заготовленный ответ вместо ошибки (он не кэшируется).
+    Клиент можно передать готовым или фабрикой — тогда openai импортируется
+    только при первом small talk (или в warm()).
+    """
+    def __init__(self, client: Any = None, model: str = "", timeout: float = 8.0,
+                 cache_size: int = 512, ttl: float = 3600.0, factory: Optional[Callable[[], Any]] = None):
+        self.client = client          # AsyncOpenAI; None — ещё не создан или ключ не задан
+        self._factory = factory
+        self.model = model
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.stats = {"hit": 0, "miss": 0, "coalesced": 0, "fallback": 0}
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._warm_lock = threading.Lock()   # первые сообщения приходят разом — клиент создаётся один
+
+    def _cached(self, key: str) -> Optional[str]:
+        hit = self._cache.get(key)
+        if hit is None:
+            return None
+        expires, text = hit
+        if expires < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return text
+
+    def _store(self, key: str, text: str) -> None:
+        self._cache[key] = (time.monotonic() + self.ttl, text)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def reply(self, message: str) -> str:
+        key = normalize_prompt(message)
+        text = self._cached(key)
+        if text is not None:
+            self.stats["hit"] += 1
+            return text
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["miss"] += 1
+            task = asyncio.get_running_loop().create_task(self._complete(key, message.strip()))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def warm(self) -> Any:
+        """Создать клиент сейчас, а не на первом сообщении."""
+        with self._warm_lock:
+            if self.client is None and self._factory is not None:
+                self.client, self._factory = self._factory(), None
+        return self.client
+
+    async def _complete(self, key: str, message: str) -> str:
+        if self.client is None and self._factory is not None:
+            await asyncio.to_thread(self.warm)   # импорт openai не должен держать event loop
+        if self.client is None:
+            self.stats["fallback"] += 1
+            return FALLBACK_REPLY
+        try:
+            resp = await asyncio.wait_for(self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": message},
+                ],
+                temperature=0.4,
+                max_tokens=200,
+            ), timeout=self.timeout)
+            text = (resp.choices[0].message.content or "").strip()
+        except Exception as e:   # таймаут, сеть, 4xx/5xx API — пользователь получает заготовку
+            log.warning("smalltalk: %s: %s", type(e).__name__, e)
+            self.stats["fallback"] += 1
+            return FALLBACK_REPLY
+        if not text:
+            self.stats["fallback"] += 1
+            return FALLBACK_REPLY
+        self._store(key, text)
+        return text
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+
+
+def make_smalltalk(api_key: str, model: str = "gpt-5-mini", base_url: str = "", timeout: float = 8.0,
+                   cache_size: int = 512, ttl: float = 3600.0) -> SmallTalk:
+    """SmallTalk с ленивым AsyncOpenAI; без api_key — всегда заготовленный ответ."""
+    def factory():
+        from openai import AsyncOpenAI   # ~1 с импорта и десятки МБ — только когда нужен
+        return AsyncOpenAI(api_key=api_key, base_url=base_url or None, timeout=timeout, max_retries=0)
+    return SmallTalk(factory=factory if api_key else None, model=model, timeout=timeout,
+                     cache_size=cache_size, ttl=ttl)
+
+
+def smalltalk_from_env() -> SmallTalk:
+    """Для скриптов вне агента; агент собирает SmallTalk из agent.config.settings."""
+    return make_smalltalk(
+        os.getenv("OPENAI_API_KEY", ""),
+        model=os.getenv("AGENT_MODEL", "gpt-5-mini"),
+        base_url=os.getenv("OPENAI_BASE_URL", ""),
+        timeout=float(os.getenv("CHAT_TIMEOUT_SEC", "8")),
+        cache_size=int(os.getenv("CHAT_CACHE_SIZE", "512")),
+        ttl=float(os.getenv("CHAT_CACHE_TTL_SEC", "3600")),
+    )
@@ -1,34 +1,138 @@
 from __future__ import annotations
-from typing import Dict, Any, List
-import logging, os
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio, logging
+import httpx
 from .schema import Record
 from .preview import preview_records
-from .nocodb_client import from_env as nococlient_from_env
+from .registry import registry
+from .signing import verify_record
+from .dedup import DedupIndex, dedup_digest, get_index
+from .meta import SchemaCache
+from .nocodb_client import AsyncNocoClient, async_from_env
 
 log = logging.getLogger("write")
 
-def write_records(records: List[Record], table_id: str, rel_name: str | None = None) -> List[Dict[str, Any]]:
+# Значения по умолчанию для вызовов вне агента (write_records); агент передаёт
+# NOCODB_BULK_CHUNK / NOCODB_INLINE_LINKS / WRITE_CONCURRENCY из agent.config.settings.
+BULK_CHUNK = 100
+# связи прямо в теле create (NocoDB с LinkToAnotherRecord, принимающим [{"id": ..}] при вставке)
+INLINE_LINKS = False
+WRITE_CONCURRENCY = 4
+
+def _row_id(res: Dict[str, Any]) -> Any:
+    return res.get("Id") or res.get("id") or res.get("ID")  # NocoDB может называть по-разному
+
+def _as_id(raw: Optional[str]) -> Any:
+    # в индексе Id хранится строкой; числовые возвращаем числом, как отдаёт NocoDB
+    return int(raw) if raw is not None and raw.isdigit() else raw
+
+async def write_records_async(records: List[Record], table_id: str, rel_name: str | None,
+                              client: AsyncNocoClient,
+                              tokens: Optional[List[Optional[str]]] = None,
+                              schema: Optional[SchemaCache] = None,
+                              bulk_chunk: Optional[int] = None,
+                              inline_links: Optional[bool] = None,
+                              concurrency: Optional[int] = None,
+                              dedup: Optional[DedupIndex] = None) -> List[Dict[str, Any]]:
     """
-    Пишем подтверждённые записи в таблицу NocoDB.
-    Возвращаем список результатов: {"id": ..., "status": "ok"|"skip", "reason": "..."}
+    Пишем подтверждённые записи в таблицу NocoDB через общий асинхронный клиент.
+    tokens — PreviewItem.token по позициям records; подписанные и не изменённые записи
+    не проходят preview повторно.
+    schema — кэш метаданных: справочники из NocoDB и проверка, что ключи payload есть в таблице.
+    Уже записанные ранее (локальный индекс dedup; None — без проверки) не отправляются: status "duplicate".
+    bulk_chunk / inline_links / concurrency — None: BULK_CHUNK / INLINE_LINKS / WRITE_CONCURRENCY.
+    Возвращаем список результатов: {"id": ..., "status": "ok"|"skip"|"duplicate"|"error", "reason": "..."}
     """
-    client = nococlient_from_env("VAC")
-    results: List[Dict[str, Any]] = []
-    try:
-        for rec in records:
-            # safety: ещё раз быстро проверим превью (должно быть без uncertain)
-            prev = preview_records([rec])[0]
-            if prev.uncertain:
-                results.append({"status": "skip", "reason": "uncertain_fields", "record": rec.dict()})
+    bulk_chunk = max(1, BULK_CHUNK if bulk_chunk is None else bulk_chunk)
+    inline_links = INLINE_LINKS if inline_links is None else inline_links
+    concurrency = max(1, WRITE_CONCURRENCY if concurrency is None else concurrency)
+    # один снимок справочников на весь батч
+    snap = (schema.snapshot_nowait(table_id) if schema is not None else None) or registry.get()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    tokens = tokens or []
+
+    # safety: неподписанные/изменённые записи ещё раз прогоняем через превью
+    # (должно быть без uncertain); это CPU-работа — уводим её из event loop
+    recheck = [i for i, rec in enumerate(records)
+               if not verify_record(rec, snap.version, tokens[i] if i < len(tokens) else None)]
+    uncertain: set = set()
+    if recheck:
+        previews = await asyncio.to_thread(preview_records, [records[i] for i in recheck], snap)
+        uncertain = {i for i, prev in zip(recheck, previews) if prev.uncertain}
+    index = dedup
+    digests = [dedup_digest(rec) for rec in records] if index is not None else []
+    # SQLite — блокирующий вызов: не в event loop
+    known = await asyncio.to_thread(index.lookup, table_id, digests) if index is not None else {}
+    first_in_batch: Dict[str, int] = {}
+    repeats: List[Tuple[int, int]] = []   # (позиция, позиция первой такой же записи в батче)
+
+    todo: List[Tuple[int, Record, Dict[str, Any]]] = []
+    for i, rec in enumerate(records):
+        if i in uncertain:
+            results[i] = {"status": "skip", "reason": "uncertain_fields", "record": rec.dict()}
+            continue
+        if index is not None:
+            d = digests[i]
+            if d in known:
+                results[i] = {"status": "duplicate", "id": _as_id(known[d])}
+                continue
+            if d in first_in_batch:
+                repeats.append((i, first_in_batch[d]))
                 continue
+            first_in_batch[d] = i
+        payload = {k: v for k, v in rec.dict(exclude_none=True).items() if k != "Требования"}
+        if inline_links and rel_name and rec.Требования:
+            payload[rel_name] = [{"id": rid} for rid in rec.Требования]
+        unknown = schema.unknown_keys(table_id, payload) if schema is not None else []
+        if unknown:
+            results[i] = {"status": "error", "reason": "unknown_columns: " + ", ".join(unknown)}
+            continue
+        todo.append((i, rec, payload))
+
+    # пакеты create и последующие link идут параллельно, но не больше concurrency запросов разом
+    sem = asyncio.Semaphore(concurrency)
+
+    async def link_one(row_id: Any, req_ids: List[int]) -> None:
+        async with sem:
+            await client.link_requirements(table_id, rel_name, row_id, req_ids)  # type: ignore[arg-type]
+
+    async def run_chunk(chunk: List[Tuple[int, Record, Dict[str, Any]]]) -> None:
+        async with sem:
+            try:
+                created = await client.create_records(table_id, [p for _, _, p in chunk], chunk_size=len(chunk))
+            except httpx.HTTPError as e:  # повторы исчерпаны — помечаем пакет, батч не роняем
+                log.error("write: chunk of %d failed: %s", len(chunk), e)
+                created = [{"error": str(e)}] * len(chunk)
+        links = []
+        for (i, rec, _), res in zip(chunk, created):
+            if "error" in res:
+                results[i] = {"status": "error", "reason": res["error"]}
+                continue
+            new_id = _row_id(res)
+            # линковка требований (если не ушла inline вместе с create)
+            if new_id and rel_name and rec.Требования and not inline_links:
+                links.append(link_one(new_id, rec.Требования))
+            results[i] = {"status": "ok", "id": new_id}
+        await asyncio.gather(*links)
+        if index is not None:
+            ok = [(i, results[i]) for i, _, _ in chunk]
+            await asyncio.to_thread(index.add, table_id,
+                                    [(digests[i], res["id"]) for i, res in ok if res and res["status"] == "ok"])
+
+    await asyncio.gather(*(run_chunk(todo[k:k + bulk_chunk]) for k in range(0, len(todo), bulk_chunk)))
+    for i, first in repeats:
+        prev = results[first] or {}
+        results[i] = ({"status": "duplicate", "id": prev.get("id")} if prev.get("status") == "ok"
+                      else dict(prev))
+    return results  # type: ignore[return-value]
 
-            payload = {k: v for k, v in rec.dict(exclude_none=True).items() if k != "Требования"}
-            res = client.create_record(table_id, payload)
-            new_id = res.get("Id") or res.get("id") or res.get("ID")  # NocoDB может называть по-разному
-            # линковка требований
-            if new_id and rel_name and rec.Требования:
-                client.link_requirements(table_id, rel_name, new_id, rec.Требования)
-            results.append({"status": "ok", "id": new_id})
-    finally:
-        client.close()
-    return results
+def write_records(records: List[Record], table_id: str, rel_name: str | None = None,
+                  tokens: Optional[List[Optional[str]]] = None) -> List[Dict[str, Any]]:
+    """Синхронная обёртка (скрипты/тесты): свой клиент на один вызов."""
+    async def _run() -> List[Dict[str, Any]]:
+        client = async_from_env("VAC")
+        try:
+            return await write_records_async(records, table_id, rel_name, client, tokens, dedup=get_index())
+        finally:
+            await client.aclose()
+    return asyncio.run(_run())
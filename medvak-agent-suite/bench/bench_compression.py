@@ -0,0 +1,97 @@
+"""
+Бенчмарк сжатия трафика бот↔агент: байты запроса/ответа /preview и время запроса
+без сжатия и с gzip (тело запроса — как шлёт bot/api.py, ответ — GZipMiddleware агента).
+
+    python bench/bench_compression.py [--rows 1000 10000] [--repeat 5] [--cached] [--mbps 20]
+    python bench/bench_compression.py --url http://localhost:8000     # живой агент по сети
+
+По умолчанию агент поднимается in-process (httpx.ASGITransport): сеть не участвует,
+поэтому кроме измеренного времени печатается оценка передачи по каналу --mbps.
+Без --cached кэш ответов /preview выключен — каждый запрос считает preview заново.
+"""
+from __future__ import annotations
+import argparse, asyncio, gzip, json, os, pathlib, statistics, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.append(str(ROOT / "bench"))
+os.environ.setdefault("AGENT_MAP_PATH", str(ROOT / "agent" / "agent_map" / "agent-map.json"))
+os.environ.setdefault("ALIASES_FILE", str(ROOT / "shared" / "aliases.yml"))
+os.environ.setdefault("PREVIEW_WORKERS", "1")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+
+from bench_preview_columnar import make_csv
+
+
+def request_args(csv_text: str, compress: bool, level: int) -> dict:
+    body = json.dumps({"csv_text": csv_text}, ensure_ascii=False).encode("utf-8")
+    headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip" if compress else "identity"}
+    if compress:
+        body = gzip.compress(body, compresslevel=level, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+    return {"content": body, "headers": headers}
+
+
+async def measure(client: httpx.AsyncClient, csv_text: str, compress: bool, level: int, repeat: int) -> dict:
+    times, req_bytes, resp_bytes = [], 0, 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        args = request_args(csv_text, compress, level)       # сжатие на стороне бота — в замере
+        async with client.stream("POST", "/preview", **args) as r:
+            raw = b"".join([c async for c in r.aiter_raw()])
+            data = gzip.decompress(raw) if r.headers.get("content-encoding") == "gzip" else raw
+            json.loads(data)
+        times.append(time.perf_counter() - t0)
+        assert r.status_code == 200, r.status_code
+        req_bytes, resp_bytes = len(args["content"]), len(raw)
+    return {"req": req_bytes, "resp": resp_bytes, "s": statistics.median(times)}
+
+
+async def run(args) -> None:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=300)
+        lifespan = None
+    else:
+        if not args.cached:
+            os.environ["PREVIEW_CACHE_SIZE"] = "0"
+        import agent.app
+        app = agent.app.app
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://agent", timeout=300)
+    try:
+        print(f"{'rows':>6} {'mode':5} {'request':>12} {'response':>12} {'measured':>10} {f'+link {args.mbps:g} Mbit/s':>20}")
+        for rows in args.rows:
+            csv_text = make_csv(rows)
+            base = None
+            for compress in (False, True):
+                m = await measure(client, csv_text, compress, args.level, args.repeat)
+                link = m["s"] + (m["req"] + m["resp"]) * 8 / (args.mbps * 1e6)
+                mode = "gzip" if compress else "plain"
+                print(f"{rows:>6} {mode:5} {m['req']:>10,} B {m['resp']:>10,} B {m['s']:>9.3f}s {link:>19.3f}s", end="")
+                if base is None:
+                    base = (m["req"] + m["resp"], link)
+                    print()
+                else:
+                    print(f"   bytes ×{base[0] / (m['req'] + m['resp']):.1f} less, link-time ×{base[1] / link:.2f}")
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--level", type=int, default=int(os.getenv("GZIP_LEVEL", "5")))
+    ap.add_argument("--mbps", type=float, default=20.0)
+    ap.add_argument("--cached", action="store_true")
+    ap.add_argument("--url")
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Бенчмарк: разбор CSV в Record — прежний путь (Sniffer + DictReader + Record(**payload))
+против быстрого (счётчик разделителей в заголовке, проекция колонок, csv.reader, Record.construct).
+
+    python bench/bench_ingest.py [--rows 100000] [--repeat 3]
+
+CSV тот же, что в bench_preview_columnar (разделитель «,»). Проверяет, что записи совпадают.
+"""
+from __future__ import annotations
+import argparse, csv, io, pathlib, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+sys.path.append(str(ROOT / "bench"))
+
+from bench_preview_columnar import make_csv
+from tools.ingest_csv import KNOWN, parse_csv_text
+from tools.schema import Record, F_REQ
+
+
+def old_parse_csv_text(csv_text: str, delimiter: str = ",") -> list:
+    """Прежняя реализация parse_csv_text — для сравнения."""
+    buf = io.StringIO(csv_text)
+    try:
+        delim = csv.Sniffer().sniff(csv_text[:1024]).delimiter
+    except Exception:
+        delim = delimiter
+    out = []
+    for row in csv.DictReader(buf, delimiter=delim):
+        payload = {}
+        for k, v in row.items():
+            if k is None:
+                continue
+            key = k.strip()
+            if key not in KNOWN:
+                continue
+            payload[key] = (v or "").strip()
+        if F_REQ in payload and payload[F_REQ]:
+            req = [int(t.strip()) for t in str(payload[F_REQ]).replace(";", ",").split(",") if t.strip().isdigit()]
+            payload[F_REQ] = req or None
+        out.append(Record(**payload))
+    return out
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    csv_text = make_csv(args.rows)
+    assert [r.dict() for r in old_parse_csv_text(csv_text)] == [r.dict() for r in parse_csv_text(csv_text)], "records differ"
+
+    t_old = best_of(lambda: old_parse_csv_text(csv_text), args.repeat)
+    t_new = best_of(lambda: parse_csv_text(csv_text), args.repeat)
+    print(f"rows={args.rows} (best of {args.repeat})")
+    print(f"old (Sniffer+DictReader+Record):   {t_old:6.2f}s  {args.rows / t_old:10,.0f} rows/s")
+    print(f"new (reader+projection+construct): {t_new:6.2f}s  {args.rows / t_new:10,.0f} rows/s   ×{t_old / t_new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Бенчмарк: parse_intent_free_text на большом словаре алиасов.
+
+    python bench/bench_intent.py [--aliases 5000] [--messages 2000]
+
+Сравнивает прежний перебор (lower() + подстрока для каждого ключа) с автоматом
+Ахо–Корасик из снимка справочников и проверяет, что больница находится та же.
+"""
+from __future__ import annotations
+import argparse, os, pathlib, random, sys, tempfile, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "agent"))
+os.environ.setdefault("AGENT_MAP_PATH", str(ROOT / "agent" / "agent_map" / "agent-map.json"))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+KINDS = ["ГКБ", "ДГКБ", "ОДКБ", "ГБ", "ЦРБ", "Отделение", "ОАРИТ", "Поликлиника"]
+TEMPLATES = [
+    "найди на зарплата ру медсестёр в {h} на 2 страницы",
+    "поиск hh вакансия процедурная {h}",
+    "привет, как дела?",
+    "нужны медсестры в {h}, посмотри хх по 3 страниц",
+    "что умеешь",
+]
+
+
+def make_aliases(n: int, seed: int = 1) -> str:
+    rnd = random.Random(seed)
+    lines = []
+    for i in range(n):
+        key = f"{rnd.choice(KINDS)}{i}"
+        lines.append(f'{key}: "{key} — канон {i}"')
+    return "\n".join(lines)
+
+
+def old_match(aliases, text):
+    low = text.lower()
+    for k, v in aliases.items():
+        if k.lower() in low:
+            return v
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--aliases", type=int, default=5000)
+    ap.add_argument("--messages", type=int, default=2000)
+    args = ap.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".yml", delete=False, encoding="utf-8") as f:
+        f.write(make_aliases(args.aliases))
+    os.environ["ALIASES_FILE"] = f.name
+
+    from agent.router import parse_intent_free_text
+    from agent.tools.registry import registry
+
+    t0 = time.perf_counter()
+    snap = registry.get()
+    print(f"snapshot build (aliases={len(snap.aliases)}): {time.perf_counter() - t0:.3f}s, automaton states={len(snap.matcher._ac)}")
+
+    rnd = random.Random(2)
+    keys = list(snap.aliases)
+    msgs = [rnd.choice(TEMPLATES).format(h=rnd.choice(keys)) for _ in range(args.messages)]
+
+    t0 = time.perf_counter()
+    old = [old_match(snap.aliases, m) for m in msgs]
+    t_old = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    new = [parse_intent_free_text(m) for m in msgs]
+    t_new = time.perf_counter() - t0
+
+    for m, o, n in zip(msgs, old, new):
+        if n.action == "scrape":
+            assert (n.hospital == o) or (o is None), (m, o, n.hospital)
+    print(f"old alias scan:   {t_old * 1e6 / len(msgs):8.1f} µs/msg")
+    print(f"parse_intent (AC): {t_new * 1e6 / len(msgs):8.1f} µs/msg   ×{t_old / t_new:.1f}")
+    os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
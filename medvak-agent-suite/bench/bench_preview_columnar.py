@@ -0,0 +1,68 @@
+"""
+Бенчмарк: построчный preview vs колоночный (distinct-value) проход.
+
+    python bench/bench_preview_columnar.py [--rows 50000]
+
+Синтетический CSV с низкой кардинальностью в График/Тип_смены/Время_работы/Отделение,
+как в реальных выгрузках больниц. Проверяет, что результаты идентичны.
+"""
+from __future__ import annotations
+import argparse, os, pathlib, random, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+os.environ.setdefault("AGENT_MAP_PATH", str(ROOT / "agent" / "agent_map" / "agent-map.json"))
+os.environ.setdefault("ALIASES_FILE", str(ROOT / "shared" / "aliases.yml"))
+os.environ.setdefault("PREVIEW_WORKERS", "1")   # здесь сравниваем однопоточные пути
+
+from tools.ingest_csv import parse_csv_text
+from tools.preview import _preview_one, preview_records
+from tools.registry import registry
+
+DEPTS = ["Операционный блок", "ОАРИТ №1", "Отделение приемное", "Дневной стационар", "Отделение анестезиолгии-реанимации №1",
+         "Хирургическое отделение №1", "Отделение педиатрическое ", "Приёмный покой"]
+ROLES = ["процедурная медсестра", "палатная медсестра", "Врач", "Санитар", "Лаборант"]
+SCHED = ["2/2", "1/3", "5/2", "2/2 (возможны 1/3)", "5/2 или 2/2"]
+SHIFT = ["сутки", "дневная", "дневная 12-часовая", "вечерняя", "Суточные смены"]
+TIMES = ["8:00-20:00", "08:00 - 17:00", "12 часов (8:00-20:00)", "17:00-08:00", "12 часов"]
+WORK = ["Основной сотрудник", "Студент УГМУ", "Студент СОМК", "Совместитель"]
+
+
+def make_csv(rows: int, seed: int = 42) -> str:
+    rnd = random.Random(seed)
+    lines = ["Title,Отделение,Должность,Работник,График,Тип_смены,Время_работы,Статус"]
+    for i in range(rows):
+        lines.append(",".join([
+            f"Вакансия {i}", rnd.choice(DEPTS), rnd.choice(ROLES), rnd.choice(WORK),
+            f'"{rnd.choice(SCHED)}"', rnd.choice(SHIFT), f'"{rnd.choice(TIMES)}"', rnd.choice(["Открыта", "Закрыта"]),
+        ]))
+    return "\n".join(lines)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=50_000)
+    args = ap.parse_args()
+
+    csv_text = make_csv(args.rows)
+    snap = registry.get()
+
+    recs = parse_csv_text(csv_text)
+    t0 = time.perf_counter()
+    per_row = [_preview_one(r, snap) for r in recs]
+    t_row = time.perf_counter() - t0
+
+    recs = parse_csv_text(csv_text)
+    t0 = time.perf_counter()
+    columnar = preview_records(recs, snap)
+    t_col = time.perf_counter() - t0
+
+    assert [it.json() for it in per_row] == [it.json() for it in columnar], "columnar output differs"
+    print(f"rows={args.rows}")
+    print(f"per-row : {t_row:.2f}s ({args.rows / t_row:,.0f} rows/s)")
+    print(f"columnar: {t_col:.2f}s ({args.rows / t_col:,.0f} rows/s)")
+    print(f"speedup : x{t_row / t_col:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Бенчмарк: последовательный preview vs шарды в пуле процессов.
+
+    python bench/bench_preview_parallel.py [--rows 100000] [--workers 2,4,8] [--shard 5000]
+
+CSV тот же, что в bench_preview_columnar. Для каждого числа воркеров проверяет,
+что JSON результата побайтно совпадает с последовательным путём.
+Первый прогон пула включает запуск процессов — он печатается отдельно.
+"""
+from __future__ import annotations
+import argparse, os, pathlib, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+sys.path.append(str(ROOT / "bench"))
+os.environ.setdefault("AGENT_MAP_PATH", str(ROOT / "agent" / "agent_map" / "agent-map.json"))
+os.environ.setdefault("ALIASES_FILE", str(ROOT / "shared" / "aliases.yml"))
+
+from bench_preview_columnar import make_csv
+from tools.ingest_csv import parse_csv_text
+from tools.preview import _preview_columnar
+from tools.parallel import preview_parallel, pools
+from tools.registry import registry
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--workers", default=",".join(str(w) for w in (2, 4, os.cpu_count() or 1)))
+    ap.add_argument("--shard", type=int, default=5000)
+    args = ap.parse_args()
+
+    snap = registry.get()
+    csv_text = make_csv(args.rows)
+    recs = parse_csv_text(csv_text)   # preview нормализует записи на месте — каждому прогону свои
+    t0 = time.perf_counter()
+    serial = [it.json() for it in _preview_columnar(recs, snap)]
+    t_serial = time.perf_counter() - t0
+    print(f"rows={args.rows} cpu={os.cpu_count()} shard={args.shard}")
+    print(f"serial      : {t_serial:6.2f}s ({args.rows / t_serial:,.0f} rows/s)")
+
+    for w in sorted({int(x) for x in args.workers.split(",") if int(x) > 1}):
+        t0 = time.perf_counter()
+        preview_parallel(parse_csv_text(csv_text)[: args.shard * w], snap, workers=w, shard_rows=args.shard)   # старт пула
+        t_start = time.perf_counter() - t0
+        recs = parse_csv_text(csv_text)
+        t0 = time.perf_counter()
+        items = preview_parallel(recs, snap, workers=w, shard_rows=args.shard)
+        t_par = time.perf_counter() - t0
+        assert [it.json() for it in items] == serial, f"workers={w}: output differs"
+        print(f"workers={w:<4}: {t_par:6.2f}s ({args.rows / t_par:,.0f} rows/s)  x{t_serial / t_par:.2f}"
+              f"  [pool warm-up {t_start:.2f}s]")
+    pools.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Бенчмарк: память фоновой задачи preview по загруженному CSV — пиковый RSS процесса.
+
+    python bench/bench_rowstore.py [--rows 100000]
+
+Варианты (каждый — в отдельном процессе: пиковый RSS не убывает):
+  list    — весь файл в List[Record], результат — List[PreviewItem] (до PreviewStore);
+  store   — весь файл в List[Record], результат — PreviewStore;
+  text    — текст целиком, iter_csv_records → PreviewStore.extend срезами по 1000 записей,
+            как /preview (и ?stream=1): CSV приходит строкой в JSON, List[Record] не собирается;
+  stream  — iter_csv_bytes кусками по 64 КБ → PreviewStore.extend срезами по 1000 записей,
+            как /jobs/preview/file: в памяти нет и текста файла.
+Файл берётся с диска (как спул загрузки), синтетический CSV тот же, что в bench_preview_columnar.
+Печатается прирост пикового RSS (VmHWM, сброшенный после импорта и прогрева справочников; Linux);
+варианты должны отдать одинаковые PreviewItem.
+"""
+from __future__ import annotations
+import argparse, hashlib, itertools, os, pathlib, subprocess, sys, tempfile, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+sys.path.append(str(ROOT / "bench"))
+os.environ.setdefault("AGENT_MAP_PATH", str(ROOT / "agent" / "agent_map" / "agent-map.json"))
+os.environ.setdefault("ALIASES_FILE", str(ROOT / "shared" / "aliases.yml"))
+os.environ.setdefault("PREVIEW_WORKERS", "1")
+
+VARIANTS = ("list", "store", "text", "stream")
+STORE_CHUNK = 1000      # как _STORE_CHUNK в agent/router.py
+READ_CHUNK = 64 * 1024
+
+
+def _status_mb(key: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(key + ":"):
+                return int(line.split()[1]) / 1024   # кБ
+    raise KeyError(key)
+
+
+def reset_peak_rss() -> float:
+    """Сбросить пик RSS процесса (VmHWM) до текущего; вернуть текущий RSS, МБ."""
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    return _status_mb("VmRSS")
+
+
+def peak_rss_mb() -> float:
+    return _status_mb("VmHWM")
+
+
+def run_variant(variant: str, path: str) -> None:
+    from tools.ingest_csv import iter_csv_bytes, iter_csv_records, parse_csv_text
+    from tools.preview import preview_records
+    from tools.registry import registry
+    from tools.rowstore import PreviewStore
+    from tools.signing import use_secret
+
+    use_secret(b"bench")   # одинаковые токены во всех процессах-вариантах
+    snap = registry.get()
+    snap.warm()
+    base = reset_peak_rss()
+    t0 = time.perf_counter()
+    if variant in ("text", "stream"):
+        result = PreviewStore(snap)
+        with open(path, "rb") as f:
+            if variant == "text":
+                it = iter_csv_records(f.read().decode("utf-8"))
+            else:
+                it = iter_csv_bytes(iter(lambda: f.read(READ_CHUNK), b""))
+            while True:
+                n = len(result)
+                result.extend(itertools.islice(it, STORE_CHUNK))
+                if len(result) - n < STORE_CHUNK:
+                    break
+    else:
+        recs = parse_csv_text(pathlib.Path(path).read_text(encoding="utf-8"))
+        result = preview_records(recs, snap) if variant == "list" else PreviewStore(snap).extend(recs)
+    elapsed = time.perf_counter() - t0
+    h = hashlib.sha256()
+    for it in result[:2000]:
+        h.update(it.json().encode("utf-8"))
+    print(f"{elapsed:.3f} {peak_rss_mb() - base:.1f} {len(result)} {h.hexdigest()}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    ap.add_argument("--path", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.variant:
+        run_variant(args.variant, args.path)
+        return
+
+    from bench_preview_columnar import make_csv
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8", delete=False) as f:
+        f.write(make_csv(args.rows))
+    size_mb = os.path.getsize(f.name) / 2**20
+    try:
+        res = {}
+        for v in VARIANTS:
+            out = subprocess.run([sys.executable, __file__, "--variant", v, "--path", f.name],
+                                 check=True, capture_output=True, text=True).stdout.split()
+            res[v] = (float(out[0]), float(out[1]), int(out[2]), out[3])
+    finally:
+        os.unlink(f.name)
+    assert len({r[2:] for r in res.values()}) == 1, "variants differ"
+
+    print(f"rows={args.rows}  file={size_mb:.1f} MB")
+    for v in VARIANTS:
+        t, rss, _, _ = res[v]
+        print(f"{v:6s}: {t:6.2f}s  peak RSS +{rss:7.1f} MB  (×{res['list'][1] / max(rss, 0.1):.1f} less than list)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Бенчмарк холодного старта агента: время до первого успешного /healthz и RSS.
+
+    python bench/bench_startup.py [--repeat 5] [--warmup] [--uvicorn]
+
+Каждый прогон — новый процесс python. По умолчанию приложение поднимается
+in-process (импорт agent.app → startup → GET /healthz через TestClient);
+с --uvicorn запускается настоящий `uvicorn agent.app:app`, и /healthz опрашивается по сети.
+--warmup включает AGENT_WARMUP=1 (всё ленивое строится в startup).
+"""
+from __future__ import annotations
+import argparse, json, os, pathlib, socket, statistics, subprocess, sys, time
+
+import httpx
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+CHILD = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, os.getcwd())
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+import agent.app
+t_import, rss_import = time.perf_counter() - t0, rss_mb()
+from fastapi.testclient import TestClient
+with TestClient(agent.app.app) as c:
+    ok = c.get("/healthz").status_code == 200
+    t_health, rss_health = time.perf_counter() - t0, rss_mb()
+print(json.dumps({"ok": ok, "import_s": t_import, "healthz_s": t_health,
+                  "rss_import_mb": rss_import, "rss_healthz_mb": rss_health,
+                  "openai_loaded": "openai" in sys.modules}))
+"""
+
+
+def _env(warmup: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault("AGENT_MAP_PATH", str(ROOT / "agent" / "agent_map" / "agent-map.json"))
+    env.setdefault("ALIASES_FILE", str(ROOT / "shared" / "aliases.yml"))
+    env["AGENT_WARMUP"] = "1" if warmup else "0"
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def run_inprocess(warmup: bool) -> dict:
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=_env(warmup),
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _proc_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def run_uvicorn(warmup: bool, timeout: float = 30.0) -> dict:
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "agent.app:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=ROOT, env=_env(warmup),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=0.5).status_code == 200:
+                    return {"ok": True, "healthz_s": time.perf_counter() - t0, "rss_healthz_mb": _proc_rss_mb(proc.pid)}
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        return {"ok": False}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--warmup", action="store_true")
+    ap.add_argument("--uvicorn", action="store_true")
+    args = ap.parse_args()
+
+    run = run_uvicorn if args.uvicorn else run_inprocess
+    runs = [run(args.warmup) for _ in range(args.repeat)]
+    assert all(r.get("ok") for r in runs), runs
+    mode = "uvicorn" if args.uvicorn else "in-process"
+    print(f"mode={mode} warmup={args.warmup} repeat={args.repeat} (медианы)")
+    for key in ("import_s", "healthz_s", "rss_import_mb", "rss_healthz_mb"):
+        if key in runs[0]:
+            print(f"  {key:15s} {statistics.median(r[key] for r in runs):8.3f}")
+    if "openai_loaded" in runs[0]:
+        print(f"  openai imported at startup: {runs[0]['openai_loaded']}")
+
+
+if __name__ == "__main__":
+    main()
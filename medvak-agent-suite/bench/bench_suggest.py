@@ -0,0 +1,100 @@
+"""
+Бенчмарк: подсказки для значений вне справочника — difflib.get_close_matches против SuggestIndex.
+
+    python bench/bench_suggest.py [--sizes 200,2000,20000] [--queries 300]
+
+SuggestIndex.query: триграммный короткий список + точный досмотр остальных по верхней
+оценке ratio. Досмотр — проход по окну длин (O(N) дешёвых сравнений счётчиков символов),
+поэтому ответ совпадает с difflib; колонка «shortlist» — только короткий список
+(без досмотра): столько стоила бы выдача без гарантии совпадения, и в скольких
+запросах она бы разошлась с difflib.
+"""
+from __future__ import annotations
+import argparse, difflib, heapq, pathlib, random, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+from tools.normalize import SUGGEST_CUTOFF, SuggestIndex, _trigrams
+
+SYLLABLES = ["мед", "сес", "тра", "вра", "чей", "про", "це", "дур", "ная", "пала", "тная", "хир", "ург",
+             "нев", "ро", "ло", "гия", "кар", "ди", "о", "ане", "сте", "зио", "реа", "ни", "ма", "ция"]
+
+
+def make_vocab(n: int, rnd: random.Random) -> list:
+    out = set()
+    while len(out) < n:
+        words = ["".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))) for _ in range(rnd.randint(1, 3))]
+        out.add(" ".join(words).capitalize())
+    return sorted(out)
+
+
+def make_queries(vocab: list, k: int, rnd: random.Random) -> list:
+    """Опечатки в значениях справочника и немного совсем чужих строк."""
+    out = []
+    for _ in range(k):
+        s = list(rnd.choice(vocab))
+        for _ in range(rnd.randint(1, 3)):
+            p = rnd.randrange(len(s))
+            op = rnd.random()
+            if op < 0.4:
+                s[p] = rnd.choice("абвгдеёжзийклмнопрстуфхцчшщэюя")
+            elif op < 0.7:
+                del s[p]
+            else:
+                s.insert(p, rnd.choice("аеиоу"))
+        out.append("".join(s) or "x")
+    out += ["".join(rnd.choice(SYLLABLES) for _ in range(3)) for _ in range(k // 10)]
+    return out
+
+
+def shortlist_only(idx: SuggestIndex, value: str, n: int = 3, shortlist: int = 32) -> list:
+    """Первая фаза SuggestIndex.query: скоринг только триграммного короткого списка."""
+    shortlist = max(shortlist, 8 * n)
+    if len(idx.options) <= shortlist:
+        return [x for x, _ in idx.query(value, n=n)]
+    grams = _trigrams(value)
+    hits: dict = {}
+    for g in grams:
+        for i in idx._postings.get(g, ()):
+            hits[i] = hits.get(i, 0) + 1
+    first = heapq.nlargest(shortlist, hits, key=lambda i: 2.0 * hits[i] / (len(grams) + idx._sizes[i]))
+    sm = difflib.SequenceMatcher()
+    sm.set_seq2(value)
+    scored = []
+    for i in first:
+        sm.set_seq1(idx.options[i])
+        r = sm.ratio()
+        if r >= SUGGEST_CUTOFF:
+            scored.append((r, idx.options[i]))
+    return [x for _, x in heapq.nlargest(n, scored)]
+
+
+def timed(fn, queries):
+    t0 = time.perf_counter()
+    res = [fn(q) for q in queries]
+    return (time.perf_counter() - t0) / len(queries) * 1e3, res
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="200,2000,20000")
+    ap.add_argument("--queries", type=int, default=300)
+    args = ap.parse_args()
+
+    print(f"{'options':>8s} {'difflib':>10s} {'index':>10s} {'shortlist':>10s}  diverged(shortlist)")
+    for size in (int(s) for s in args.sizes.split(",")):
+        rnd = random.Random(size)
+        vocab = make_vocab(size, rnd)
+        queries = make_queries(vocab, args.queries, rnd)
+        idx = SuggestIndex(vocab)
+        t_dl, ref = timed(lambda q: difflib.get_close_matches(q, vocab, n=3, cutoff=SUGGEST_CUTOFF), queries)
+        t_ix, got = timed(lambda q: [x for x, _ in idx.query(q, n=3)], queries)
+        t_sl, approx = timed(lambda q: shortlist_only(idx, q), queries)
+        assert got == ref, "SuggestIndex differs from difflib"
+        diverged = sum(a != r for a, r in zip(approx, ref))
+        print(f"{size:8d} {t_dl:8.3f}ms {t_ix:8.3f}ms {t_sl:8.3f}ms  {diverged}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 from __future__ import annotations
 import os
+import json
+import gzip
+import zlib
+import hashlib
+import time
+import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
 import httpx
 
@@ -12,10 +19,38 @@ _TIMEOUT = float(os.getenv("REQUEST_TIMEOUT_SEC", "20"))
 _MAX_CONN = int(os.getenv("HTTPX_MAX_CONN", "4"))
 _MAX_KEEP = int(os.getenv("HTTPX_MAX_KEEPALIVE", "2"))
 
+_JOB_POLL_SEC = float(os.getenv("JOB_POLL_SEC", "1.0"))
+_PREVIEW_MEMO = int(os.getenv("PREVIEW_MEMO_SIZE", "8"))
+_GZIP_MIN = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+_GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+_JOB_WAIT_SEC = float(os.getenv("JOB_WAIT_SEC", "900"))
+
 _limits = httpx.Limits(max_connections=_MAX_CONN, max_keepalive_connections=_MAX_KEEP)
 _client = httpx.AsyncClient(base_url=AGENT_BASE, timeout=_TIMEOUT, limits=_limits)
 
 
+def _json_body(payload: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Аргументы запроса с JSON-телом: больше GZIP_MIN_BYTES — сжимаем gzip
+    (CSV на кириллице в UTF-8 сжимается в разы, агент распаковывает сам).
+    """
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {**(headers or {}), "Content-Type": "application/json"}
+    if _GZIP_MIN > 0 and len(body) >= _GZIP_MIN:
+        body = gzip.compress(body, compresslevel=_GZIP_LEVEL, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+    return {"content": body, "headers": headers}
+
+
+async def _gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    z = zlib.compressobj(_GZIP_LEVEL, wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
 async def close_client():
     """Закрыть HTTP-клиент при остановке бота."""
     await _client.aclose()
@@ -35,20 +70,53 @@ async def agent_config() -> Dict[str, Any]:
     return r.json()
 
 
+# sha256(csv) → (ETag, ответ): повторная отправка того же файла получает 304 без тела
+_preview_memo: "OrderedDict[str, tuple[str, Dict[str, Any]]]" = OrderedDict()
+
+
 async def preview_csv(csv_text: str) -> Dict[str, Any]:
     """POST /preview {csv_text} → {version, items:[{record, uncertain, notes, confidence}]}"""
     payload = {"csv_text": csv_text}
-    r = await _client.post("/preview", json=payload)
+    key = hashlib.sha256(csv_text.encode("utf-8")).hexdigest()
+    memo = _preview_memo.get(key)
+    headers = {"If-None-Match": memo[0]} if memo else None
+    r = await _client.post("/preview", **_json_body(payload, headers))
+    if r.status_code == 304 and memo:
+        _preview_memo.move_to_end(key)
+        return memo[1]
     if r.status_code >= 400:
         log.error("preview error %s: %s", r.status_code, r.text)
     r.raise_for_status()
-    return r.json()
-
-
-async def write_records(records: List[Dict[str, Any]], table_id: str, rel_name: Optional[str] = None) -> Dict[str, Any]:
-    """POST /write {records, table_id, rel_name} → {results:[...]}"""
-    payload = {"records": records, "table_id": table_id, "rel_name": rel_name}
-    r = await _client.post("/write", json=payload)
+    data = r.json()
+    etag = r.headers.get("ETag")
+    if etag and _PREVIEW_MEMO > 0:
+        _preview_memo[key] = (etag, data)
+        _preview_memo.move_to_end(key)
+        while len(_preview_memo) > _PREVIEW_MEMO:
+            _preview_memo.popitem(last=False)
+    return data
+
+
+async def preview_csv_stream(csv_text: str) -> AsyncIterator[Dict[str, Any]]:
+    """POST /preview?stream=1 {csv_text} → PreviewItem по одному, по мере готовности (NDJSON)."""
+    payload = {"csv_text": csv_text}
+    async with _client.stream("POST", "/preview", params={"stream": 1}, **_json_body(payload)) as r:
+        if r.status_code >= 400:
+            await r.aread()
+            log.error("preview stream error %s: %s", r.status_code, r.text)
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+
+async def write_records(records: List[Dict[str, Any]], table_id: str, rel_name: Optional[str] = None,
+                        tokens: Optional[List[Optional[str]]] = None,
+                        listings: Optional[List[Optional[str]]] = None) -> Dict[str, Any]:
+    """POST /write {records, table_id, rel_name, tokens?, listings?} → {results:[...]}"""
+    payload = {"records": records, "table_id": table_id, "rel_name": rel_name, "tokens": tokens,
+               "listings": listings}
+    r = await _client.post("/write", **_json_body(payload))
     if r.status_code >= 400:
         log.error("write error %s: %s", r.status_code, r.text)
     r.raise_for_status()
@@ -71,3 +139,98 @@ async def chat(message: str) -> Dict[str, Any]:
     r = await _client.post("/chat", json={"message": message})
     r.raise_for_status()
     return r.json()
+
+
+# ---------------- Background jobs ----------------
+
+async def submit_preview(csv_text: str) -> Dict[str, Any]:
+    """POST /jobs/preview {csv_text} → {job_id, status, ...} (сразу, без ожидания разбора)"""
+    r = await _client.post("/jobs/preview", **_json_body({"csv_text": csv_text}))
+    r.raise_for_status()
+    return r.json()
+
+
+_UPLOAD_CHUNK = 64 * 1024
+
+
+async def _document_chunks(file_path: str) -> AsyncIterator[bytes]:
+    """Файл Telegram кусками: по URL Bot API или с диска (локальный Bot API сервер)."""
+    if file_path.startswith(("http://", "https://")):
+        async with httpx.AsyncClient(timeout=_TIMEOUT) as tg:
+            async with tg.stream("GET", file_path) as r:
+                r.raise_for_status()
+                async for chunk in r.aiter_bytes(_UPLOAD_CHUNK):
+                    yield chunk
+        return
+    with open(file_path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, _UPLOAD_CHUNK):
+            yield chunk
+
+
+async def submit_preview_file(file_path: str, filename: str) -> Dict[str, Any]:
+    """
+    POST /jobs/preview/file <байты файла, chunked> → {job_id, status, ...}.
+    Файл идёт из Telegram в агент потоком: бот не держит ни байты целиком, ни декодированный текст;
+    кодировку CSV и разбор .xlsx определяет агент.
+    """
+    headers = {"Content-Type": "application/octet-stream"}
+    chunks = _document_chunks(file_path)
+    if _GZIP_MIN > 0 and not filename.lower().endswith(".xlsx"):   # xlsx — уже zip
+        chunks, headers["Content-Encoding"] = _gzip_chunks(chunks), "gzip"
+    r = await _client.post("/jobs/preview/file", content=chunks, params={"filename": filename}, headers=headers)
+    if r.status_code >= 400:
+        log.error("preview file error %s: %s", r.status_code, r.text)
+    r.raise_for_status()
+    return r.json()
+
+
+async def submit_scrape(source: str, query: str, hospital: Optional[str], pages: int = 2) -> Dict[str, Any]:
+    """POST /jobs/scrape {source, query, hospital?, pages} → {job_id, status, ...}"""
+    payload = {"source": source, "query": query, "hospital": hospital, "pages": pages}
+    r = await _client.post("/jobs/scrape", json=payload)
+    r.raise_for_status()
+    return r.json()
+
+
+async def job_status(job_id: str) -> Dict[str, Any]:
+    r = await _client.get(f"/jobs/{job_id}")
+    r.raise_for_status()
+    return r.json()
+
+
+async def job_results(job_id: str, page_size: int = 1000) -> List[Dict[str, Any]]:
+    """Все PreviewItem задачи, постранично через /jobs/{id}/results."""
+    items: List[Dict[str, Any]] = []
+    offset: Optional[int] = 0
+    while offset is not None:
+        r = await _client.get(f"/jobs/{job_id}/results", params={"offset": offset, "limit": page_size})
+        r.raise_for_status()
+        data = r.json()
+        items.extend(data.get("items", []))
+        offset = data.get("next_offset")
+    return items
+
+
+ProgressFn = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+async def await_job(job_id: str, on_progress: Optional[ProgressFn] = None) -> Dict[str, Any]:
+    """
+    Дождаться задачи, опрашивая статус раз в JOB_POLL_SEC; on_progress получает
+    каждый новый статус. Результат — в форме ответа /preview: {version, items}.
+    """
+    deadline = time.monotonic() + _JOB_WAIT_SEC
+    last: Optional[tuple] = None
+    while True:
+        st = await job_status(job_id)
+        key = (st.get("status"), st.get("stage"), st.get("done"), st.get("total"))
+        if on_progress is not None and key != last:
+            await on_progress(st)
+        last = key
+        if st.get("status") == "done":
+            return {"version": st.get("version"), "items": await job_results(job_id)}
+        if st.get("status") == "error":
+            raise RuntimeError(f"job {job_id} failed: {st.get('error')}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"job {job_id} is still {st.get('status')} after {_JOB_WAIT_SEC:.0f}s")
+        await asyncio.sleep(_JOB_POLL_SEC)
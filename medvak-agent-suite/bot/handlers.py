@@ -26,6 +26,7 @@ ENV_ODKB_TABLE = os.getenv("VACANCIES_TABLE_ODKB_ID", "")
 CHAT_ENABLED = os.getenv("CHAT_ENABLED", "0") == "1"
 WEB_SCRAPE_ENABLED = os.getenv("WEB_SCRAPE_ENABLED", "0") == "1"
 WEB_DEFAULT_PAGES = int(os.getenv("WEB_DEFAULT_PAGES", "2"))
+_PREVIEW_BATCH = 10   # карточек в чат за раз
 
 
 def _ensure_state(user_id: int) -> Dict[str, Any]:
@@ -131,12 +132,17 @@ async def cmd_parse(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not csv_text:
         await update.message.reply_text("Пришлите текст CSV после команды, либо просто отправьте CSV-файл.")
         return
-    data = await api.preview_csv(csv_text)
-    items = data.get("items", [])
+    # NDJSON-поток: первые карточки уходят в чат, пока агент разбирает остальное
+    chat_id = update.effective_chat.id
+    items: List[Dict[str, Any]] = []
+    async for item in api.preview_csv_stream(csv_text):
+        if len(items) < _PREVIEW_BATCH:
+            text, kb = _render_item_card(item, len(items))
+            await context.bot.send_message(chat_id, text, reply_markup=kb)
+        items.append(item)
     st = _ensure_state(update.effective_user.id)
     st["preview"] = items
-    await update.message.reply_text(f"Готово. Найдено карточек: {len(items)}")
-    await _send_preview_batch(update, context, items)
+    await update.message.reply_text(f"Готово. Найдено карточек: {len(items)}" if items else "Пусто.")
 
 
 async def cmd_preview(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -157,30 +163,51 @@ async def cmd_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Нечего записывать. Сначала сделайте PREVIEW.")
         return
     records = [it.get("record", {}) for it in items]
-    res = await api.write_records(records, table_id=st["table_id"], rel_name=st.get("rel_name"))
+    tokens = [it.get("token") for it in items]
+    listings = [it.get("listing") for it in items]
+    res = await api.write_records(records, table_id=st["table_id"], rel_name=st.get("rel_name"), tokens=tokens,
+                                  listings=listings)
     await update.message.reply_text(f"Результат записи: {res}")
 
 
 # ---------------- Documents / Text ----------------
 
+_STAGES = {"parse": "разбор", "fetch": "загрузка страниц", "preview": "проверка"}
+
+
+async def _run_job(update: Update, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Дождаться фоновой задачи агента, обновляя одно сообщение с прогрессом."""
+    msg = await update.message.reply_text("⏳ В очереди…")
+
+    async def progress(st: Dict[str, Any]):
+        if st.get("status") == "queued":
+            return
+        stage = _STAGES.get(st.get("stage") or "", st.get("stage") or "")
+        total, done = st.get("total"), st.get("done", 0)
+        # файл разбирается потоком: пока он не дочитан, total неизвестен — показываем, сколько готово
+        text = f"⏳ {stage}: {done}/{total}" if total else f"⏳ {stage}: {done}…" if done else f"⏳ {stage}…"
+        try:
+            await msg.edit_text(text)
+        except Exception as e:   # «message is not modified» и т.п. — прогресс не критичен
+            log.debug("progress edit failed: %s", e)
+
+    return await api.await_job(job["job_id"], on_progress=progress)
+
 async def on_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """CSV-файл → превью."""
+    """CSV/XLSX-файл → превью."""
     doc = update.message.document
     if not doc:
         return
-    if not (doc.file_name or "").lower().endswith((".csv", ".txt")):
-        await update.message.reply_text("Пришлите CSV или TXT файл.")
+    name = (doc.file_name or "").lower()
+    if not name.endswith((".csv", ".txt", ".xlsx")):
+        await update.message.reply_text("Пришлите CSV, TXT или XLSX файл.")
         return
 
+    # файл уходит в агент потоком, без скачивания в память и декодирования на стороне бота
     file = await doc.get_file()
-    data = await file.download_as_bytearray()
-    try:
-        csv_text = data.decode("utf-8")
-    except UnicodeDecodeError:
-        csv_text = data.decode("cp1251", errors="replace")
-    csv_text = sanitize_csv_text(csv_text)
-
-    preview = await api.preview_csv(csv_text)
+    job = await api.submit_preview_file(file.file_path, doc.file_name or name)
+
+    preview = await _run_job(update, job)
     items = preview.get("items", [])
     st = _ensure_state(update.effective_user.id)
     st["preview"] = items
@@ -201,7 +228,7 @@ async def on_plain_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # (1) Эвристика CSV
     if is_probable_csv_text(text):
-        data = await api.preview_csv(sanitize_csv_text(text))
+        data = await _run_job(update, await api.submit_preview(sanitize_csv_text(text)))
         items = data.get("items", [])
         st = _ensure_state(update.effective_user.id)
         st["preview"] = items
@@ -230,7 +257,7 @@ async def on_plain_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if reply:
                 await update.message.reply_text(reply)
 
-            prev = await api.scrape(src, qry, hosp, pages)
+            prev = await _run_job(update, await api.submit_scrape(src, qry, hosp, pages))
             items = prev.get("items", [])
             st = _ensure_state(update.effective_user.id)
             st["preview"] = items
@@ -268,7 +295,8 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.edit_message_text("Элемент не найден.")
             return
         rec = items[idx].get("record", {})
-        res = await api.write_records([rec], table_id=st["table_id"], rel_name=st.get("rel_name"))
+        res = await api.write_records([rec], table_id=st["table_id"], rel_name=st.get("rel_name"),
+                                      tokens=[items[idx].get("token")], listings=[items[idx].get("listing")])
         await query.edit_message_text(f"✅ Записано: {res}")
         return
 
@@ -288,7 +316,7 @@ async def _send_preview_batch(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not items:
         await context.bot.send_message(chat_id, "Пусто.")
         return
-    limit = min(len(items), 10)
+    limit = min(len(items), _PREVIEW_BATCH)
     for i in range(limit):
         text, kb = _render_item_card(items[i], i)
         await context.bot.send_message(chat_id, text, reply_markup=kb)
@@ -0,0 +1,204 @@
+import sys, pathlib, json, threading, re, time, hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+
+class FakeNoco:
+    """
+    Локальная замена NocoDB (v2 /tables/... API) для тестов.
+    Хранит записи в памяти, пишет журнал вызовов и умеет имитировать сбои:
+      - reject(payload) -> True: строка «плохая», пакет с ней отклоняется целиком (400);
+      - fail_statuses: очередь статусов, которые вернуть на ближайшие запросы.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.columns = {}
+        self.links = []
+        self.calls = []
+        self.fail_statuses = []
+        self.reject = lambda payload: False
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.base = ""
+
+    def rows(self, table_id):
+        return self.tables.setdefault(table_id, [])
+
+    def _insert(self, table_id, payload):
+        row = dict(payload, Id=self._next_id)
+        self._next_id += 1
+        self.rows(table_id).append(row)
+        return {"Id": row["Id"]}
+
+    def handle(self, method, path, query, body):
+        with self._lock:
+            self.calls.append((method, path, body))
+            if self.fail_statuses:
+                return self.fail_statuses.pop(0), {"msg": "injected failure"}
+
+            m = re.fullmatch(r"/tables/([^/]+)/columns", path)
+            if m and method == "GET":
+                return 200, self.columns.get(m.group(1), [])
+
+            m = re.fullmatch(r"/tables/([^/]+)/records", path)
+            if m and method == "GET":
+                rows = self.rows(m.group(1))
+                limit = int(query.get("limit", ["25"])[0])
+                offset = int(query.get("offset", ["0"])[0])
+                page = rows[offset:offset + limit]
+                return 200, {"list": page, "pageInfo": {"totalRows": len(rows),
+                                                        "isLastPage": offset + limit >= len(rows)}}
+            if m and method == "POST":
+                items = body if isinstance(body, list) else [body]
+                if any(self.reject(p) for p in items):
+                    return 400, {"msg": "invalid row"}
+                created = [self._insert(m.group(1), p) for p in items]
+                return 200, created if isinstance(body, list) else created[0]
+
+            m = re.fullmatch(r"/tables/([^/]+)/records/(\d+)", path)
+            if m and method == "PATCH":
+                return 200, {"Id": int(m.group(2))}
+
+            m = re.fullmatch(r"/tables/([^/]+)/records/(\d+)/links/([^/]+)", path)
+            if m and method == "POST":
+                self.links.append((m.group(1), int(m.group(2)), m.group(3), body))
+                return 200, True
+            return 404, {"msg": "not found"}
+
+
+def _make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def _serve(self):
+            parts = urlsplit(self.path)
+            n = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(n)) if n else None
+            status, payload = fake.handle(self.command, parts.path, parse_qs(parts.query), body)
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = _serve
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+FIXTURES = pathlib.Path(__file__).resolve().parent / "fixtures"
+
+
+class SerpSite:
+    """
+    Сохранённые страницы выдачи hh/zarplata: GET /<src>/search/vacancy?page=N
+    отдаёт fixtures/<src>_serp_<N>.html (нет файла — 404) с ETag; на совпавший
+    If-None-Match отвечает 304, страницы из fail_pages — 503. Журнал hits: (path, page, t_start), statuses —
+    коды ответов; active/peak — одновременные запросы.
+    """
+
+    def __init__(self):
+        self.hits = []
+        self.statuses = []
+        self.active = 0
+        self.peak = 0
+        self.latency = 0.0
+        self.fail_pages = set()
+        self.base = ""
+        self._lock = threading.Lock()
+
+    def handle(self, path, query, headers):
+        m = re.fullmatch(r"/(hh|zp)/search/vacancy", path)
+        page = query.get("page", ["0"])[0]
+        with self._lock:
+            self.hits.append((path, page, time.monotonic()))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.latency)
+            if page in self.fail_pages:
+                return self._reply(503, b"unavailable", {})
+            f = FIXTURES / f"{m.group(1)}_serp_{page}.html" if m else None
+            if f is None or not f.exists():
+                return self._reply(404, b"not found", {})
+            data = f.read_bytes()
+            etag = '"%s"' % hashlib.sha1(data).hexdigest()[:16]
+            if headers.get("If-None-Match") == etag:
+                return self._reply(304, b"", {"ETag": etag})
+            return self._reply(200, data, {"ETag": etag})
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+    def _reply(self, status, data, extra):
+        with self._lock:
+            self.statuses.append(status)
+        return status, data, extra
+
+
+def _make_site_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            status, data, extra = site.handle(parts.path, parse_qs(parts.query), self.headers)
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            for k, v in extra.items():
+                self.send_header(k, v)
+            if status != 304:
+                self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def serp_site(monkeypatch):
+    site = SerpSite()
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _make_site_handler(site))
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    site.base = f"http://127.0.0.1:{srv.server_address[1]}"
+    monkeypatch.setenv("WEB_SCRAPE_ENABLED", "1")
+    monkeypatch.setenv("SCRAPE_HH_BASE", site.base + "/hh")
+    monkeypatch.setenv("SCRAPE_ZP_BASE", site.base + "/zp")
+    try:
+        yield site
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_dedup(tmp_path, monkeypatch):
+    # у каждого теста свой SQLite-индекс дублей, а не data/dedup.sqlite3 в рабочем каталоге
+    monkeypatch.setenv("DEDUP_DB_PATH", str(tmp_path / "dedup.sqlite3"))
+    monkeypatch.setenv("SCRAPE_CACHE_PATH", str(tmp_path / "scrape_cache.sqlite3"))
+    monkeypatch.setenv("SCRAPE_SEEN_DB_PATH", str(tmp_path / "listings.sqlite3"))
+
+
+@pytest.fixture
+def noco():
+    fake = FakeNoco()
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(fake))
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    fake.base = f"http://127.0.0.1:{srv.server_address[1]}"
+    try:
+        yield fake
+    finally:
+        srv.shutdown()
+        srv.server_close()
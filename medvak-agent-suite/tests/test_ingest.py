@@ -0,0 +1,99 @@
+import codecs, sys, pathlib
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+from tools.ingest_csv import parse_csv_text, detect_delimiter
+from tools.schema import Record
+
+def test_detect_delimiter():
+    assert detect_delimiter("Title;Должность;График\nа,б;в;г") == ";"
+    assert detect_delimiter('Title,"Тип; смены",График\n') == ","
+    assert detect_delimiter("Title\tГрафик\n") == "\t"
+    assert detect_delimiter("Title\nx", default=";") == ";"
+
+def test_fast_ingest_matches_validated_records():
+    csv_text = (
+        "Title;Должность;График;Требования;Лишняя;Тип_смены\n"
+        "A;процедурная медсестра;2/2, 1/3;1,2;x;сутки\n"
+        "\n"
+        "B;Врач;;;;\n"
+        "C;Санитар\n"                 # короткая строка — недостающие поля пустые
+    )
+    recs = parse_csv_text(csv_text)
+    expected = [
+        Record(Title="A", Должность="процедурная медсестра", График="2/2, 1/3", Требования=[1, 2], Тип_смены="сутки"),
+        Record(Title="B", Должность="Врач", График="", Требования=None, Тип_смены=""),
+        Record(Title="C", Должность="Санитар", График="", Требования=None, Тип_смены=""),
+    ]
+    assert [r.dict() for r in recs] == [r.dict() for r in expected]
+    assert recs[0].График == ["2/2", "1/3"] and recs[1].График == [""]
+    assert recs[0].__fields_set__ == expected[0].__fields_set__
+    # списки у записей свои, хоть разбор и кэшируется по значению
+    recs[1].График.append("x")
+    assert recs[2].График == [""]
+
+def _xlsx(path, rows, shared):
+    """Минимальная книга: workbook + rels + sharedStrings + лист с именем не sheet1.xml."""
+    import zipfile
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    sst = "".join(f"<si><t>{s}</t></si>" if i else f"<si><r><t>{s[:3]}</t></r><r><t>{s[3:]}</t></r><rPh><t>x</t></rPh></si>"
+                  for i, s in enumerate(shared))
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("xl/workbook.xml", f'<workbook {ns} xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                                      '<sheets><sheet name="Лист1" sheetId="1" r:id="rId7"/></sheets></workbook>')
+        z.writestr("xl/_rels/workbook.xml.rels", '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                                                 '<Relationship Id="rId7" Target="worksheets/data.xml"/></Relationships>')
+        z.writestr("xl/sharedStrings.xml", f"<sst {ns}>{sst}</sst>")
+        z.writestr("xl/worksheets/data.xml", f"<worksheet {ns}><sheetData>{''.join(rows)}</sheetData></worksheet>")
+
+def test_xlsx_rows_and_records(tmp_path):
+    from tools.ingest_xlsx import iter_xlsx_rows, parse_xlsx
+    shared = ["Title", "Должность", "График", "Требования", "процедурная медсестра"]
+    rows = [
+        '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c><c r="C1" t="s"><v>2</v></c><c r="E1" t="s"><v>3</v></c></row>',
+        '<row r="2"><c r="A2" t="inlineStr"><is><t>A</t></is></c><c r="B2" t="s"><v>4</v></c>'
+        '<c r="C2" t="str"><v>2/2; 1/3</v></c><c r="E2"><v>7.0</v></c></row>',
+        '<row r="3"><c r="A3" s="1"/></row>',                       # пустая строка с форматированием
+        '<row r="4"><c r="A4" t="inlineStr"><is><t>B</t></is></c></row>',
+    ]
+    path = tmp_path / "book.xlsx"
+    _xlsx(path, rows, shared)
+    assert list(iter_xlsx_rows(str(path)))[:2] == [["Title", "Должность", "График", "", "Требования"],
+                                                   ["A", "процедурная медсестра", "2/2; 1/3", "", "7"]]
+    recs = parse_xlsx(open(path, "rb"))
+    csv_recs = parse_csv_text("Title,Должность,График,,Требования\nA,процедурная медсестра,2/2; 1/3,,7\nB\n")
+    assert [r.dict() for r in recs] == [r.dict() for r in csv_recs]
+    assert recs[0].График == ["2/2", "1/3"] and recs[0].Требования == [7]
+
+def _chunks(data, n):
+    return (data[i:i + n] for i in range(0, len(data), n))
+
+def test_csv_bytes_stream_matches_text_path():
+    from tools.ingest_csv import iter_csv_bytes
+    text = ("\n\nTitle;Должность;График;Контактное_лицо\r\n"
+            "A;процедурная медсестра;2/2;\"Иванова\r\nтел. 1\"\r\n" + "x;" * 3 + "Ёлкина\r\n"
+            "B;Врач;5/2;\r\n   \r\n")
+    # как раньше: декодировать целиком, убрать BOM, нормализовать переводы строк
+    expected = [r.dict() for r in parse_csv_text(text.replace("\r\n", "\n").strip())]
+    assert len(expected) == 3
+    for data in (text.encode("utf-8"), b"\xef\xbb\xbf" + text.encode("utf-8"), text.encode("cp1251"),
+                 text.encode("utf-16")):
+        for n in (1, 2, 5, 4096):       # границы кусков — внутри многобайтных символов и «\r\n»
+            assert [r.dict() for r in iter_csv_bytes(_chunks(data, n))] == expected, (data[:4], n)
+
+def test_text_chunks_detects_cp1251_after_ascii_prefix():
+    from tools.ingest_csv import iter_text_chunks, _SNIFF_BYTES
+    data = b"Title\n" + b"a\n" * _SNIFF_BYTES + "Отделение\n".encode("cp1251")
+    assert "".join(iter_text_chunks(_chunks(data, 100))) == data.decode("cp1251")
+    assert "".join(iter_text_chunks([])) == ""
+
+def test_text_chunks_switches_to_cp1251_mid_stream():
+    from tools.ingest_csv import iter_text_chunks, _SNIFF_BYTES
+    # склейка выгрузок: окно — UTF-8, дальше CP1251; вторая часть не должна стать U+FFFD
+    utf = "Title\n" + "Медсестра\n" * _SNIFF_BYTES
+    data = utf.encode("utf-8") + "Отделение реанимации\n".encode("cp1251")
+    for n in (1, 3, 100, 4096):
+        text = "".join(iter_text_chunks(_chunks(data, n)))
+        assert text == utf + "Отделение реанимации\n", n
+    # UTF-8 с BOM — кодировка задана явно, битые байты по-прежнему заменяются
+    assert "".join(iter_text_chunks([codecs.BOM_UTF8 + b"a\xff"])) == "a\ufffd"
@@ -0,0 +1,42 @@
+import sys, pathlib, asyncio
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+import pytest
+
+from tools.jobs import JobQueue, DONE, ERROR, QUEUED
+
+def test_job_queue_runs_and_reports():
+    async def run():
+        q = JobQueue(workers=1, ttl=60.0, max_pending=2)
+        gate = asyncio.Event()
+
+        async def slow(job):
+            job.total = 2
+            job.items.append("a")
+            job.done = 1
+            await gate.wait()
+            job.items.append("b")
+            job.done = 2
+
+        async def broken(job):
+            raise ValueError("boom")
+
+        a = q.submit("preview", slow)
+        b = q.submit("scrape", broken)
+        with pytest.raises(asyncio.QueueFull):
+            q.submit("preview", slow)
+        q.start()
+        await asyncio.sleep(0.05)
+        # один воркер: вторая задача ждёт, первая отдаёт частичный результат
+        assert q.get(a.id).view()["done"] == 1 and q.get(b.id).status == QUEUED
+        gate.set()
+        await asyncio.sleep(0.05)
+        assert a.status == DONE and a.items == ["a", "b"]
+        assert b.status == ERROR and b.error == "boom"
+        # по TTL завершённые задачи удаляются
+        q.ttl = 0.0
+        await asyncio.sleep(0.01)
+        assert q.get(a.id) is None and q.get(b.id) is None
+        await q.aclose()
+    asyncio.run(run())
@@ -0,0 +1,26 @@
+import sys, pathlib, random
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+from tools.matcher import AhoCorasick, IntentMatcher
+
+def test_aho_corasick_finds_overlaps():
+    ac = AhoCorasick([(p, p) for p in ("he", "she", "his", "hers")])
+    assert sorted((i, p) for i, p, _ in ac.iter_matches("ushers")) == [(3, "he"), (3, "she"), (5, "hers")]
+
+def test_intent_matcher_matches_linear_scan():
+    rnd = random.Random(7)
+    words = ["гкб", "одкб", "гкб40", "оарит", "№1", "дгкб 9", "кб", "больница"]
+    aliases = {}
+    for i in range(200):
+        aliases[" ".join(rnd.sample(words, rnd.randint(1, 2))) + ("" if i % 3 else f" {i}")] = f"canon {i}"
+    m = IntentMatcher(aliases)
+    for _ in range(300):
+        text = " ".join(rnd.choice(words + ["найди", "zp", "hh", "медсестёр"]) for _ in range(6)).upper()
+        low = text.lower()
+        # эталон — прежний перебор алиасов в порядке словаря
+        want = next((v for k, v in aliases.items() if k.lower() in low), None)
+        hits = m.scan(text)
+        assert hits.hospital == want
+        assert hits.source == ("zp" if "zp" in low else "hh" if "hh" in low else None)
+        assert hits.role == ("медсестра" if "медсестр" in low else None)
@@ -0,0 +1,48 @@
+import sys, pathlib, asyncio
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+from tools.meta import SchemaCache, allowed_from_columns
+from tools.nocodb_client import AsyncNocoClient
+from tools.preview import preview_records
+from tools.schema import Record
+
+COLUMNS = [
+    {"title": "Title", "uidt": "SingleLineText"},
+    {"title": "Статус", "uidt": "SingleSelect", "colOptions": {"options": [{"title": "Открыта"}, {"title": "Закрыта"}]}},
+    {"title": "График", "uidt": "MultiSelect", "dtxp": "'2/2','5/2'"},
+    {"title": "Чужое", "uidt": "SingleSelect", "colOptions": {"options": [{"title": "x"}]}},
+]
+
+def test_allowed_from_columns():
+    assert allowed_from_columns(COLUMNS) == {
+        "selects": {"Статус": ["Закрыта", "Открыта"]},
+        "multiselects": {"График": ["2/2", "5/2"]},
+    }
+
+def test_schema_cache_stale_while_revalidate(noco):
+    noco.columns["T1"] = COLUMNS
+
+    async def run():
+        client = AsyncNocoClient(noco.base, "t")
+        cache = SchemaCache(client, ttl=0.0)
+        try:
+            assert cache.snapshot_nowait("T1") is None        # первая загрузка — в фоне
+            await asyncio.sleep(0.2)
+            snap = cache.snapshot_nowait("T1")
+            assert snap is not None and snap.selects["Статус"] == {"Открыта", "Закрыта"}
+
+            calls = len(noco.calls)
+            noco.columns["T1"] = COLUMNS[:1]
+            assert cache.snapshot_nowait("T1") is snap        # протухло: отдаём старое сразу…
+            await asyncio.sleep(0.2)
+            assert len(noco.calls) == calls + 1               # …и обновляем одним фоновым запросом
+            assert cache.snapshot_nowait("T1").selects == {}
+            assert cache.unknown_keys("T1", {"Title": "a", "Статус": "x"}) == ["Статус"]
+            return snap
+        finally:
+            await client.aclose()
+
+    snap = asyncio.run(run())
+    item = preview_records([Record(Статус="Открыта", График=["2/2"])], snap)[0]
+    assert item.uncertain == []
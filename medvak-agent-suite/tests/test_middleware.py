@@ -0,0 +1,38 @@
+import sys, pathlib, gzip, zlib
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from middleware import DecompressRequestMiddleware
+
+def _client(max_bytes=1000):
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = b"".join([c async for c in request.stream()])
+        return {"n": len(body), "text": body.decode("utf-8"), "enc": request.headers.get("content-encoding")}
+
+    app.add_middleware(DecompressRequestMiddleware, max_bytes=max_bytes)
+    return TestClient(app)
+
+def test_request_bodies_are_inflated():
+    c = _client()
+    text = "Title,Должность\n" * 20
+    raw = text.encode("utf-8")
+    assert c.post("/echo", content=raw).json()["text"] == text
+    for enc, data in (("gzip", gzip.compress(raw)), ("deflate", zlib.compress(raw))):
+        r = c.post("/echo", content=data, headers={"Content-Encoding": enc})
+        assert r.json() == {"n": len(raw), "text": text, "enc": None}
+    # chunked-тело: распаковка по кускам
+    z = gzip.compress(raw)
+    r = c.post("/echo", content=iter([z[:7], z[7:30], z[30:]]), headers={"Content-Encoding": "gzip"})
+    assert r.json()["text"] == text
+
+def test_bad_and_oversized_bodies():
+    c = _client(max_bytes=100)
+    assert c.post("/echo", content=b"not gzip", headers={"Content-Encoding": "gzip"}).status_code == 400
+    assert c.post("/echo", content=gzip.compress(b"0" * 10_000), headers={"Content-Encoding": "gzip"}).status_code == 413
+    assert c.post("/echo", content=b"x", headers={"Content-Encoding": "br"}).status_code == 415
@@ -2,7 +2,8 @@ import sys, pathlib
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 sys.path.append(str(ROOT / "agent"))
 
-from tools.normalize import normalize_schedule, normalize_shift, normalize_time_tokens, normalize_role
+import difflib
+from tools.normalize import normalize_schedule, normalize_shift, normalize_time_tokens, normalize_role, SuggestIndex, suggest_close
 
 def test_schedule_extract():
     vals, _ = normalize_schedule("2/2 (возможны 1/3 1/2), 5/2")
@@ -21,3 +22,28 @@ def test_time_parse():
 def test_role_map():
     role, notes = normalize_role("процедурная медсестра")
     assert role == "Процедурная медицинская сестра"
+
+def test_suggest_index_matches_difflib():
+    opts = [
+        "Операционный блок", "Дневной стационар детской онкологии и гематологии",
+        "Отделение педиатрическое", "Отделение приемное", "Приемное отделение",
+        "Отделение неврологическое", "Отделение нефрологическое",
+    ]
+    idx = SuggestIndex(opts)
+    for v in ("Дневной стационар онкологического и гематологического центра",
+              "Отделение педиатрическое ", "приемное отд.", "Операционный блк", "xyz"):
+        assert suggest_close(v, idx) == difflib.get_close_matches(v, opts, n=3, cutoff=0.55)
+
+def test_suggest_index_large_vocabulary_matches_difflib():
+    import random
+    rnd = random.Random(3)
+    words = ["Отделение", "отделение", "блок", "педиатрическое", "хирургии", "детской", "онкологии",
+             "гематологии", "приемное", "стационар", "Дневной", "неврологическое", "реанимации", "и"]
+    # справочник заметно больше короткого списка (32): отбор по триграммам уже не «всё подряд»
+    opts = list(dict.fromkeys(" ".join(rnd.sample(words, rnd.randint(2, 5))) for _ in range(150)))
+    assert len(opts) > 100
+    idx = SuggestIndex(opts)
+    queries = [" ".join(rnd.sample(words, rnd.randint(1, 4))) for _ in range(40)]
+    queries += [q[:-2] for q in opts[:20]] + ["xyz", "", "и"]
+    for v in queries:
+        assert suggest_close(v, idx) == difflib.get_close_matches(v, opts, n=3, cutoff=0.55), v
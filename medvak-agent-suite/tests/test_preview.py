@@ -42,3 +42,82 @@ def test_preview_with_allowed_map(tmp_path):
     assert "08:00 - 20:00" in (it.record.Время_работы or [])
     # Отделение слегка «не канон» — ожидаем подсказки
     assert any(u["field"] == "Отделение" for u in it.uncertain)
+
+def test_iter_preview_matches_batch():
+    from tools.ingest_csv import parse_csv_text, iter_csv_records
+    from tools.preview import iter_preview
+    csv_text = (
+        "Title;Должность;График;Тип_смены\n"
+        "A;процедурная медсестра;2/2;сутки\n"
+        "B;Врач;5/2 или 1/3;дневная\n"
+    )
+    batch = [it.dict() for it in preview_records(parse_csv_text(csv_text))]
+    lazy = iter_csv_records(csv_text)
+    assert not isinstance(lazy, list)
+    assert [it.dict() for it in iter_preview(lazy)] == batch
+
+def test_columnar_matches_per_row():
+    from tools.preview import _preview_one
+    from tools.registry import registry
+    rows = [
+        dict(Title=str(i), Должность="процедурная медсестра", Отделение=("ОДКБ" if i % 2 else "Операционный блк"),
+             График=["2/2 (возможны 1/3)"], Тип_смены=["сутки"], Время_работы=["8:00-20:00", "12 часов"],
+             Работник=["Основной сотрудник", "Стажёр"])
+        for i in range(6)
+    ]
+    snap = registry.get()
+    per_row = [_preview_one(Record(**r), snap).json() for r in rows]
+    assert [it.json() for it in preview_records([Record(**r) for r in rows])] == per_row
+
+def test_parallel_preview_byte_identical():
+    from tools.parallel import preview_shards, pools, _INFLIGHT_PER_WORKER
+    from tools.registry import registry
+    from tools.signing import verify_record
+    depts = ["Операционный блок", "Операционный блк", "ОДКБ", "Дневной стационар"]
+    # preview_records правит записи на месте — каждому пути свои
+    make = lambda: [Record(Title=f"v{i}", Должность="процедурная медсестра", Отделение=depts[i % 4],
+                           График=["2/2" if i % 3 else "5/2 или 1/3"], Тип_смены=["сутки"], Статус="Открыта")
+                    for i in range(50)]
+    snap = registry.get()
+    serial = [it.json() for it in preview_records(make(), snap)]
+    consumed = []
+    def lazy():
+        for rec in make():
+            consumed.append(rec)
+            yield rec
+    try:
+        shards = preview_shards(lazy(), snap, workers=2, shard_rows=7)   # несколько шардов
+        items = next(shards)
+        # в работе не больше _INFLIGHT_PER_WORKER шардов на процесс — записи читаются по мере отдачи
+        assert len(consumed) == 7 * 2 * _INFLIGHT_PER_WORKER < 50
+        for part in shards:
+            items += part
+    finally:
+        pools.shutdown()
+    assert [it.json() for it in items] == serial
+    # токены из воркеров подписаны тем же секретом
+    signed = [it for it in items if it.token]
+    assert signed and all(verify_record(it.record, snap.version, it.token) for it in signed)
+
+def test_rowstore_matches_preview():
+    from tools.rowstore import PreviewStore
+    from tools.registry import registry
+    depts = ["Операционный блок", "Операционный блк", "ОДКБ", None]
+    rows = [dict(Title=f"v{i}", Должность="процедурная медсестра" if i % 2 else "Врач", Отделение=depts[i % 4],
+                 График=["2/2" if i % 3 else "5/2 или 1/3"], Тип_смены=["сутки"], Время_работы=["8:00-20:00"],
+                 Работник=(["Основной сотрудник", "Стажёр"] if i % 2 else []), Статус="Открыта", Требования=[1, 2])
+            for i in range(20)]
+    snap = registry.get()
+    expected = [it.json() for it in preview_records([Record(**r) for r in rows], snap)]
+    store = PreviewStore(snap).extend(Record(**r) for r in rows)
+    assert len(store) == 20 and [it.json() for it in store] == expected
+    assert [it.json() for it in store[5:9]] == expected[5:9]
+    # готовые PreviewItem (путь шардов) дают то же самое
+    again = PreviewStore(snap).extend_items(preview_records([Record(**r) for r in rows], snap))
+    assert [it.json() for it in again] == expected
+
+def test_auto_workers_capped(monkeypatch):
+    from tools import parallel
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 64)
+    assert parallel.resolve_workers(0) == parallel._AUTO_WORKERS_MAX
+    assert parallel.resolve_workers(1) == 1 and parallel.resolve_workers(8) == 8
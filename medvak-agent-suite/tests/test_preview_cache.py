@@ -0,0 +1,34 @@
+import sys, pathlib, threading, time
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+from tools.preview_cache import PreviewCache, etag_matches, make_etag
+
+def test_preview_cache_lru_and_single_flight():
+    cache = PreviewCache(max_items=2, max_bytes=10)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return b"body"
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.get_or_compute(("a", "v1"), compute))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # повтор того же CSV во время вычисления ждёт первый запрос
+    assert out == [b"body"] * 3 and len(calls) == 1
+    assert cache.stats["miss"] == 1 and cache.stats["hit"] + cache.stats["coalesced"] == 2
+
+    cache.get_or_compute(("a", "v2"), lambda: b"x")      # другая версия справочников — другой ключ
+    cache.put(("b", "v1"), b"12345678")                  # по объёму вытесняет самые старые
+    assert cache.get(("a", "v1")) is None and cache.bytes <= 10 and cache.get(("b", "v1")) == b"12345678"
+
+def test_etag_matching():
+    tag = make_etag("json", "abc", "map-1")
+    assert tag != make_etag("json", "abc", "map-2")
+    assert etag_matches(tag, tag) and etag_matches(f'"x", W/{tag}', tag) and etag_matches("*", tag)
+    assert not etag_matches(None, tag) and not etag_matches('"x"', tag)
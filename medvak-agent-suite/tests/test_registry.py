@@ -0,0 +1,39 @@
+import sys, pathlib, json, os
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+from tools.registry import DictRegistry, build_snapshot
+
+def _write_map(path, depts):
+    path.write_text(json.dumps({"selects": {"Отделение": depts}, "multiselects": {}}, ensure_ascii=False), encoding="utf-8")
+
+def test_registry_caches_and_reloads(tmp_path, monkeypatch):
+    amap = tmp_path / "agent-map.json"
+    aliases = tmp_path / "aliases.yml"
+    _write_map(amap, ["Операционный блок "])
+    aliases.write_text('ОДКБ: "Областная детская клиническая больница"\n', encoding="utf-8")
+    monkeypatch.setenv("AGENT_MAP_PATH", str(amap))
+    monkeypatch.setenv("ALIASES_FILE", str(aliases))
+
+    reg = DictRegistry()
+    s1 = reg.get()
+    assert s1.selects["Отделение"] == {"Операционный блок"}
+    assert s1.alias_index["одкб"] == "Областная детская клиническая больница"
+    assert reg.get() is s1  # файлы не менялись — тот же снимок
+
+    _write_map(amap, ["Приемное отделение"])
+    os.utime(amap, ns=(1, 1))  # гарантированно другой mtime
+    s2 = reg.get()
+    assert s2 is not s1 and s2.version != s1.version
+    assert s2.selects["Отделение"] == {"Приемное отделение"}
+
+    # reload с тем же содержимым не меняет версию
+    assert reg.reload().version == s2.version
+
+def test_snapshot_indexes_are_lazy():
+    snap = build_snapshot(json.dumps({"selects": {"Отделение": ["Операционный блок", "Приемное отделение"]}}).encode("utf-8"),
+                          'ОДКБ: "Областная детская клиническая больница"\n'.encode("utf-8"))
+    assert snap._lazy == {}
+    assert snap.suggest("select", "Отделение", "операционный") == ["Операционный блок"]
+    assert list(snap._lazy) == [("select", "Отделение")]
+    assert snap.warm().matcher.scan("в одкб").hospital == "Областная детская клиническая больница"
@@ -0,0 +1,116 @@
+import sys, pathlib, asyncio
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+import httpx
+
+from tools.scrape_engine import ScrapeEngine
+from tools.scrape_hh import parse_serp, scrape_hh_async, scrape_hh_listings
+from tools.scrape_zp import scrape_zarplata_async
+from tools.preview import preview_records
+
+FIXTURES = ROOT / "tests" / "fixtures"
+
+def test_parse_serp_hh():
+    html = (FIXTURES / "hh_serp_0.html").read_text(encoding="utf-8")
+    items = parse_serp(html, "hh", "https://hh.ru/search/vacancy?page=0")
+    assert [(i.id, i.title) for i in items] == [
+        ("90000001", "Медсестра процедурная"),
+        ("90000002", "Медицинская сестра палатная (постовая)"),
+    ]
+    assert items[0].salary == "от 60 000 ₽"
+    assert items[0].employer == "ГБУЗ ДГКБ №9 им. Г.Н. Сперанского"
+    assert items[1].url == "https://hh.ru/vacancy/90000002"
+
+def test_parse_serp_void_tags_inside_field():
+    html = (
+        '<div data-qa="vacancy-serp__vacancy">'
+        '<a data-qa="serp-item__title" href="/vacancy/1">Медсестра<br>палатная <img src="x.png"></a>'
+        '<span data-qa="vacancy-serp__vacancy-compensation">от 50 000<wbr> ₽</span>'
+        '<span data-qa="vacancy-serp__vacancy-employer">ГКБ №1</span>'
+        '</div>'
+    )
+    [it] = parse_serp(html, "hh", "https://hh.ru/")
+    assert (it.title, it.salary, it.employer) == ("Медсестра палатная", "от 50 000 ₽", "ГКБ №1")
+
+def _run(coro_fn, **engine_kw):
+    async def run():
+        engine = ScrapeEngine(httpx.AsyncClient(), **engine_kw)
+        try:
+            return await coro_fn(engine)
+        finally:
+            await engine.aclose()
+    return asyncio.run(run())
+
+def test_scrape_hh_pages_concurrently(serp_site):
+    serp_site.latency = 0.2
+    recs = _run(lambda e: scrape_hh_async(e, "медсестра", pages=3), per_host=3, delay=0.0)
+    # 3 страницы (третьей нет — 404), вакансия 90000002 есть на двух страницах
+    assert [r.Должность for r in recs] == [
+        "Медсестра процедурная", "Медицинская сестра палатная (постовая)", "Старшая медсестра"]
+    assert serp_site.peak >= 2
+    items = preview_records(recs)
+    assert len(items) == 3 and items[0].record.Статус == "Открыта"
+
+def test_scrape_per_host_cap_and_delay(serp_site):
+    _run(lambda e: scrape_zarplata_async(e, "медсестра", "ДГП 133", pages=4), per_host=1, delay=0.1)
+    assert serp_site.peak == 1
+    starts = sorted(t for _, _, t in serp_site.hits)
+    assert len(starts) == 4
+    assert all(b - a >= 0.09 for a, b in zip(starts, starts[1:]))
+
+def test_scrape_http_cache(serp_site, tmp_path):
+    from tools.http_cache import HttpCache
+    cache = HttpCache(str(tmp_path / "c.sqlite3"), ttl=60.0)
+    query = lambda e: scrape_hh_async(e, "медсестра", pages=2)
+    first = _run(query, delay=0.0, cache=cache)
+    assert len(serp_site.hits) == 2 and cache.stats["miss"] == 2
+    # внутри окна свежести — ни одного запроса
+    assert _run(query, delay=0.0, cache=cache) == first
+    assert len(serp_site.hits) == 2 and cache.stats["hit"] == 2
+    # протухло — условный запрос, сервер отвечает 304, тело берётся из кэша
+    cache.ttl = 0.0
+    assert _run(query, delay=0.0, cache=cache) == first
+    assert serp_site.statuses[-2:] == [304, 304] and cache.stats["revalidated"] == 2
+
+def test_http_cache_lru_eviction(tmp_path):
+    from tools.http_cache import HttpCache
+    cache = HttpCache(str(tmp_path / "c.sqlite3"), max_bytes=250)
+    for i in range(3):
+        cache.put(f"http://x/{i}", "x" * 100, etag=f'"{i}"', last_modified=None)
+        cache.get("http://x/0")   # /0 всё время в ходу
+    assert cache.get("http://x/1") is None
+    assert cache.get("http://x/0") is not None and cache.get("http://x/2") is not None
+    assert cache.report()["evicted"] == 1
+
+def test_incremental_scrape(serp_site, tmp_path):
+    from tools.listing_index import ListingIndex
+    index = ListingIndex(str(tmp_path / "seen.sqlite3"))
+    query = lambda e: scrape_hh_listings(e, "медсестра", pages=3, index=index)
+    first = _run(query, per_host=1, delay=0.0)
+    assert len(first) == 3 and index.count("hh") == 0
+    # показали в preview, но не записали — повторный поиск возвращает те же карточки
+    assert _run(query, per_host=1, delay=0.0) == first
+    # записали одну: остальные возвращаются; ключ — источник и id карточки, а не Title записи
+    assert index.mark_imported([first[0].ref, None, "zp:" + first[1].id]) == 1 and index.count("hh") == 1
+    assert [it.id for it in _run(query, per_host=1, delay=0.0)] == [first[1].id, first[2].id]
+    # всё импортировано: первая же страница без новых карточек останавливает пагинацию
+    index.mark_imported([first[1].ref, first[2].ref])
+    serp_site.hits.clear()
+    assert _run(query, per_host=1, delay=0.0) == []
+    assert len(serp_site.hits) == 1
+    # у одной вакансии поменялась зарплата — она возвращается снова
+    html = (FIXTURES / "hh_serp_0.html").read_text(encoding="utf-8")
+    old = [it for it in parse_serp(html, "hh", "http://x/") if it.id == "90000001"]
+    old[0].salary = "40 000 ₽"
+    index.mark("hh", old)
+    assert [it.title for it in _run(query, per_host=1, delay=0.0)] == ["Медсестра процедурная"]
+
+def test_incremental_scrape_skips_failed_page(serp_site, tmp_path):
+    from tools.listing_index import ListingIndex
+    index = ListingIndex(str(tmp_path / "seen.sqlite3"))
+    # первая страница не загрузилась — это не «нет новых карточек», вторая всё равно читается
+    serp_site.fail_pages.add("0")
+    items = _run(lambda e: scrape_hh_listings(e, "медсестра", pages=2, index=index), per_host=1, delay=0.0)
+    assert [it.id for it in items] == ["90000002", "90000003"]
+    assert [page for _, page, _ in serp_site.hits] == ["0", "1"]
@@ -0,0 +1,117 @@
+import sys, pathlib, asyncio, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+import pytest
+from openai import AsyncOpenAI
+
+from tools.smalltalk import SmallTalk, FALLBACK_REPLY, normalize_prompt
+
+
+class StubCompletions:
+    """Локальная замена /v1/chat/completions: считает вызовы, отвечает с задержкой delay."""
+    def __init__(self):
+        self.calls = []
+        self.delay = 0.0
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.calls.append(body["messages"][-1]["content"])
+                time.sleep(stub.delay)
+                data = json.dumps({
+                    "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": f"ответ #{len(stub.calls)}"}}],
+                }).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    pass   # клиент ушёл по таймауту
+
+            def log_message(self, *args):
+                pass
+        return Handler
+
+
+@pytest.fixture
+def llm():
+    stub = StubCompletions()
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), stub.handler())
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    stub.base = f"http://127.0.0.1:{srv.server_address[1]}/v1"
+    try:
+        yield stub
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+
+def _run(llm, fn, **kw):
+    async def run():
+        st = SmallTalk(AsyncOpenAI(api_key="test", base_url=llm.base, max_retries=0), model="stub", **kw)
+        try:
+            return await fn(st), st
+        finally:
+            await st.aclose()
+    return asyncio.run(run())
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  Привет!! ") == normalize_prompt("привет") == "привет"
+    assert normalize_prompt("Что  умеешь?") == "что умеешь"
+
+
+def test_smalltalk_cache_and_single_flight(llm):
+    llm.delay = 0.2
+
+    async def fn(st):
+        first = await asyncio.gather(*(st.reply(m) for m in ["Привет!", "привет", "ПРИВЕТ ", "что умеешь?"]))
+        again = await st.reply("привет.")
+        return first, again
+
+    (first, again), st = _run(llm, fn)
+    assert len(llm.calls) == 2                       # «привет» ушёл в модель один раз
+    assert first[0] == first[1] == first[2] == again
+    assert st.stats == {"hit": 1, "miss": 2, "coalesced": 2, "fallback": 0}
+
+
+def test_smalltalk_timeout_fallback_not_cached(llm):
+    llm.delay = 0.5
+
+    async def fn(st):
+        a = await st.reply("как дела")
+        llm.delay = 0.0
+        b = await st.reply("как дела")
+        return a, b
+
+    (a, b), st = _run(llm, fn, timeout=0.1)
+    assert a == FALLBACK_REPLY and b != FALLBACK_REPLY
+    assert st.stats["fallback"] == 1
+
+
+def test_smalltalk_client_created_once(llm):
+    made = []
+
+    def factory():
+        time.sleep(0.05)   # импорт openai не мгновенный — окно для гонки
+        made.append(AsyncOpenAI(api_key="test", base_url=llm.base, max_retries=0))
+        return made[-1]
+
+    async def run():
+        st = SmallTalk(factory=factory, model="stub")
+        try:
+            return await asyncio.gather(*(st.reply(m) for m in ["привет", "что умеешь", "как дела"]))
+        finally:
+            await st.aclose()
+    replies = asyncio.run(run())
+    assert len(made) == 1 and len(llm.calls) == 3
+    assert FALLBACK_REPLY not in replies
@@ -0,0 +1,174 @@
+import sys, pathlib
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "agent"))
+
+from tools.nocodb_client import NocoClient
+from tools.schema import Record
+from tools import write
+
+def test_create_records_chunks_and_maps_failures(noco):
+    noco.reject = lambda p: p.get("Title") == "bad"
+    client = NocoClient(noco.base, "t")
+    payloads = [{"Title": str(i)} for i in range(5)] + [{"Title": "bad"}, {"Title": "6"}]
+    try:
+        res = client.create_records("T1", payloads, chunk_size=3)
+    finally:
+        client.close()
+
+    # 3 пакета; второй (3, 4, "bad") отклонён целиком и повторён построчно
+    posts = [c for c in noco.calls if c[0] == "POST"]
+    assert [len(b) if isinstance(b, list) else 1 for _, _, b in posts] == [3, 3, 1, 1, 1, 1]
+    assert [r.get("Id") for r in res[:5]] == [1, 2, 3, 4, 5]
+    assert "error" in res[5]
+    assert res[6]["Id"] == 6
+    assert [r["Title"] for r in noco.rows("T1")] == ["0", "1", "2", "3", "4", "6"]
+
+def test_write_records_uses_bulk(noco, monkeypatch, tmp_path):
+    monkeypatch.setenv("NOCODB_BASE", noco.base)
+    monkeypatch.setenv("AGENT_MAP_PATH", str(tmp_path / "missing.json"))  # без справочников
+    recs = [Record(Title=f"v{i}", Требования=[7] if i == 1 else None) for i in range(3)]
+    res = write.write_records(recs, table_id="T1", rel_name="Требования")
+    assert res == [{"status": "ok", "id": 1}, {"status": "ok", "id": 2}, {"status": "ok", "id": 3}]
+    posts = [b for m, p, b in noco.calls if m == "POST" and p == "/tables/T1/records"]
+    assert len(posts) == 1 and len(posts[0]) == 3
+    assert "Требования" not in posts[0][1]
+
+def test_write_retries_transient_errors(noco, monkeypatch, tmp_path):
+    monkeypatch.setenv("NOCODB_BASE", noco.base)
+    monkeypatch.setenv("AGENT_MAP_PATH", str(tmp_path / "missing.json"))
+    monkeypatch.setenv("RETRY_BACKOFF_BASE", "0.001")
+    monkeypatch.setattr(write, "BULK_CHUNK", 2)
+    noco.fail_statuses = [429, 503]  # два сбоя подряд, третья попытка проходит
+    res = write.write_records([Record(Title=str(i)) for i in range(5)], table_id="T1")
+    assert [r["status"] for r in res] == ["ok"] * 5
+    assert sorted(r["Title"] for r in noco.rows("T1")) == ["0", "1", "2", "3", "4"]
+
+def test_write_marks_chunk_error_when_retries_exhausted(noco, monkeypatch, tmp_path):
+    monkeypatch.setenv("NOCODB_BASE", noco.base)
+    monkeypatch.setenv("AGENT_MAP_PATH", str(tmp_path / "missing.json"))
+    monkeypatch.setenv("RETRY_BACKOFF_BASE", "0.001")
+    monkeypatch.setenv("RETRY_ATTEMPTS", "2")
+    monkeypatch.setattr(write, "BULK_CHUNK", 2)
+    monkeypatch.setattr(write, "WRITE_CONCURRENCY", 1)  # пакеты по очереди — сбои попадут в первый
+    noco.fail_statuses = [503, 503]
+    res = write.write_records([Record(Title=str(i)) for i in range(3)], table_id="T1")
+    assert [r["status"] for r in res] == ["error", "error", "ok"]
+
+def test_post_not_retried_on_gateway_errors(noco, monkeypatch, tmp_path):
+    monkeypatch.setenv("NOCODB_BASE", noco.base)
+    monkeypatch.setenv("AGENT_MAP_PATH", str(tmp_path / "missing.json"))
+    monkeypatch.setenv("RETRY_BACKOFF_BASE", "0.001")
+    monkeypatch.setattr(write, "BULK_CHUNK", 2)
+    monkeypatch.setattr(write, "WRITE_CONCURRENCY", 1)
+    noco.fail_statuses = [502]  # прокси мог ответить 502 уже после вставки — POST не повторяем
+    res = write.write_records([Record(Title=str(i)) for i in range(3)], table_id="T1")
+    assert [r["status"] for r in res] == ["error", "error", "ok"]
+    assert len([c for c in noco.calls if c[0] == "POST"]) == 2
+
+def test_retry_after_is_capped():
+    import httpx
+    from tools.nocodb_client import AsyncNocoClient
+    client = AsyncNocoClient("http://noco", "t", retry_attempts=3, retry_backoff_base=0.5)
+    r = httpx.Response(429, headers={"Retry-After": "3600"})
+    assert client._backoff(0, r) == 0.5 * 2 ** 3
+    assert client._backoff(0, httpx.Response(503, headers={"Retry-After": "1"})) == 1.0
+
+def test_link_strategy_is_cached(noco, monkeypatch, tmp_path):
+    from tools.nocodb_client import link_strategies
+    monkeypatch.setenv("NOCODB_BASE", noco.base)
+    monkeypatch.setenv("AGENT_MAP_PATH", str(tmp_path / "missing.json"))
+    link_strategies.reset("T1", "Треб")
+    # PATCH по полю-связи здесь «не работает» — живёт только /links
+    orig = noco.handle
+    def handle(m, p, q, b):
+        if m == "PATCH":
+            noco.calls.append((m, p, b))
+            return 400, {"msg": "no"}
+        return orig(m, p, q, b)
+    monkeypatch.setattr(noco, "handle", handle)
+    res = write.write_records([Record(Title=str(i), Требования=[5]) for i in range(4)], table_id="T1", rel_name="Треб")
+    assert [r["status"] for r in res] == ["ok"] * 4
+    patches = [c for c in noco.calls if c[0] == "PATCH"]
+    assert len(patches) == 1          # неудачный PATCH — один раз, дальше сразу /links
+    assert len(noco.links) == 4
+    assert link_strategies.get("T1", "Треб") == "links"
+
+def test_inline_links_skip_extra_requests(noco, monkeypatch, tmp_path):
+    monkeypatch.setenv("NOCODB_BASE", noco.base)
+    monkeypatch.setenv("AGENT_MAP_PATH", str(tmp_path / "missing.json"))
+    monkeypatch.setattr(write, "INLINE_LINKS", True)
+    write.write_records([Record(Title="a", Требования=[1, 2])], table_id="T1", rel_name="Треб")
+    assert [m for m, _, _ in noco.calls] == ["POST"]
+    assert noco.rows("T1")[0]["Треб"] == [{"id": 1}, {"id": 2}]
+
+def test_signed_preview_skips_recheck(noco, monkeypatch, tmp_path):
+    from tools.preview import preview_records
+    monkeypatch.setenv("NOCODB_BASE", noco.base)
+    monkeypatch.setenv("AGENT_MAP_PATH", str(tmp_path / "missing.json"))
+    items = preview_records([Record(Title="a"), Record(Title="b")])
+    assert all(it.token for it in items)
+    # запись пришла обратно через JSON, вторую «отредактировали»
+    recs = [Record(**items[0].record.dict()), Record(**dict(items[1].record.dict(), Title="b2"))]
+
+    rechecked = []
+    def spy(records, snap=None):
+        rechecked.extend(r.Title for r in records)
+        return preview_records(records, snap)
+    monkeypatch.setattr(write, "preview_records", spy)
+    res = write.write_records(recs, table_id="T1", tokens=[it.token for it in items])
+    assert [r["status"] for r in res] == ["ok", "ok"]
+    assert rechecked == ["b2"]
+
+def test_token_secret_from_settings(caplog):
+    from tools import signing
+    rec, old = Record(Title="a"), signing.current_secret()
+    try:
+        signing.configure("s1")
+        token = signing.sign_record(rec, "v1")
+        signing.configure("s2")
+        assert not signing.verify_record(rec, "v1", token)
+        signing.configure("s1")
+        assert signing.verify_record(rec, "v1", token)
+        # без секрета остаётся прежний (случайный) — и предупреждение в лог
+        signing.configure("")
+        assert signing.verify_record(rec, "v1", token)
+        assert "PREVIEW_TOKEN_SECRET is not set" in caplog.text
+    finally:
+        signing.use_secret(old)
+
+def test_duplicates_are_not_written_twice(noco, monkeypatch, tmp_path):
+    monkeypatch.setenv("NOCODB_BASE", noco.base)
+    monkeypatch.setenv("AGENT_MAP_PATH", str(tmp_path / "missing.json"))
+    batch = lambda: [Record(Title="a", Зарплата="50 000"), Record(Title="b"), Record(Title="a", Зарплата="50 000")]
+    first = write.write_records(batch(), table_id="T1")
+    assert first == [{"status": "ok", "id": 1}, {"status": "ok", "id": 2}, {"status": "duplicate", "id": 1}]
+    posts = len(noco.calls)
+    again = write.write_records(batch(), table_id="T1")
+    assert [r["status"] for r in again] == ["duplicate"] * 3
+    assert len(noco.calls) == posts           # повторная загрузка — без сетевых вызовов
+    assert write.write_records(batch(), table_id="T2")[0]["status"] == "ok"  # индекс — по таблице
+
+def test_dedup_warm_from_nocodb(noco, tmp_path):
+    import asyncio
+    from tools.dedup import DedupIndex, dedup_digest
+    from tools.nocodb_client import AsyncNocoClient
+    for i in range(5):
+        noco._insert("T1", {"Title": f"v{i}", "График": "2/2,5/2"})
+    index = DedupIndex(str(tmp_path / "d.sqlite3"))
+
+    async def run():
+        client = AsyncNocoClient(noco.base, "t")
+        try:
+            return await index.warm(client, "T1", page_size=2)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == 5
+    d = dedup_digest(Record(Title="v3", График=["5/2", "2/2"]))
+    assert index.lookup("T1", [d]) == {d: "4"}
+    # строку удалили в NocoDB — повторный warm перестраивает индекс, а не дописывает
+    noco.rows("T1").pop(3)
+    index.add("T2", [("x", 1)])
+    assert asyncio.run(run()) == 4
+    assert index.lookup("T1", [d]) == {} and index.count("T1") == 4
+    assert index.drop("T1") == 4 and index.count("T1") == 0 and index.count("T2") == 1